@@ -0,0 +1,115 @@
+"""
+Compare concurrent-connection capacity and tail latency of two deployments.
+
+Start the sync and the async servers against the same database, then run:
+
+    gunicorn clean_stock_api.wsgi:application -w 4 -b 127.0.0.1:8000
+    uvicorn clean_stock_api.asgi:application --workers 4 --port 8001
+
+    python benchmarks/bench_async.py --token <token> \
+        --target sync=http://127.0.0.1:8000/api/products/ \
+        --target async=http://127.0.0.1:8001/api/async/products/ \
+        --concurrency 10 100 500
+
+Every target is exercised with each concurrency level for --duration seconds.
+Each simulated client keeps its own keep-alive connection and issues requests
+back to back, so a server that cannot accept more connections shows up as
+connection errors and a growing tail latency.
+"""
+import time
+import asyncio
+import argparse
+import statistics
+from urllib.parse import urlsplit
+
+
+async def fetch(reader, writer, request):
+    writer.write(request)
+    await writer.drain()
+
+    headers = await reader.readuntil(b'\r\n\r\n')
+    status = int(headers.split(b' ', 2)[1])
+    length = 0
+    keep_alive = True
+    for line in headers.split(b'\r\n'):
+        name, _, value = line.partition(b':')
+        if name.lower() == b'content-length':
+            length = int(value)
+        elif name.lower() == b'connection' and value.strip().lower() == b'close':
+            keep_alive = False
+    await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def client(url, token, deadline, results):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = (
+        f'GET {path} HTTP/1.1\r\n'
+        f'Host: {parts.netloc}\r\n'
+        f'Authorization: Token {token}\r\n'
+        'Connection: keep-alive\r\n\r\n'
+    ).encode()
+
+    writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            started = time.perf_counter()
+            status, keep_alive = await fetch(reader, writer, request)
+            results['latencies'].append(time.perf_counter() - started)
+            if status >= 400:
+                results['errors'] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            results['errors'] += 1
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(url, token, concurrency, duration):
+    results = {'latencies': [], 'errors': 0}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client(url, token, deadline, results) for _ in range(concurrency)))
+    latencies = results['latencies']
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / duration,
+        'errors': results['errors'],
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'mean': (statistics.mean(latencies) if latencies else float('nan')) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', required=True, help='name=url of an endpoint to benchmark.')
+    parser.add_argument('--token', required=True, help='API token sent in the Authorization header.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{'target':<12}{'conns':>7}{'req/s':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for target in args.target:
+        name, url = target.split('=', 1)
+        for concurrency in args.concurrency:
+            stats = asyncio.run(run(url, args.token, concurrency, args.duration))
+            print(f"{name:<12}{concurrency:>7}{stats['rps']:>10.1f}{stats['errors']:>8}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Measure bytes on the wire and compression CPU cost per endpoint.
+
+A throwaway test database is created and seeded, every endpoint is fetched
+once without compression, and the body is then compressed with each
+available encoding at each requested level:
+
+    SECRET_KEY=x python benchmarks/bench_compression.py --products 2000 --orders 5000
+
+brotli and zstd are only reported when the `brotli` and `zstandard`
+packages are installed. CPU time is process time per response, averaged
+over --repeat runs.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'clean_stock_api.settings')
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from rest_framework.authtoken.models import Token
+
+from clean_stock_api.compression import CODECS
+from clean_stock_api.compression import DEFAULT_LEVELS
+from clean_stock_api.compression import compress_content
+from stock.models import Order
+from stock.models import Product
+from stock.models import Transaction
+
+ENDPOINTS = [
+    '/api/products/',
+    '/api/transactions/',
+    '/api/orders/',
+    '/api/orders/fast-report/',
+]
+
+
+def seed(products, orders):
+    user = User.objects.create_user(username='bench', password='bench')
+    Product.objects.bulk_create(
+        Product(
+            user=user,
+            name=f'Product {i}',
+            barcode=f'{i:013d}',
+            weight=1,
+            weight_unit='kg',
+            price_purchased=10,
+            price_sale=15,
+            currency='USD',
+            quantity=100,
+            quantity_min=10,
+            quantity_max=1000,
+        )
+        for i in range(products)
+    )
+    product_ids = list(Product.objects.filter(user=user).values_list('id', flat=True))
+    transactions = Transaction.objects.bulk_create(
+        Transaction(user=user, product_id=product_ids[i % len(product_ids)], quantity=1 + i % 5, price=15)
+        for i in range(orders)
+    )
+    created = Order.objects.bulk_create(Order(user=user) for _ in range(orders))
+    Order.transactions.through.objects.bulk_create(
+        Order.transactions.through(order_id=order.id, transaction_id=transaction.id)
+        for order, transaction in zip(created, transactions)
+    )
+    return Token.objects.create(user=user).key
+
+
+def cpu_ms(encoding, level, content, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        compress_content(encoding, level, content)
+        samples.append(time.process_time() - started)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--levels', type=int, nargs='*', help='Levels to try for every encoding, defaults to the configured ones.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        token = seed(args.products, args.orders)
+        client = Client(HTTP_AUTHORIZATION='Token ' + token)
+
+        print(f"{'endpoint':<28}{'encoding':>10}{'level':>7}{'bytes':>12}{'ratio':>8}{'cpu ms':>9}")
+        for endpoint in ENDPOINTS:
+            content = client.get(endpoint).content
+            print(f"{endpoint:<28}{'identity':>10}{'-':>7}{len(content):>12}{1:>8.2f}{0:>9.1f}")
+            for encoding in CODECS:
+                for level in args.levels or [DEFAULT_LEVELS[encoding]]:
+                    size = len(compress_content(encoding, level, content))
+                    cost = cpu_ms(encoding, level, content, args.repeat)
+                    print(f"{'':<28}{encoding:>10}{level:>7}{size:>12}{len(content) / size:>8.2f}{cost:>9.1f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Time the reorder suggestion maths on a synthetic products x days history.
+
+No database is needed; sales rows are generated in memory, scattered into
+the dense matrix and run through the forecast:
+
+    SECRET_KEY=x python benchmarks/bench_forecasting.py --products 100000 --days 365
+
+Roughly --density of the product-days have sales, which sets how many rows
+the grouped sales query would return.
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import date
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'clean_stock_api.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+
+from stock.forecasting import dense_sales
+from stock.forecasting import compute_suggestions
+from stock.forecasting import DEFAULT_ALPHA
+from stock.forecasting import DEFAULT_WINDOW_DAYS
+from stock.forecasting import DEFAULT_REVIEW_DAYS
+from stock.forecasting import DEFAULT_SERVICE_LEVEL
+from stock.forecasting import DEFAULT_LEAD_TIME_DAYS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--density', type=float, default=0.1)
+    options = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    start = date.today() - timedelta(days=options.days - 1)
+    count = int(options.products * options.days * options.density)
+    product_ids = np.arange(1, options.products + 1, dtype=np.int64)
+    dates = [start + timedelta(days=int(offset)) for offset in rng.integers(0, options.days, count)]
+    rows = list(zip(rng.integers(1, options.products + 1, count).tolist(), dates, rng.poisson(3, count).tolist()))
+    quantities = rng.integers(0, 200, options.products).astype(np.float32)
+
+    started = time.perf_counter()
+    sales = dense_sales(product_ids, rows, start, options.days)
+    scattered = time.perf_counter()
+    result = compute_suggestions(sales, quantities, DEFAULT_WINDOW_DAYS, DEFAULT_LEAD_TIME_DAYS, DEFAULT_REVIEW_DAYS, DEFAULT_SERVICE_LEVEL, DEFAULT_ALPHA)
+    finished = time.perf_counter()
+
+    print(f'{options.products} products x {options.days} days, {count} sales rows, {sales.nbytes / 2 ** 20:.0f} MiB matrix')
+    print(f'build matrix   {scattered - started:8.3f}s')
+    print(f'forecast       {finished - scattered:8.3f}s')
+    print(f'reorder needed {int(result["needs_reorder"].sum())}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Measure what the middleware chain costs an async view under ASGI.
+
+A throwaway test database is created and seeded, and the async category
+list is fetched through the ASGI request path with WhiteNoise's stock
+sync-only middleware and with the async-capable one from
+clean_stock_api.static:
+
+    SECRET_KEY=x python benchmarks/bench_middleware.py --requests 2000 --concurrency 10
+
+For each chain the middlewares Django had to adapt between sync and async
+are listed. Then the requests are sent --concurrency at a time, and the
+throughput, errors (load shedding included) and latency percentiles are
+reported.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'clean_stock_api.settings')
+
+import django
+
+django.setup()
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import AsyncClient
+from django.test import override_settings
+from django.test.client import AsyncClientHandler
+from django.test.utils import setup_test_environment
+from rest_framework.authtoken.models import Token
+
+from stock.models import Category
+
+ENDPOINT = '/api/async/categories/'
+CHAINS = {
+    'sync-only': 'whitenoise.middleware.WhiteNoiseMiddleware',
+    'async': 'clean_stock_api.static.WhiteNoiseMiddleware',
+}
+
+
+class CountingHandler(AsyncClientHandler):
+    """
+    Record every middleware whose handler has to be adapted between sync
+    and async while the chain is built.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.adapted = []
+        super().__init__(*args, **kwargs)
+
+    def adapt_method_mode(self, is_async, method, method_is_async=None, debug=False, name=None):
+        if method_is_async is None:
+            method_is_async = iscoroutinefunction(method)
+        if name and is_async != method_is_async:
+            self.adapted.append(name.removeprefix('middleware '))
+        return super().adapt_method_mode(is_async, method, method_is_async, debug, name)
+
+
+def seed(categories):
+    user = User.objects.create_user(username='bench', password='bench')
+    Category.objects.bulk_create(Category(user=user, name=f'Category {i}') for i in range(categories))
+    return Token.objects.create(user=user).key
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(client, token, requests, concurrency):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(ENDPOINT, headers={'Authorization': 'Token ' + token})
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(fetch() for _ in range(requests)))
+    return requests / (time.perf_counter() - started), errors, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--categories', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        token = seed(args.categories)
+        for name, whitenoise in CHAINS.items():
+            middleware = [whitenoise if path.endswith('.WhiteNoiseMiddleware') else path for path in settings.MIDDLEWARE]
+            with override_settings(MIDDLEWARE=middleware):
+                client = AsyncClient()
+                client.handler = CountingHandler()
+                asyncio.run(run(client, token, args.concurrency, args.concurrency))
+                rps, errors, latencies = asyncio.run(run(client, token, args.requests, args.concurrency))
+            print(f'{name}: adapted {len(client.handler.adapted)} middleware(s) {client.handler.adapted}')
+            print(
+                f'{"":<4}{rps:.1f} req/s, {errors} errors, p50 {statistics.median(latencies) * 1000:.1f} ms, '
+                f'p95 {percentile(latencies, 0.95) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms'
+            )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
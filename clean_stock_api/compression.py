@@ -0,0 +1,168 @@
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+# In order of preference when the client weighs encodings equally.
+DEFAULT_LEVELS = {
+    'br': 5,
+    'zstd': 3,
+    'gzip': 6,
+}
+
+
+def gzip_compressor(level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def brotli_compressor(level):
+    compressor = brotli.Compressor(quality=level)
+    return compressor.process, compressor.finish
+
+
+def zstd_compressor(level):
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return compressor.compress, compressor.flush
+
+
+CODECS = {'gzip': gzip_compressor}
+if brotli is not None:
+    CODECS['br'] = brotli_compressor
+if zstandard is not None:
+    CODECS['zstd'] = zstd_compressor
+
+
+def compress_content(encoding, level, content):
+    process, finish = CODECS[encoding](level)
+    return process(content) + finish()
+
+
+def compress_stream(encoding, level, chunks):
+    process, finish = CODECS[encoding](level)
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+async def acompress_stream(encoding, level, chunks):
+    process, finish = CODECS[encoding](level)
+    async for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def available_encodings():
+    return [encoding for encoding in DEFAULT_LEVELS if encoding in CODECS]
+
+
+def negotiate(accept_encoding, encodings):
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = weights.get(encoding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) or content_type.endswith(('+json', '+xml'))
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses with the best encoding accepted by the client.
+
+    Brotli and zstd are offered when the `brotli` and `zstandard` packages
+    are installed; gzip is always available. Responses that are already
+    encoded, partial, small or not text-like are passed through untouched.
+    """
+
+    def process_response(self, request, response):
+        encoding = self.select_encoding(request, response)
+        if encoding is None:
+            return response
+        return self.compress(response, encoding)
+
+    async def __acall__(self, request):
+        """
+        Stay in the event loop instead of running the hook in the sync
+        thread. Only compressing a whole body, CPU work that the codecs do
+        without holding the GIL, is handed to a worker thread.
+        """
+        response = await self.get_response(request)
+        encoding = self.select_encoding(request, response)
+        if encoding is None:
+            return response
+        if response.streaming:
+            return self.compress(response, encoding)
+        return await sync_to_async(self.compress, thread_sensitive=False)(response, encoding)
+
+    def select_encoding(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code == 206 or not is_compressible(response):
+            return None
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return None
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), available_encodings())
+
+    def compress(self, response, encoding):
+        level = settings.COMPRESSION_LEVELS.get(encoding, DEFAULT_LEVELS[encoding])
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(encoding, level, response.streaming_content)
+            else:
+                response.streaming_content = compress_stream(encoding, level, response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress_content(encoding, level, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,139 @@
+import os
+import re
+import stat
+import mimetypes
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404
+from django.http import FileResponse
+from django.http import HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.http import parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+HASHED_NAME = re.compile(r'(^|[._-])[0-9a-f]{16,}([._-]|$)')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Directories of MEDIA_ROOT that are never served, e.g. product import
+# files uploaded before they moved to PRIVATE_MEDIA_ROOT.
+PRIVATE_DIRECTORIES = {'imports'}
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, no-cache'
+
+
+class FileRange:
+    """
+    Expose a byte range of an open file.
+
+    `fileno` is kept so that WSGI servers with sendfile support (such as
+    gunicorn) still stream the range without copying it through Python.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        length = min(int(end), size)
+        return (size - length, size - 1) if length else ()
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return ()
+    return start, end
+
+
+def range_applies(request, etag, mtime):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    modified = parse_http_date_safe(if_range)
+    return modified is not None and int(mtime) <= modified
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('Media file not found.')
+    directory = os.path.relpath(fullpath, os.path.abspath(settings.MEDIA_ROOT)).split(os.sep)[0]
+    if directory in PRIVATE_DIRECTORIES or not stat.S_ISREG(file_stat.st_mode):
+        raise Http404('Media file not found.')
+
+    size = file_stat.st_size
+    etag = f'"{file_stat.st_mtime_ns:x}-{size:x}"'
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(file_stat.st_mtime),
+        'Cache-Control': IMMUTABLE if HASHED_NAME.search(os.path.basename(fullpath)) else REVALIDATE,
+        'Accept-Ranges': 'bytes',
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(file_stat.st_mtime))
+    if response is not None:
+        for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+            response.headers.setdefault(header, headers[header])
+        return response
+
+    byte_range = None
+    if request.headers.get('Range') and range_applies(request, etag, file_stat.st_mtime):
+        byte_range = parse_range(request.headers['Range'], size)
+        if byte_range == ():
+            return HttpResponse(status=416, headers={'Content-Range': f'bytes */{size}'})
+
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', None)
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type or 'application/octet-stream', headers=headers)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + path.lstrip('/')
+        return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type or 'application/octet-stream', headers=headers)
+        if byte_range:
+            response.status_code = 206
+            response['Content-Range'] = f'bytes {byte_range[0]}-{byte_range[1]}/{size}'
+        response['Content-Length'] = byte_range[1] - byte_range[0] + 1 if byte_range else size
+        return response
+
+    file = open(fullpath, 'rb')
+    if byte_range:
+        start, end = byte_range
+        response = FileResponse(FileRange(file, start, end - start + 1), status=206, content_type=content_type or 'application/octet-stream', headers=headers)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(file, content_type=content_type or 'application/octet-stream', headers=headers)
+        response['Content-Length'] = size
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
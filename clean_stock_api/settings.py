@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -14,6 +15,34 @@ ALLOWED_HOSTS = ['*']
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX')
+# Uploads kept away from MEDIA_URL, such as product import files.
+PRIVATE_MEDIA_ROOT = os.environ.get('PRIVATE_MEDIA_ROOT', BASE_DIR / 'private')
+
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_RENDITION_WORKERS = int(os.environ.get('IMAGE_RENDITION_WORKERS', 2))
+BOOTSTRAP_WORKERS = int(os.environ.get('BOOTSTRAP_WORKERS', 4))
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', 1))
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+ORDER_RETENTION_DAYS = int(os.environ.get('ORDER_RETENTION_DAYS', 730))
+# Change feeds only hand out rows stamped longer ago than this, the longest
+# a write is expected to take to commit after stamping them.
+CHANGE_FEED_SETTLE_SECONDS = int(os.environ.get('CHANGE_FEED_SETTLE_SECONDS', 5))
+
+LOAD_SHEDDING_TARGET_LATENCY = float(os.environ.get('LOAD_SHEDDING_TARGET_LATENCY', 0.5))
+LOAD_SHEDDING_MAX_QUEUE_DELAY = float(os.environ.get('LOAD_SHEDDING_MAX_QUEUE_DELAY', 1.0))
+LOAD_SHEDDING_MIN_CONCURRENCY = int(os.environ.get('LOAD_SHEDDING_MIN_CONCURRENCY', 4))
+LOAD_SHEDDING_MAX_CONCURRENCY = int(os.environ.get('LOAD_SHEDDING_MAX_CONCURRENCY', 64))
+
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_LEVELS = {
+    'br': int(os.environ.get('COMPRESSION_BROTLI_LEVEL', 5)),
+    'zstd': int(os.environ.get('COMPRESSION_ZSTD_LEVEL', 3)),
+    'gzip': int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6)),
+}
 
 INSTALLED_APPS = [
     'stock',
@@ -33,14 +62,36 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
-    )
+        'stock.sharding.TenantTokenAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'stock.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'stock.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'stock.throttling.TokenBucketThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'read': os.environ.get('THROTTLE_READ_RATE', '600/min'),
+        'write': os.environ.get('THROTTLE_WRITE_RATE', '120/min'),
+        'bulk': os.environ.get('THROTTLE_BULK_RATE', '10/min'),
+        'reports': os.environ.get('THROTTLE_REPORTS_RATE', '30/min'),
+    },
 }
 
 MIDDLEWARE = [
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'clean_stock_api.static.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'stock.throttling.LoadSheddingMiddleware',
+    'stock.sharding.TenantMiddleware',
+    'stock.replicas.ReplicaMiddleware',
+    'clean_stock_api.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,6 +120,18 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'clean_stock_api.wsgi.application'
 
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'clean-stock-api'),
+    }
+}
+# LocMemCache and DummyCache live in one process, so under several workers
+# a version bump only reaches the worker that made the write. Entries
+# cached under such versions are kept for LOCAL_CACHE_SECONDS at most.
+SHARED_CACHE = CACHES['default']['BACKEND'].rsplit('.', 1)[-1] not in ('LocMemCache', 'DummyCache')
+LOCAL_CACHE_SECONDS = int(os.environ.get('LOCAL_CACHE_SECONDS', 5))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -76,6 +139,54 @@ DATABASES = {
     }
 }
 
+def database(alias, primary=None):
+    """
+    Settings of a database alias read from <ALIAS>_DB_ENGINE and friends. A
+    replica defaults to its primary's settings and mirrors it in tests.
+    """
+    prefix = alias.upper()
+    base = DATABASES.get(primary, {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / f'{alias}.sqlite3'})
+    config = {
+        key: os.environ.get(f'{prefix}_DB_{key}', base.get(key, ''))
+        for key in ('ENGINE', 'NAME', 'USER', 'PASSWORD', 'HOST', 'PORT')
+    }
+    if primary is not None:
+        config['TEST'] = {'MIRROR': primary}
+    return config
+
+
+# Tenant shards, e.g. DATABASE_SHARDS=default,shard_1. Each extra alias is a
+# SQLite file next to db.sqlite3 unless <ALIAS>_DB_ENGINE and friends point it
+# at another database.
+DATABASE_SHARDS = [alias.strip() for alias in os.environ.get('DATABASE_SHARDS', 'default').split(',') if alias.strip()]
+for alias in DATABASE_SHARDS:
+    DATABASES.setdefault(alias, database(alias))
+# How long a worker may keep using a cached tenant placement. move_tenant
+# waits this long after switching a tenant before deleting its old rows.
+TENANT_PLACEMENT_CACHE_SECONDS = int(os.environ.get('TENANT_PLACEMENT_CACHE_SECONDS', 5))
+
+# Read replicas of each shard, e.g. DEFAULT_DB_REPLICAS=replica_1,replica_2
+# and DEFAULT_DB_ANALYTICS=analytics for the reports. Safe requests read from
+# the replicas unless the same user wrote in the last READ_PIN_SECONDS.
+DATABASE_REPLICAS = {}
+DATABASE_ANALYTICS = {}
+for alias in DATABASE_SHARDS:
+    prefix = alias.upper()
+    replicas = [replica.strip() for replica in os.environ.get(f'{prefix}_DB_REPLICAS', '').split(',') if replica.strip()]
+    if replicas:
+        DATABASE_REPLICAS[alias] = replicas
+    if os.environ.get(f'{prefix}_DB_ANALYTICS'):
+        DATABASE_ANALYTICS[alias] = os.environ[f'{prefix}_DB_ANALYTICS']
+        replicas = [*replicas, DATABASE_ANALYTICS[alias]]
+    for replica in replicas:
+        DATABASES.setdefault(replica, database(replica, primary=alias))
+READ_PIN_SECONDS = int(os.environ.get('READ_PIN_SECONDS', 5))
+# The pin is kept in the cache, so every worker must see the same one.
+if DATABASE_REPLICAS and not SHARED_CACHE:
+    raise ImproperlyConfigured('Read replicas need a cache shared by all workers, set CACHE_BACKEND, e.g. to django.core.cache.backends.redis.RedisCache.')
+
+DATABASE_ROUTERS = ['stock.sharding.TenantRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Order, Product, Category, Manufacturer, Promotion, Supplier, Transaction
+from .models import Order, Product, Category, Manufacturer, Promotion, Supplier, Transaction, StockMovement, StockSnapshot, Tombstone, IdempotencyKey, ImportJob, SalesCounter, TenantPlacement, ArchivedOrder, ArchivedTransaction, OrderLine
 
 admin.site.site_header = 'Stock Management System'
 admin.site.site_title = 'Stock Management System'
@@ -12,4 +12,14 @@ admin.site.register(Category)
 admin.site.register(Manufacturer)
 admin.site.register(Supplier)
 admin.site.register(Order)
-admin.site.register(Transaction)
\ No newline at end of file
+admin.site.register(Transaction)
+admin.site.register(StockMovement)
+admin.site.register(StockSnapshot)
+admin.site.register(Tombstone)
+admin.site.register(IdempotencyKey)
+admin.site.register(ImportJob)
+admin.site.register(SalesCounter)
+admin.site.register(TenantPlacement)
+admin.site.register(ArchivedOrder)
+admin.site.register(ArchivedTransaction)
+admin.site.register(OrderLine)
@@ -0,0 +1,118 @@
+from datetime import time
+from datetime import datetime
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router
+from django.db.models import Value
+from django.db.models import BooleanField
+from django.db.transaction import atomic
+from django.utils import timezone
+
+from stock.models import Order
+from stock.models import Transaction
+from stock.models import ArchivedOrder
+from stock.models import ArchivedTransaction
+
+ORDER_FIELDS = ['id', 'user_id', 'status', 'total', 'units', 'line_count', 'created_at', 'updated_at']
+TRANSACTION_FIELDS = ['id', 'user_id', 'product_id', 'quantity', 'price', 'created_at', 'updated_at']
+LINE_FIELDS = ['order', 'product', 'product__name', 'quantity', 'price']
+HISTORY_DEFAULT_DAYS = 30
+
+
+def retention_cutoff(days=None):
+    return timezone.now() - timedelta(days=settings.ORDER_RETENTION_DAYS if days is None else days)
+
+
+def history(build, since=None):
+    """
+    `build(order_model, transaction_model)` over the hot tables, united with
+    the same query over the archive when `since` reaches past the retention
+    horizon. The archive models use the same field names and lookups, so
+    one builder serves both. Only orders older than the horizon are ever
+    archived, so more recent ranges read the hot tables alone.
+    """
+    queryset = build(Order, Transaction)
+    if since is None or since < retention_cutoff():
+        queryset = queryset.union(build(ArchivedOrder, ArchivedTransaction), all=True)
+    return queryset
+
+
+def order_history(user, start, end, limit):
+    """
+    The latest `limit` orders placed between the `start` and `end` dates
+    (inclusive), hot and archived, newest first, with their lines.
+    """
+    since = timezone.make_aware(datetime.combine(start, time.min))
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+
+    def build(orders, transactions):
+        return (
+            orders.objects.filter(user=user, created_at__gte=since, created_at__lt=until)
+            .annotate(archived=Value(orders is ArchivedOrder, output_field=BooleanField()))
+            .values('id', 'status', 'total', 'units', 'line_count', 'created_at', 'archived')
+        )
+
+    rows = list(history(build, since).order_by('-created_at', '-id')[:limit])
+    lines = {}
+    for model, archived in ((Transaction, False), (ArchivedTransaction, True)):
+        ids = [row['id'] for row in rows if row['archived'] == archived]
+        if ids:
+            for line in model.objects.filter(order__in=ids).values(*LINE_FIELDS).order_by('order', 'id'):
+                lines.setdefault((archived, line.pop('order')), []).append(line)
+    for row in rows:
+        row['transactions'] = lines.get((row['archived'], row['id']), [])
+    return rows
+
+
+def archive_orders(cutoff, batch_size=1000, user_id=None):
+    """
+    Move orders placed before `cutoff`, their lines and links to the archive
+    tables of the current database, one batch per transaction, keeping their
+    ids. Orders sharing a transaction with a newer order stay hot so the
+    archive never references hot rows. Returns the numbers of orders and
+    transactions moved.
+    """
+    db = router.db_for_write(Order)
+    orders = Order.objects.using(db).filter(created_at__lt=cutoff).exclude(transactions__order__created_at__gte=cutoff)
+    if user_id is not None:
+        orders = orders.filter(user_id=user_id)
+    links = Order.transactions.through.objects.using(db)
+
+    moved_orders = moved_transactions = 0
+    last = None
+    while True:
+        batch = orders.order_by('id')
+        if last is not None:
+            batch = batch.filter(id__gt=last)
+        with atomic(using=db):
+            rows = list(batch.values_list(*ORDER_FIELDS)[:batch_size])
+            if not rows:
+                break
+            order_ids = [row[0] for row in rows]
+            pairs = list(links.filter(order_id__in=order_ids).values_list('order_id', 'transaction_id'))
+            transaction_ids = {transaction_id for _, transaction_id in pairs}
+            transactions = list(Transaction.objects.using(db).filter(id__in=transaction_ids).values_list(*TRANSACTION_FIELDS))
+
+            # A transaction shared with an order of a later batch is copied
+            # again then, and stays hot until no hot order links to it.
+            ArchivedTransaction.objects.using(db).bulk_create(
+                [ArchivedTransaction(**dict(zip(TRANSACTION_FIELDS, row))) for row in transactions],
+                ignore_conflicts=True,
+            )
+            ArchivedOrder.objects.using(db).bulk_create(
+                [ArchivedOrder(**dict(zip(ORDER_FIELDS, row))) for row in rows]
+            )
+            ArchivedOrder.transactions.through.objects.using(db).bulk_create([
+                ArchivedOrder.transactions.through(archivedorder_id=order_id, archivedtransaction_id=transaction_id)
+                for order_id, transaction_id in pairs
+            ])
+
+            Order.objects.using(db).filter(id__in=order_ids).delete()
+            linked = links.filter(transaction_id__in=transaction_ids).values('transaction_id')
+            _, deleted = Transaction.objects.using(db).filter(id__in=transaction_ids).exclude(id__in=linked).delete()
+
+        moved_orders += len(rows)
+        moved_transactions += deleted.get(Transaction._meta.label, 0)
+        last = order_ids[-1]
+    return moved_orders, moved_transactions
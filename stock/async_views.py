@@ -0,0 +1,98 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from stock.models import Product
+from stock.models import Category
+from stock.filters import ProductFilter
+from stock.filters import CategoryFilter
+from stock.renderers import FastJSONRenderer
+from stock.reports import build_fast_report
+from stock.serializers import ProductSerializer
+from stock.serializers import CategorySerializer
+from stock.replicas import select_reads
+from stock.sharding import current_shard
+from stock.sharding import shard_for_user
+
+
+def render(data, status=status.HTTP_200_OK):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+async def authenticate(request):
+    auth = request.headers.get('Authorization', '').split()
+    if len(auth) != 2 or auth[0].lower() != 'token':
+        return None, 'Authentication credentials were not provided.'
+    try:
+        token = await Token.objects.select_related('user').aget(key=auth[1])
+    except Token.DoesNotExist:
+        return None, 'Invalid token.'
+    if not token.user.is_active:
+        return None, 'User inactive or deleted.'
+    current_shard.set(await sync_to_async(shard_for_user)(token.user.pk))
+    await sync_to_async(select_reads)(token.user.pk, request.method)
+    return token.user, None
+
+
+def token_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return render({'detail': f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        user, error = await authenticate(request)
+        if user is None:
+            response = render({'detail': error}, status=status.HTTP_401_UNAUTHORIZED)
+            response['WWW-Authenticate'] = 'Token'
+            return response
+
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def filtered_list(request, filterset_class, queryset, serializer_class):
+    filterset = filterset_class(request.GET, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        return render(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+    items = [item async for item in filterset.qs]
+    return render(serializer_class(items, many=True, context={'request': request}).data)
+
+
+async def get_product(request, **lookup):
+    try:
+        product = await Product.objects.select_related('user').aget(user=request.user, **lookup)
+    except Product.DoesNotExist:
+        return render({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return render(ProductSerializer(product, context={'request': request}).data)
+
+
+@token_required
+async def product_list(request):
+    queryset = Product.objects.filter(user=request.user).select_related('user').order_by('-id')
+    return await filtered_list(request, ProductFilter, queryset, ProductSerializer)
+
+
+@token_required
+async def product_detail(request, pk):
+    return await get_product(request, pk=pk)
+
+
+@token_required
+async def product_barcode(request, barcode):
+    return await get_product(request, barcode=barcode)
+
+
+@token_required
+async def category_list(request):
+    queryset = Category.objects.filter(user=request.user).select_related('user').order_by('id')
+    return await filtered_list(request, CategoryFilter, queryset, CategorySerializer)
+
+
+@token_required
+async def fast_report(request):
+    report = await sync_to_async(build_fast_report)(request.user)
+    return render(report)
@@ -0,0 +1,128 @@
+import hashlib
+import threading
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import router
+from django.db import connections
+from django.db import close_old_connections
+from django.db.models import Max
+from django.db.models import Count
+from rest_framework.exceptions import ValidationError
+
+from stock.cache import get_version
+from stock.models import Product
+from stock.models import Category
+from stock.models import Supplier
+from stock.models import Promotion
+from stock.models import Manufacturer
+from stock.reports import build_fast_report
+from stock.renderers import FastJSONRenderer
+from stock.serializers import ProductSerializer
+from stock.serializers import CategorySerializer
+from stock.serializers import SupplierSerializer
+from stock.serializers import PromotionSerializer
+from stock.serializers import ManufacturerSerializer
+
+# Same querysets and ordering as the list endpoints of each section.
+SECTIONS = {
+    'products': (Product, ProductSerializer, '-id'),
+    'categories': (Category, CategorySerializer, 'id'),
+    'suppliers': (Supplier, SupplierSerializer, 'id'),
+    'manufacturers': (Manufacturer, ManufacturerSerializer, 'id'),
+    'promotions': (Promotion, PromotionSerializer, '-id'),
+}
+# Cache version namespace each section follows, see section_version().
+VERSIONS = {
+    'products': 'products',
+    'categories': 'products',
+    'suppliers': 'products',
+    'manufacturers': 'products',
+    'promotions': 'promotions',
+}
+FAST_REPORT = 'fast_report'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.BOOTSTRAP_WORKERS, thread_name_prefix='bootstrap')
+    return _executor
+
+
+def digest(value):
+    return hashlib.sha256(value.encode() if isinstance(value, str) else value).hexdigest()[:16]
+
+
+def section_version(section, queryset, user_id):
+    """
+    Version a section by its row count, highest id and latest update,
+    mixed with the cache counter that stock/signals.py bumps on every
+    change to its rows. The default cache is per process, so the counter
+    alone would miss writes handled by another worker; m2m edits and
+    delete cascades touch updated_at, so the rows alone see those too.
+    """
+    state = queryset.aggregate(count=Count('id'), last_id=Max('id'), last_updated=Max('updated_at'))
+    last_updated = state['last_updated'].isoformat() if state['last_updated'] else ''
+    counter = get_version(VERSIONS[section], user_id)
+    return digest(f"{counter}:{state['count']}:{state['last_id']}:{last_updated}")
+
+
+def select_fields(section, item_fields, fields):
+    unknown = fields - set(item_fields)
+    if unknown:
+        raise ValidationError({f'fields[{section}]': f"Unknown fields: {', '.join(sorted(unknown))}."})
+    for name in list(item_fields):
+        if name not in fields:
+            item_fields.pop(name)
+
+
+def build_section(section, request, fields=None, version=None):
+    if section == FAST_REPORT:
+        report = build_fast_report(request.user)
+        current = digest(FastJSONRenderer().render(report))
+        if current == version:
+            return {'version': current, 'unchanged': True}
+        if fields:
+            select_fields(section, report, fields)
+        return {'version': current, 'data': report}
+
+    model, serializer_class, ordering = SECTIONS[section]
+    queryset = model.objects.filter(user=request.user)
+    current = section_version(section, queryset, request.user.id)
+    if current == version:
+        return {'version': current, 'unchanged': True}
+
+    serializer = serializer_class(queryset.select_related('user').order_by(ordering), many=True, context={'request': request})
+    if fields:
+        select_fields(section, serializer.child.fields, fields)
+    return {'version': current, 'data': serializer.data}
+
+
+def run_section(*args):
+    close_old_connections()
+    try:
+        return build_section(*args)
+    finally:
+        close_old_connections()
+
+
+def build_bootstrap(request, sections, fields, versions):
+    """
+    Build every requested section for the authenticated user.
+
+    Sections are built concurrently, each worker thread using its own
+    database connection. Inside a transaction the workers could not see
+    uncommitted rows, so the sections are built sequentially instead.
+    """
+    arguments = [(section, request, fields.get(section), versions.get(section)) for section in sections]
+    if connections[router.db_for_read(Product)].in_atomic_block or len(sections) < 2:
+        return {section: build_section(*args) for section, args in zip(sections, arguments)}
+
+    futures = [get_executor().submit(copy_context().run, run_section, *args) for args in arguments]
+    return {section: future.result() for section, future in zip(sections, futures)}
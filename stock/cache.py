@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def version_key(namespace, user_id):
+    return f'{namespace}:version:{user_id}'
+
+
+def new_version():
+    """
+    Versions start from the clock, so one lost with the cache restarts
+    past every value handed out before instead of repeating them.
+    """
+    return time.time_ns() // 1000
+
+
+def get_version(namespace, user_id):
+    return cache.get_or_set(version_key(namespace, user_id), new_version, None)
+
+
+def bump_version(namespace, user_id):
+    key = version_key(namespace, user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, new_version(), None)
+
+
+def bump_version_on_commit(namespace, user_id, using=None):
+    """
+    Bump the version once the current transaction on `using` commits, or
+    at once outside a transaction. Bumping earlier would let a reader
+    cache the old rows under the new version before the write is visible.
+    """
+    transaction.on_commit(lambda: bump_version(namespace, user_id), using=using)
+
+
+def get_or_compute(namespace, user_id, compute, suffix='', timeout=3600):
+    """
+    Cache `compute()` under the current version of `namespace`. With a
+    per-process cache other workers never see the bump, so the entry only
+    lives for LOCAL_CACHE_SECONDS there.
+    """
+    if not settings.SHARED_CACHE:
+        timeout = min(timeout, settings.LOCAL_CACHE_SECONDS)
+    key = f'{namespace}:{user_id}:{get_version(namespace, user_id)}:{suffix}'
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
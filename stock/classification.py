@@ -0,0 +1,160 @@
+from datetime import time
+from datetime import datetime
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models import Max
+from django.db.models import Sum
+from django.db.models import DecimalField
+from django.db.models import ExpressionWrapper
+from django.utils import timezone
+
+from stock.cache import get_version
+from stock.models import Order
+from stock.models import OrderLine
+
+TIERS = ('A', 'B', 'C')
+DEFAULT_WINDOW_DAYS = 90
+MAX_WINDOW_DAYS = 365
+DEFAULT_THRESHOLDS = (0.8, 0.95)
+SETTLE_SECONDS = 60
+CACHE_TIMEOUT = 60 * 60 * 24
+
+line_revenue = ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField(max_digits=20, decimal_places=2))
+
+
+def parse_window(value):
+    if not value:
+        return DEFAULT_WINDOW_DAYS
+    try:
+        days = int(value)
+    except ValueError:
+        raise ValueError(f'Must be a number of days between 1 and {MAX_WINDOW_DAYS}.')
+    if not 1 <= days <= MAX_WINDOW_DAYS:
+        raise ValueError(f'Must be a number of days between 1 and {MAX_WINDOW_DAYS}.')
+    return days
+
+
+def parse_thresholds(a, b):
+    try:
+        thresholds = (float(a) if a else DEFAULT_THRESHOLDS[0], float(b) if b else DEFAULT_THRESHOLDS[1])
+    except ValueError:
+        raise ValueError('Thresholds must be numbers.')
+    if not 0 < thresholds[0] < thresholds[1] <= 1:
+        raise ValueError('Thresholds must satisfy 0 < a < b <= 1.')
+    return thresholds
+
+
+def revenue_since(user, start, watermark, settled):
+    """
+    Revenue per product of the active orders created since `start` with an
+    id above `watermark`. The new watermark is the highest id among orders
+    created before `settled`, and orders are counted by id up to it, so a
+    concurrent transaction cannot commit a lower id behind it and no order
+    is skipped for a timestamp out of step with its id. Returns the
+    revenue dict and the new watermark.
+    """
+    new_watermark = Order.objects.filter(user=user, created_at__lt=settled, id__gt=watermark).aggregate(last=Max('id'))['last']
+    if new_watermark is None:
+        return {}, watermark
+
+    orders = Order.objects.filter(user=user, status=True, created_at__gte=start, id__gt=watermark, id__lte=new_watermark)
+    rows = (
+        OrderLine.objects.filter(order__in=orders)
+        .values_list('product')
+        .annotate(revenue=Sum(line_revenue))
+        .order_by()
+    )
+    return dict(rows), new_watermark
+
+
+def revenue_by_product(user, days, today=None):
+    """
+    Cached revenue per product over the last `days` days. The cache entry is
+    per user, window and day, and each call only aggregates the orders
+    settled since the previous one. Cancelling, editing or deleting orders
+    bumps the 'orders' version and starts a fresh entry. That bump only
+    reaches other workers through a shared cache, so with a per-process one
+    the entry is kept for LOCAL_CACHE_SECONDS.
+    """
+    today = today or timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today - timedelta(days=days - 1), time.min))
+    key = f'abc:{user.id}:{get_version("orders", user.id)}:{days}:{today.isoformat()}'
+    state = cache.get(key) or {'watermark': 0, 'revenue': {}}
+
+    added, watermark = revenue_since(user, start, state['watermark'], timezone.now() - timedelta(seconds=SETTLE_SECONDS))
+    if watermark != state['watermark']:
+        revenue = dict(state['revenue'])
+        for product_id, amount in added.items():
+            revenue[product_id] = revenue.get(product_id, Decimal('0')) + (amount or Decimal('0'))
+        state = {'watermark': watermark, 'revenue': revenue}
+        cache.set(key, state, CACHE_TIMEOUT if settings.SHARED_CACHE else settings.LOCAL_CACHE_SECONDS)
+    return state['revenue']
+
+
+def classify(revenue, thresholds):
+    """
+    Rank revenues in descending order and assign tiers by cumulative share
+    in one vectorized pass. A product whose own revenue crosses a threshold
+    still belongs to the higher tier. Returns the ranking order, the shares,
+    the cumulative shares and the tier index per ranked position.
+    """
+    total = revenue.sum()
+    order = np.lexsort((np.arange(len(revenue)), -revenue))
+    ranked = revenue[order]
+    shares = ranked / total if total > 0 else np.zeros_like(ranked)
+    cumulative = np.cumsum(shares)
+    previous = cumulative - shares
+    tiers = np.searchsorted(np.asarray(thresholds), previous, side='right')
+    tiers[ranked <= 0] = len(TIERS) - 1
+    return order, shares, cumulative, tiers
+
+
+def abc_report(queryset, user, days, thresholds, limit, tier=None, today=None):
+    today = today or timezone.localdate()
+    revenue = revenue_by_product(user, days, today)
+
+    products = list(queryset.order_by('id').values_list('id', 'name', 'barcode'))
+    amounts = [revenue.get(product[0], Decimal('0')) for product in products]
+    order, shares, cumulative, tiers = classify(np.array(amounts, dtype=np.float64), thresholds)
+
+    summary = {}
+    for index, name in enumerate(TIERS):
+        members = tiers == index
+        summary[name] = {
+            'products': int(members.sum()),
+            'revenue': sum((amounts[position] for position in order[members].tolist()), Decimal('0')),
+            'share': round(float(shares[members].sum()), 4),
+        }
+
+    results = []
+    for rank, position in enumerate(order.tolist()):
+        if tier and TIERS[tiers[rank]] != tier:
+            continue
+        product_id, name, barcode = products[position]
+        results.append({
+            'id': product_id,
+            'name': name,
+            'barcode': barcode,
+            'revenue': amounts[position],
+            'share': round(float(shares[rank]), 4),
+            'cumulative_share': round(float(cumulative[rank]), 4),
+            'tier': TIERS[tiers[rank]],
+        })
+        if len(results) == limit:
+            break
+
+    return {
+        'start': today - timedelta(days=days - 1),
+        'end': today,
+        'days': days,
+        'thresholds': {'A': thresholds[0], 'B': thresholds[1]},
+        'total_revenue': sum(amounts, Decimal('0')),
+        'products_with_revenue': sum(1 for amount in amounts if amount > 0),
+        'tiers': summary,
+        'results': results,
+    }
@@ -0,0 +1,39 @@
+import json
+import base64
+import binascii
+
+MIN_ID = -2 ** 63
+MAX_ID = 2 ** 63 - 1
+
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padding = '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(token + padding))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor.')
+
+
+def parse_id(value):
+    """
+    An id read from a cursor or a query string, within the signed 64-bit
+    range of the id columns. Raises ValueError otherwise.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError('Invalid id.')
+    value = int(value)
+    if not MIN_ID <= value <= MAX_ID:
+        raise ValueError('Invalid id.')
+    return value
+
+
+def parse_limit(value, default=100, maximum=1000):
+    try:
+        limit = int(value) if value else default
+    except ValueError:
+        return default
+    return max(1, min(limit, maximum))
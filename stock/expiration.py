@@ -0,0 +1,121 @@
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import F
+from django.db.models import Case
+from django.db.models import When
+from django.db.models import Sum
+from django.db.models import Count
+from django.db.models import Value
+from django.db.models import CharField
+from django.db.models import DecimalField
+from django.db.models import ExpressionWrapper
+from django.utils import timezone
+
+from stock.cache import bump_version
+from stock.models import Product
+
+BUCKETS = [
+    ('expired', None),
+    ('today', 0),
+    ('1-3', 3),
+    ('4-7', 7),
+    ('8-14', 14),
+    ('15-30', 30),
+    ('31+', None),
+]
+
+WITHIN_PATTERN = re.compile(r'^(\d+)([dw]?)$')
+MAX_WITHIN_DAYS = 365
+
+value_at_risk = ExpressionWrapper(F('quantity') * F('price_purchased'), output_field=DecimalField(max_digits=20, decimal_places=2))
+
+
+def parse_within(value, default=7):
+    if not value:
+        return default
+    match = WITHIN_PATTERN.match(value.strip().lower())
+    if not match:
+        raise ValueError('Use a number of days such as 7, 7d or 2w.')
+    days = int(match.group(1)) * (7 if match.group(2) == 'w' else 1)
+    if days > MAX_WITHIN_DAYS:
+        raise ValueError(f'The window cannot exceed {MAX_WITHIN_DAYS} days.')
+    return days
+
+
+def bucket_for(days_to_expiry):
+    if days_to_expiry < 0:
+        return 'expired'
+    for name, upper in BUCKETS[1:-1]:
+        if days_to_expiry <= upper:
+            return name
+    return BUCKETS[-1][0]
+
+
+def bucket_expression(today):
+    whens = [When(expiration_date__lt=today, then=Value('expired'))]
+    for name, upper in BUCKETS[1:-1]:
+        whens.append(When(expiration_date__lte=today + timedelta(days=upper), then=Value(name)))
+    return Case(*whens, default=Value(BUCKETS[-1][0]), output_field=CharField())
+
+
+def expiring_report(queryset, within_days, today=None):
+    today = today or timezone.localdate()
+    products = queryset.filter(status=True, expiration_date__isnull=False, expiration_date__lte=today + timedelta(days=within_days))
+
+    totals = {
+        row['bucket']: row
+        for row in products.order_by().annotate(bucket=bucket_expression(today)).values('bucket').annotate(
+            product_count=Count('id'),
+            units=Sum('quantity'),
+            value_at_risk=Sum(value_at_risk),
+        )
+    }
+
+    items = {}
+    for product in products.order_by('expiration_date', 'id').values('id', 'name', 'barcode', 'expiration_date', 'quantity', 'price_purchased'):
+        days_to_expiry = (product['expiration_date'] - today).days
+        items.setdefault(bucket_for(days_to_expiry), []).append({
+            'id': product['id'],
+            'name': product['name'],
+            'barcode': product['barcode'],
+            'expiration_date': product['expiration_date'],
+            'days_to_expiry': days_to_expiry,
+            'quantity': product['quantity'],
+            'value_at_risk': product['quantity'] * product['price_purchased'],
+        })
+
+    buckets = []
+    for name, _ in BUCKETS:
+        if name not in totals:
+            continue
+        buckets.append({
+            'bucket': name,
+            'product_count': totals[name]['product_count'],
+            'units': totals[name]['units'] or 0,
+            'value_at_risk': totals[name]['value_at_risk'] or Decimal('0'),
+            'products': items.get(name, []),
+        })
+
+    return {
+        'today': today,
+        'within_days': within_days,
+        'total_value_at_risk': sum((bucket['value_at_risk'] for bucket in buckets), Decimal('0')),
+        'buckets': buckets,
+    }
+
+
+def deactivate_expired(queryset, today=None, batch_size=1000):
+    today = today or timezone.localdate()
+    expired = queryset.filter(status=True, expiration_date__lt=today).order_by('pk')
+
+    deactivated = 0
+    while True:
+        rows = list(expired.values_list('pk', 'user_id')[:batch_size])
+        if not rows:
+            break
+        deactivated += Product.objects.filter(pk__in=[pk for pk, _ in rows]).update(status=False, updated_at=timezone.now())
+        for user_id in {user_id for _, user_id in rows}:
+            bump_version('products', user_id)
+    return deactivated
@@ -25,6 +25,8 @@ class ProductFilter(filters.FilterSet):
     weight = filters.NumberFilter(lookup_expr='exact')
     dimension = filters.CharFilter(lookup_expr='icontains')
     expiration_date = filters.DateFilter(lookup_expr='exact')
+    expiration_date_after = filters.DateFilter(field_name='expiration_date', lookup_expr='gte')
+    expiration_date_before = filters.DateFilter(field_name='expiration_date', lookup_expr='lte')
     location = filters.CharFilter(lookup_expr='icontains')
     manufacturer = filters.CharFilter(lookup_expr='icontains')
     supplier = filters.CharFilter(lookup_expr='icontains')
@@ -36,7 +38,7 @@ class ProductFilter(filters.FilterSet):
 
     class Meta:
         model = Product
-        fields = ['name', 'description', 'barcode', 'weight', 'category', 'dimension', 'expiration_date', 'location', 'manufacturer', 'supplier','status', 'price', 'quantity', 'created_at']
+        fields = ['name', 'description', 'barcode', 'weight', 'category', 'dimension', 'expiration_date', 'expiration_date_after', 'expiration_date_before', 'location', 'manufacturer', 'supplier','status', 'price', 'quantity', 'created_at']
 
 class CategoryFilter(filters.FilterSet):
     name = filters.CharFilter(lookup_expr='icontains')
@@ -0,0 +1,178 @@
+import math
+from datetime import time
+from datetime import datetime
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from stock.models import Transaction
+
+DEFAULT_HISTORY_DAYS = 90
+MAX_HISTORY_DAYS = 365
+DEFAULT_WINDOW_DAYS = 28
+DEFAULT_LEAD_TIME_DAYS = 7
+DEFAULT_REVIEW_DAYS = 7
+DEFAULT_SERVICE_LEVEL = 0.95
+DEFAULT_ALPHA = 0.3
+
+PARAMETERS = {
+    'days': (int, DEFAULT_HISTORY_DAYS, 1, MAX_HISTORY_DAYS),
+    'window': (int, DEFAULT_WINDOW_DAYS, 1, MAX_HISTORY_DAYS),
+    'lead_time': (int, DEFAULT_LEAD_TIME_DAYS, 0, MAX_HISTORY_DAYS),
+    'review_days': (int, DEFAULT_REVIEW_DAYS, 0, MAX_HISTORY_DAYS),
+    'service_level': (float, DEFAULT_SERVICE_LEVEL, 0.5, 0.999),
+    'alpha': (float, DEFAULT_ALPHA, 0.01, 1.0),
+}
+
+
+def parse_parameters(query_params):
+    """
+    Read the forecasting parameters from the query string, raising a
+    ValueError keyed by the offending parameter.
+    """
+    parameters = {}
+    for name, (cast, default, minimum, maximum) in PARAMETERS.items():
+        value = query_params.get(name)
+        try:
+            parameters[name] = cast(value) if value else default
+        except ValueError:
+            raise ValueError(name, f'Must be a number between {minimum} and {maximum}.')
+        if not minimum <= parameters[name] <= maximum:
+            raise ValueError(name, f'Must be a number between {minimum} and {maximum}.')
+    return parameters
+
+
+def dense_sales(product_ids, rows, start, days):
+    """
+    Scatter (product, day, units) rows into a products x days float32
+    matrix. Rows follow the sorted `product_ids` array and column 0 is
+    `start`; rows for other products or days are dropped.
+    """
+    if not len(product_ids) or not rows:
+        return np.zeros((len(product_ids), days), dtype=np.float32)
+
+    count = len(rows)
+    day_offsets = {start + timedelta(days=offset): offset for offset in range(days)}
+    products = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+    offsets = np.fromiter((day_offsets.get(row[1], -1) for row in rows), dtype=np.int64, count=count)
+    units = np.fromiter((row[2] for row in rows), dtype=np.float32, count=count)
+
+    positions = np.minimum(np.searchsorted(product_ids, products), len(product_ids) - 1)
+    known = (product_ids[positions] == products) & (offsets >= 0)
+    sales = np.zeros((len(product_ids), days), dtype=np.float32)
+    np.add.at(sales, (positions[known], offsets[known]), units[known])
+    return sales
+
+
+def daily_sales(user, product_ids, start, days):
+    """
+    Units sold per product and day since `start`, fetched in one grouped
+    query. Transactions of cancelled orders are not counted.
+    """
+    if not len(product_ids):
+        return dense_sales(product_ids, [], start, days)
+
+    rows = (
+        Transaction.objects.filter(user=user, created_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+        .exclude(order__status=False)
+        .annotate(day=TruncDate('created_at'))
+        .values_list('product', 'day')
+        .annotate(units=Sum('quantity'))
+        .order_by()
+    )
+    return dense_sales(product_ids, list(rows), start, days)
+
+
+def smoothing_weights(days, alpha):
+    """
+    Weights that turn simple exponential smoothing, seeded with the first
+    day, into one matrix-vector product over the day axis.
+    """
+    exponents = np.arange(days - 1, -1, -1, dtype=np.float64)
+    weights = alpha * (1 - alpha) ** exponents
+    weights[0] = (1 - alpha) ** (days - 1)
+    return weights.astype(np.float32)
+
+
+def compute_suggestions(sales, quantities, window, lead_time, review_days, service_level, alpha):
+    """
+    Forecast daily demand per product and derive the reorder point and the
+    quantity to order. Every statistic is computed over the whole matrix at
+    once; returns a dict of arrays aligned with the rows of `sales`.
+    """
+    window = min(window, sales.shape[1])
+    recent = sales[:, -window:]
+    moving_average = recent.mean(axis=1)
+    deviation = recent.std(axis=1, ddof=1) if window > 1 else np.zeros(len(sales), dtype=np.float32)
+    smoothed = sales @ smoothing_weights(sales.shape[1], alpha)
+
+    forecast = np.maximum(smoothed, 0)
+    safety_stock = NormalDist().inv_cdf(service_level) * deviation * math.sqrt(lead_time)
+    reorder_point = np.ceil(forecast * lead_time + safety_stock)
+    order_up_to = reorder_point + forecast * review_days
+    needs_reorder = (quantities <= reorder_point) & (order_up_to > 0)
+    reorder_quantity = np.where(needs_reorder, np.ceil(np.maximum(order_up_to - quantities, 0)), 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(forecast > 0, quantities / forecast, np.inf)
+
+    return {
+        'moving_average': moving_average,
+        'forecast': forecast,
+        'deviation': deviation,
+        'safety_stock': safety_stock,
+        'reorder_point': reorder_point,
+        'reorder_quantity': reorder_quantity,
+        'days_of_cover': days_of_cover,
+        'needs_reorder': needs_reorder,
+    }
+
+
+def reorder_suggestions(queryset, user, days, window, lead_time, review_days, service_level, alpha, limit, today=None):
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+
+    products = list(queryset.filter(status=True).order_by('id').values_list('id', 'name', 'barcode', 'quantity', 'quantity_min'))
+    product_ids = np.fromiter((row[0] for row in products), dtype=np.int64, count=len(products))
+    quantities = np.fromiter((row[3] for row in products), dtype=np.float32, count=len(products))
+
+    sales = daily_sales(user, product_ids, start, days)
+    result = compute_suggestions(sales, quantities, window, lead_time, review_days, service_level, alpha)
+
+    candidates = np.flatnonzero(result['needs_reorder'])
+    candidates = candidates[np.lexsort((candidates, result['days_of_cover'][candidates]))][:limit]
+    suggestions = []
+    for index in candidates.tolist():
+        product_id, name, barcode, quantity, quantity_min = products[index]
+        suggestions.append({
+            'id': product_id,
+            'name': name,
+            'barcode': barcode,
+            'quantity': quantity,
+            'quantity_min': quantity_min,
+            'moving_average': round(float(result['moving_average'][index]), 2),
+            'forecast': round(float(result['forecast'][index]), 2),
+            'deviation': round(float(result['deviation'][index]), 2),
+            'safety_stock': round(float(result['safety_stock'][index]), 2),
+            'reorder_point': int(result['reorder_point'][index]),
+            'reorder_quantity': int(result['reorder_quantity'][index]),
+            'days_of_cover': round(float(result['days_of_cover'][index]), 1) if np.isfinite(result['days_of_cover'][index]) else None,
+        })
+
+    return {
+        'start': start,
+        'end': today,
+        'parameters': {
+            'days': days,
+            'window': window,
+            'lead_time': lead_time,
+            'review_days': review_days,
+            'service_level': service_level,
+            'alpha': alpha,
+        },
+        'products_analyzed': len(products),
+        'results': suggestions,
+    }
@@ -0,0 +1,76 @@
+import json
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router
+from django.db import IntegrityError
+from django.db.transaction import atomic
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from stock.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def request_fingerprint(request):
+    data = request.data
+    if isinstance(data, QueryDict):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """
+    Honour an `Idempotency-Key` header on `create`.
+
+    The key is inserted in the same transaction as the write, so a
+    concurrent duplicate blocks on the unique (user, key) index until the
+    first request commits, and then replays its stored response instead of
+    running the write again. Failed requests roll the key back with
+    everything else and can be retried with the same key. A key older than
+    IDEMPOTENCY_KEY_TTL_HOURS is used afresh, whether or not
+    `purge_idempotency_keys` has removed it yet.
+    """
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({HEADER: "Must be at most 255 characters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        using = router.db_for_write(IdempotencyKey)
+        with atomic(using=using):
+            try:
+                with atomic(using=using):
+                    record = IdempotencyKey.objects.create(user=request.user, key=key, fingerprint=fingerprint)
+            except IntegrityError:
+                record = IdempotencyKey.objects.get(user=request.user, key=key)
+                if record.created_at >= timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS):
+                    return self.replay(record, fingerprint)
+                record.delete()
+                try:
+                    with atomic(using=using):
+                        record = IdempotencyKey.objects.create(user=request.user, key=key, fingerprint=fingerprint)
+                except IntegrityError:
+                    return self.replay(IdempotencyKey.objects.get(user=request.user, key=key), fingerprint)
+
+            response = super().create(request, *args, **kwargs)
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=['status_code', 'response'])
+        return response
+
+    def replay(self, record, fingerprint):
+        if record.fingerprint != fingerprint:
+            return Response({HEADER: "This key was already used with a different request."}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if record.status_code is None:
+            return Response({HEADER: "A request with this key is still being processed."}, status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+        return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
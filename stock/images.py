@@ -0,0 +1,98 @@
+import io
+import hashlib
+import logging
+import threading
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from PIL import ImageOps
+from PIL import features
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+
+from stock.cache import bump_version
+from stock.models import Product
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'image_thumbnail': (200, 200),
+    'image_medium': (800, 800),
+}
+RENDITION_QUALITY = 82
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_RENDITION_WORKERS, thread_name_prefix='image-renditions')
+    return _executor
+
+
+def schedule_renditions(product_id):
+    get_executor().submit(copy_context().run, process_product_image, product_id)
+
+
+def process_product_image(product_id):
+    try:
+        generate_renditions(product_id)
+    except Exception:
+        logger.exception('Could not generate image renditions for product %s', product_id)
+    finally:
+        connections.close_all()
+
+
+def file_digest(name):
+    digest = hashlib.sha256()
+    with default_storage.open(name, 'rb') as source:
+        for chunk in iter(lambda: source.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+def encode(image, size):
+    rendition = image.copy()
+    rendition.thumbnail(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    if features.check('webp'):
+        rendition.save(buffer, 'WEBP', quality=RENDITION_QUALITY, method=4)
+        return buffer.getvalue(), 'webp'
+    if rendition.mode not in ('RGB', 'L'):
+        rendition = rendition.convert('RGB')
+    rendition.save(buffer, 'JPEG', quality=RENDITION_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue(), 'jpg'
+
+
+def generate_renditions(product_id):
+    source, user_id = Product.objects.filter(pk=product_id).values_list('image', 'user_id').first() or (None, None)
+    if not source:
+        updated = Product.objects.filter(pk=product_id).update(updated_at=timezone.now(), **{field: None for field in RENDITIONS})
+        if updated:
+            bump_version('products', user_id)
+        return updated
+
+    digest = file_digest(source)
+    with default_storage.open(source, 'rb') as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image.load()
+
+    names = {}
+    for field, size in RENDITIONS.items():
+        content, extension = encode(image, size)
+        name = f"products/renditions/{digest}-{field.removeprefix('image_')}.{extension}"
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(content))
+        names[field] = name
+
+    updated = Product.objects.filter(pk=product_id, image=source).update(updated_at=timezone.now(), **names)
+    if updated:
+        bump_version('products', user_id)
+    return updated
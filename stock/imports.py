@@ -0,0 +1,261 @@
+import io
+import csv
+import logging
+import threading
+from itertools import islice
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db import router
+from django.db import connections
+from django.db import IntegrityError
+from django.db.transaction import atomic
+from django.utils import timezone
+
+from stock.cache import bump_version
+from stock.models import Product
+from stock.models import Category
+from stock.models import Supplier
+from stock.models import ImportJob
+from stock.models import Manufacturer
+from stock.models import StockMovement
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+FIELD_COLUMNS = [
+    'name', 'description', 'barcode', 'weight', 'weight_unit', 'dimension', 'expiration_date', 'location',
+    'icon', 'status', 'price_purchased', 'price_sale', 'currency', 'quantity', 'quantity_min', 'quantity_max', 'color',
+]
+NAME_COLUMNS = {
+    'category': Category,
+    'supplier': Supplier,
+    'manufacturer': Manufacturer,
+}
+COLUMNS = FIELD_COLUMNS + list(NAME_COLUMNS)
+FORMATS = ('csv', 'xlsx') if openpyxl is not None else ('csv',)
+MAX_STORED_ERRORS = 100
+BOOLEAN_VALUES = {
+    'true': True, 't': True, 'yes': True, 'y': True, '1': True,
+    'false': False, 'f': False, 'no': False, 'n': False, '0': False,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMPORT_WORKERS, thread_name_prefix='product-import')
+    return _executor
+
+
+def schedule_import(job_id):
+    get_executor().submit(copy_context().run, process_import, job_id)
+
+
+def process_import(job_id):
+    try:
+        run_import(job_id)
+    except Exception as exc:
+        logger.exception('Product import %s failed', job_id)
+        ImportJob.objects.filter(pk=job_id).update(status=ImportJob.FAILED, file='', finished_at=timezone.now(), errors=[{'row': None, 'errors': str(exc)}])
+    finally:
+        connections.close_all()
+
+
+def normalize(header):
+    return str(header or '').strip().lower().replace(' ', '_')
+
+
+def read_rows(file, extension):
+    """
+    Yield every data row as a dict keyed by the normalized header, reading
+    the file as a stream.
+    """
+    if extension == 'xlsx':
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [normalize(cell) for cell in next(rows, ())]
+            for values in rows:
+                yield dict(zip(header, values))
+        finally:
+            workbook.close()
+        return
+
+    reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    header = [normalize(cell) for cell in next(reader, [])]
+    for values in reader:
+        yield dict(zip(header, values))
+
+
+def map_columns(row, mapping):
+    if mapping:
+        row = {mapping.get(column, column): value for column, value in row.items()}
+    return {column: value.strip() if isinstance(value, str) else value for column, value in row.items() if column in COLUMNS}
+
+
+def build_product(user, row):
+    values = {}
+    errors = {}
+    for column in FIELD_COLUMNS:
+        field = Product._meta.get_field(column)
+        raw = row.get(column)
+        if raw is None or raw == '':
+            if not field.blank and not field.has_default():
+                errors[column] = 'This field is required.'
+            continue
+        if isinstance(field, models.BooleanField) and isinstance(raw, str):
+            raw = BOOLEAN_VALUES.get(raw.lower(), raw)
+        elif isinstance(field, models.CharField) and isinstance(raw, float) and raw.is_integer():
+            raw = int(raw)
+        try:
+            values[column] = field.clean(raw, None)
+        except ValidationError as exc:
+            errors[column] = ' '.join(exc.messages)
+    for column, model in NAME_COLUMNS.items():
+        if row.get(column):
+            try:
+                model._meta.get_field('name').clean(str(row[column]), None)
+            except ValidationError as exc:
+                errors[column] = ' '.join(exc.messages)
+    if errors:
+        raise ValidationError(errors)
+
+    product = Product(user=user, **values)
+    if product.quantity_min is not None and product.quantity < product.quantity_min:
+        raise ValidationError({'quantity': 'Quantity must be greater than or equal to quantity_min.'})
+    if product.quantity_max is not None and product.quantity > product.quantity_max:
+        raise ValidationError({'quantity': 'Quantity must be less than or equal to quantity_max.'})
+    product.stock_status = product.get_stock_status()
+    return product
+
+
+def resolve_names(user, model, names):
+    """
+    Map names to ids with one lookup, creating the missing rows in bulk.
+    """
+    if not names:
+        return {}
+    ids = dict(model.objects.filter(user=user, name__in=names).values_list('name', 'id'))
+    missing = names - ids.keys()
+    if missing:
+        model.objects.bulk_create([model(user=user, name=name) for name in missing], ignore_conflicts=True)
+        ids.update(model.objects.filter(user=user, name__in=missing).values_list('name', 'id'))
+    return ids
+
+
+def import_chunk(job, rows, first_row, seen_barcodes):
+    """
+    Validate and insert one chunk of rows. Returns the number of products
+    created and the list of row errors.
+    """
+    user = job.user
+    products = []
+    errors = []
+    for number, row in enumerate(rows, start=first_row):
+        try:
+            product = build_product(user, row)
+        except ValidationError as exc:
+            errors.append({'row': number, 'errors': exc.message_dict})
+            continue
+        if product.barcode in seen_barcodes:
+            errors.append({'row': number, 'errors': {'barcode': ['Duplicate barcode in this file.']}})
+            continue
+        seen_barcodes.add(product.barcode)
+        products.append((number, row, product))
+
+    existing = set(Product.objects.filter(user=user, barcode__in=[product.barcode for _, _, product in products]).values_list('barcode', flat=True))
+    if existing:
+        errors.extend({'row': number, 'errors': {'barcode': ['Product with this barcode already exists for this user.']}} for number, _, product in products if product.barcode in existing)
+        products = [entry for entry in products if entry[2].barcode not in existing]
+    if not products:
+        return 0, errors
+
+    try:
+        created = insert_products(job, products)
+    except IntegrityError:
+        # A product with one of these barcodes was created since the check
+        # above, so insert the rows one at a time to find it.
+        created = []
+        for number, row, product in products:
+            product.pk = None
+            try:
+                created += insert_products(job, [(number, row, product)])
+            except IntegrityError:
+                errors.append({'row': number, 'errors': {'barcode': ['Product with this barcode already exists for this user.']}})
+    return len(created), errors
+
+
+def insert_products(job, products):
+    """
+    Insert (row number, row, product) entries with their related names and
+    stock movements in one transaction. Returns the created products.
+    """
+    user = job.user
+    names = {column: {str(row[column]) for _, row, _ in products if row.get(column)} for column in NAME_COLUMNS}
+    with atomic(using=router.db_for_write(Product)):
+        related = {column: resolve_names(user, model, names[column]) for column, model in NAME_COLUMNS.items()}
+        for _, row, product in products:
+            for column in NAME_COLUMNS:
+                if row.get(column):
+                    setattr(product, f'{column}_id', related[column][str(row[column])])
+
+        created = Product.objects.bulk_create([product for _, _, product in products], batch_size=settings.IMPORT_CHUNK_SIZE)
+        if any(product.pk is None for product in created):
+            ids = dict(Product.objects.filter(user=user, barcode__in=[product.barcode for product in created]).values_list('barcode', 'id'))
+            for product in created:
+                product.pk = ids[product.barcode]
+        StockMovement.objects.bulk_create(
+            [
+                StockMovement(user=user, product_id=product.pk, delta=product.quantity, reason=StockMovement.IMPORT, reference=f'import:{job.pk}')
+                for product in created if product.quantity
+            ],
+            batch_size=settings.IMPORT_CHUNK_SIZE,
+        )
+    return created
+
+
+def run_import(job_id):
+    job = ImportJob.objects.select_related('user').get(pk=job_id)
+    job.status = ImportJob.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    extension = job.file.name.rsplit('.', 1)[-1].lower()
+    seen_barcodes = set()
+    # The uploaded file is only needed while importing, finished or not.
+    try:
+        with job.file.open('rb') as file:
+            rows = (map_columns(row, job.mapping) for row in read_rows(file, extension))
+            first_row = 2
+            while True:
+                chunk = list(islice(rows, settings.IMPORT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                created, errors = import_chunk(job, chunk, first_row, seen_barcodes)
+                first_row += len(chunk)
+
+                job.rows_processed += len(chunk)
+                job.rows_created += created
+                job.rows_failed += len(errors)
+                job.errors.extend(errors[:max(0, MAX_STORED_ERRORS - len(job.errors))])
+                job.save(update_fields=['rows_processed', 'rows_created', 'rows_failed', 'errors'])
+                if created:
+                    bump_version('products', job.user_id)
+    finally:
+        job.file.delete(save=False)
+
+    job.status = ImportJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'file', 'finished_at'])
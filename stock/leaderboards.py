@@ -0,0 +1,97 @@
+from datetime import time
+from datetime import datetime
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.db.transaction import atomic
+from django.utils import timezone
+
+from stock.models import SalesCounter
+from stock.models import Transaction
+
+PERIODS = [period for period, _ in SalesCounter.PERIOD_CHOICES]
+PRODUCT_FIELDS = ['id', 'name', 'barcode', 'price_sale', 'quantity', 'category', 'icon', 'color']
+
+
+def record_order(order, transactions):
+    """
+    Count the units of a newly created order on the day and week
+    leaderboards of the day it was placed. Orders created as cancelled are
+    not counted.
+    """
+    if not order.status:
+        return
+    day = timezone.localdate(order.created_at)
+    sales = {}
+    for transaction in transactions:
+        key = (order.user_id, transaction.product_id, day)
+        sales[key] = sales.get(key, 0) + transaction.quantity
+    SalesCounter.objects.apply_sales(sales)
+
+
+def best_sellers(user, period, day, limit, category=None):
+    """
+    The top `limit` products of the period containing `day`, with their
+    product summaries, read in one query from the ranked counter index.
+    """
+    counters = SalesCounter.objects.filter(user=user, period=period, period_start=SalesCounter.period_start_for(period, day), units__gt=0)
+    if category is not None:
+        counters = counters.filter(product__category=category)
+    rows = counters.order_by('-units', 'product').values('units', *[f'product__{field}' for field in PRODUCT_FIELDS])[:limit]
+
+    return {
+        'period': period,
+        'start': SalesCounter.period_start_for(period, day),
+        'results': [
+            {
+                'rank': rank,
+                'units': row['units'],
+                'product': {field: row[f'product__{field}'] for field in PRODUCT_FIELDS},
+            }
+            for rank, row in enumerate(rows, start=1)
+        ],
+    }
+
+
+def rebuild_counters(user_id=None, days=None, batch_size=1000):
+    """
+    Recompute the counters from the transactions of active orders. With
+    `days`, only the periods starting on or after the week that contains
+    the first of those days are replaced. Returns the number of counters
+    written.
+    """
+    counters = SalesCounter.objects.all()
+    transactions = Transaction.objects.filter(order__status=True)
+    if user_id is not None:
+        counters = counters.filter(user_id=user_id)
+        transactions = transactions.filter(order__user_id=user_id)
+    if days is not None:
+        since = SalesCounter.period_start_for(SalesCounter.WEEK, timezone.localdate() - timedelta(days=days - 1))
+        counters = counters.filter(period_start__gte=since)
+        transactions = transactions.filter(order__created_at__gte=timezone.make_aware(datetime.combine(since, time.min)))
+
+    rows = (
+        transactions.annotate(day=TruncDate('order__created_at'))
+        .values_list('order__user', 'product', 'day')
+        .annotate(units=Sum('quantity'))
+        .order_by()
+    )
+    with atomic(using=counters.db):
+        # Read in the transaction that replaces the counters, not before it,
+        # so sales committed in between are not dropped with the old counters.
+        units = {}
+        for user, product_id, day, quantity in rows.using(counters.db).iterator():
+            for period, start in SalesCounter.periods_for(day):
+                key = (user, period, start, product_id)
+                units[key] = units.get(key, 0) + quantity
+
+        counters.delete()
+        SalesCounter.objects.using(counters.db).bulk_create(
+            [
+                SalesCounter(user_id=user, period=period, period_start=start, product_id=product_id, units=quantity)
+                for (user, period, start, product_id), quantity in units.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(units)
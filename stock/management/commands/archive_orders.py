@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from stock.archive import archive_orders
+from stock.archive import retention_cutoff
+from stock.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = 'Move orders older than ORDER_RETENTION_DAYS and their transactions to the archive tables, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Keep more days than ORDER_RETENTION_DAYS.')
+        parser.add_argument('--user', type=int, help='Only archive the orders of this user id.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @each_shard
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < settings.ORDER_RETENTION_DAYS:
+            raise CommandError('History reads only look in the archive past ORDER_RETENTION_DAYS, --days cannot be lower.')
+        orders, transactions = archive_orders(retention_cutoff(options['days']), batch_size=options['batch_size'], user_id=options['user'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {orders} orders and {transactions} transactions.'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from stock.models import Order
+from stock.models import OrderLine
+from stock.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = 'Build the lines and stored totals of existing orders from their transactions, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only backfill the orders of this user id.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @each_shard
+    def handle(self, *args, **options):
+        orders = Order.objects.order_by('id')
+        if options['user'] is not None:
+            orders = orders.filter(user_id=options['user'])
+
+        synced, last = 0, 0
+        while True:
+            ids = list(orders.filter(id__gt=last).values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            OrderLine.objects.sync(ids, batch_size=options['batch_size'])
+            synced += len(ids)
+            last = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {synced} orders.'))
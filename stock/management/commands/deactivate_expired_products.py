@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from stock.expiration import deactivate_expired
+from stock.models import Product
+from stock.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = 'Deactivate products whose expiration date has passed, in bulk UPDATE batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only deactivate the products of this user id.')
+        parser.add_argument('--date', type=parse_date, help='Treat this ISO date as today.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @each_shard
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['user']:
+            products = products.filter(user_id=options['user'])
+
+        deactivated = deactivate_expired(products, today=options['date'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deactivated {deactivated} expired products.'))
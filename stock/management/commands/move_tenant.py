@@ -0,0 +1,123 @@
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS
+from django.db import IntegrityError
+from django.db import connections
+from django.db.transaction import atomic
+
+from stock.models import TenantPlacement
+from stock.models import Tombstone
+from stock.sharding import copy_user
+from stock.sharding import get_placement
+from stock.sharding import is_tenant_model
+from stock.sharding import placement_key
+from stock.sharding import set_placement
+from stock.sharding import shard_aliases
+
+
+def tenant_tables(user_id, source):
+    """
+    Every tenant model and auto-created many-to-many table with the queryset
+    of the user's rows in the source shard.
+    """
+    for model in apps.get_app_config('stock').get_models():
+        if not is_tenant_model(model):
+            continue
+        yield model, model.objects.using(source).filter(user_id=user_id)
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created:
+                yield through, through.objects.using(source).filter(**{f'{field.m2m_field_name()}__user_id': user_id})
+
+
+class Command(BaseCommand):
+    help = "Move a user's data to another database shard."
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_id', type=int)
+        parser.add_argument('target', help='Alias of the destination shard.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_id, target, batch_size = options['user_id'], options['target'], options['batch_size']
+        if target not in shard_aliases():
+            raise CommandError(f'Unknown shard "{target}".')
+        cache.delete(placement_key(user_id))
+        source, moving = get_placement(user_id)
+        if moving:
+            raise CommandError(f'User {user_id} is already being moved.')
+        if source == target:
+            self.stdout.write(f'User {user_id} already lives on {target}.')
+            return
+
+        # Updating the source fence waits for in-flight writes and refuses
+        # later ones, whatever placement the workers have cached.
+        set_placement(user_id, source, moving=True, fences=[source])
+        try:
+            copy_user(user_id, target)
+            copied = self.copy(user_id, source, target, batch_size)
+            set_placement(user_id, target, moving=True, fences=[source, target])
+        except BaseException:
+            set_placement(user_id, source, moving=False, fences=[source])
+            raise
+
+        # Let cached placements expire so no worker still reads the source.
+        time.sleep(settings.TENANT_PLACEMENT_CACHE_SECONDS)
+        with atomic(using=source):
+            fence = TenantPlacement.objects.using(source).select_for_update().get(user_id=user_id)
+            directory = TenantPlacement.objects.using(DEFAULT_DB_ALIAS).get(user_id=user_id)
+            if {(fence.shard, fence.moving), (directory.shard, directory.moving)} != {(target, True)}:
+                raise CommandError(f'The placement of user {user_id} changed during the move, its rows on {source} were kept.')
+            # Tombstones go last since deleting the other rows records new ones.
+            for model, rows in tenant_tables(user_id, source):
+                if model is not Tombstone and not model._meta.auto_created:
+                    rows.delete()
+            Tombstone.objects.using(source).filter(user_id=user_id).delete()
+        set_placement(user_id, target, moving=False, fences=[target])
+
+        self.stdout.write(self.style.SUCCESS(f'Moved {copied} rows of user {user_id} from {source} to {target}.'))
+
+    def copy(self, user_id, source, target, batch_size):
+        copied = 0
+        models = []
+        try:
+            with atomic(using=target):
+                for model, rows in tenant_tables(user_id, source):
+                    models.append(model)
+                    copied += self.copy_rows(model, rows, target, batch_size)
+                with connections[target].cursor() as cursor:
+                    for sql in connections[target].ops.sequence_reset_sql(no_style(), models):
+                        cursor.execute(sql)
+        except IntegrityError as e:
+            raise CommandError(f'Could not copy user {user_id} to {target}, some ids are already taken there: {e}')
+        return copied
+
+    def copy_rows(self, model, rows, target, batch_size):
+        """
+        Copy the rows in primary key batches, keeping their ids. Insert
+        stamps auto_now fields, so the original values are written back.
+        """
+        stamped = [field.name for field in model._meta.concrete_fields if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+        copied, last = 0, None
+        while True:
+            batch = rows.order_by('pk')
+            if last is not None:
+                batch = batch.filter(pk__gt=last)
+            batch = list(batch[:batch_size])
+            if not batch:
+                return copied
+            original = [[getattr(obj, name) for name in stamped] for obj in batch]
+            model.objects.using(target).bulk_create(batch)
+            if stamped:
+                for obj, values in zip(batch, original):
+                    for name, value in zip(stamped, values):
+                        setattr(obj, name, value)
+                model.objects.using(target).bulk_update(batch, stamped)
+            copied += len(batch)
+            last = batch[-1].pk
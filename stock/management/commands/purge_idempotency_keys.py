@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from stock.models import IdempotencyKey
+from stock.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = 'Delete idempotency keys older than IDEMPOTENCY_KEY_TTL_HOURS, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None, help='Override IDEMPOTENCY_KEY_TTL_HOURS.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @each_shard
+    def handle(self, *args, **options):
+        hours = options['hours'] if options['hours'] is not None else settings.IDEMPOTENCY_KEY_TTL_HOURS
+        expired = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - timedelta(hours=hours))
+
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys.'))
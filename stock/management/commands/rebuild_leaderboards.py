@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from stock.leaderboards import rebuild_counters
+from stock.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the best-seller day and week counters from order history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild the counters of this user id.')
+        parser.add_argument('--days', type=int, help='Only rebuild the periods covering the last N days.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @each_shard
+    def handle(self, *args, **options):
+        written = rebuild_counters(user_id=options['user'], days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} sales counters.'))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from stock.ledger import find_discrepancies
+from stock.models import Product
+from stock.models import StockMovement
+from stock.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = 'Verify Product.quantity against the stock movement ledger.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only reconcile the products of this user id.')
+        parser.add_argument('--fix', action='store_true', help='Record adjustment movements for every discrepancy.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @each_shard
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['user']:
+            products = products.filter(user_id=options['user'])
+
+        discrepancies = 0
+        last_pk = 0
+        while True:
+            batch = list(find_discrepancies(products.filter(pk__gt=last_pk)).values('pk', 'user_id', 'quantity', 'ledger_quantity')[:options['batch_size']])
+            if not batch:
+                break
+            for row in batch:
+                self.stdout.write(f"Product {row['pk']}: quantity={row['quantity']} ledger={row['ledger_quantity']}")
+            if options['fix']:
+                StockMovement.objects.bulk_create([
+                    StockMovement(
+                        user_id=row['user_id'],
+                        product_id=row['pk'],
+                        delta=row['quantity'] - row['ledger_quantity'],
+                        reason=StockMovement.ADJUSTMENT,
+                        reference='reconciliation',
+                    )
+                    for row in batch
+                ])
+            discrepancies += len(batch)
+            last_pk = batch[-1]['pk']
+
+        if discrepancies and not options['fix']:
+            raise CommandError(f'{discrepancies} products do not match the stock ledger.')
+        self.stdout.write(self.style.SUCCESS(f'Reconciled stock, {discrepancies} discrepancies found.'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from stock.ledger import take_snapshots
+from stock.models import Product
+from stock.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = 'Record a stock snapshot for every product with movements since its last snapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only snapshot the products of this user id.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @each_shard
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['user']:
+            products = products.filter(user_id=options['user'])
+
+        created = take_snapshots(products, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recorded {created} stock snapshots.'))
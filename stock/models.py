@@ -1,7 +1,22 @@
+from datetime import timedelta
+
 from django.utils import timezone
 from django.db import models
+from django.db import router
+from django.db.models import Q
+from django.db.models import F
+from django.db.models import Case
+from django.db.models import When
+from django.db.models import Value
+from django.db.models import Sum
+from django.db.models import IntegerField
+from django.db.transaction import atomic
 from django.core.validators import MinValueValidator
 from django.core.validators import MaxValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
+
+from stock.cache import bump_version_on_commit
+from stock.storage import private_storage
 
 class Promotion(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)    
@@ -20,12 +35,45 @@ class Promotion(models.Model):
     products = models.ManyToManyField('Product', related_name='promotions', blank=True)
     categories = models.ManyToManyField('Category', related_name='promotions', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     status = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_promotion_per_user')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'id'], name='promotion_user_id_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='promotion_sync_idx'),
+        ]
     
     def is_active(self):
         return self.start_date <= timezone.now() <= self.end_date
 
+def stock_status_expression(quantity=F('quantity')):
+    return Case(
+        When(quantity_min__isnull=False, quantity_min__gt=quantity, then=Value(Product.STOCK_LOW)),
+        When(quantity_max__isnull=False, quantity_max__lt=quantity, then=Value(Product.STOCK_OVER)),
+        default=Value(Product.STOCK_OK),
+    )
+
+class ProductQuerySet(models.QuerySet):
+    def refresh_stock_status(self):
+        return self.exclude(stock_status=stock_status_expression()).update(
+            stock_status=stock_status_expression(),
+            stock_status_changed_at=timezone.now(),
+        )
+
 class Product(models.Model):
+    STOCK_OK = 'ok'
+    STOCK_LOW = 'low'
+    STOCK_OVER = 'over'
+    STOCK_STATUS_CHOICES = [
+        (STOCK_OK, 'Ok'),
+        (STOCK_LOW, 'Low'),
+        (STOCK_OVER, 'Over'),
+    ]
+
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
     description = models.TextField(max_length=255, blank=True, null=True)
@@ -39,6 +87,8 @@ class Product(models.Model):
     supplier = models.ForeignKey('Supplier', on_delete=models.SET_NULL, blank=True, null=True)
     icon = models.CharField(max_length=50, blank=True, null=True)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image_thumbnail = models.ImageField(upload_to='products/renditions/', blank=True, null=True, editable=False)
+    image_medium = models.ImageField(upload_to='products/renditions/', blank=True, null=True, editable=False)
     status = models.BooleanField(default=True)
     price_purchased = models.DecimalField(max_digits=10, decimal_places=2)
     price_sale = models.DecimalField(max_digits=10, decimal_places=2)
@@ -46,15 +96,40 @@ class Product(models.Model):
     quantity = models.IntegerField(default=0)
     quantity_min = models.IntegerField(blank=True, null=True)
     quantity_max = models.IntegerField(blank=True, null=True)
+    stock_status = models.CharField(max_length=10, choices=STOCK_STATUS_CHOICES, default=STOCK_OK, editable=False)
+    stock_status_changed_at = models.DateTimeField(blank=True, null=True, editable=False)
     color = models.CharField(max_length=50, blank=True, null=True)
     category = models.ForeignKey('Category', on_delete=models.SET_NULL, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProductQuerySet.as_manager()
     
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'barcode'], name='unique_barcode_per_user')
         ]
+        indexes = [
+            models.Index(fields=['user', 'id'], name='product_user_id_idx'),
+            models.Index(fields=['user', 'id'], name='product_active_idx', condition=Q(status=True)),
+            models.Index(fields=['user', 'stock_status_changed_at', 'id'], name='product_reorder_idx', condition=~Q(stock_status='ok')),
+            models.Index(fields=['user', 'expiration_date'], name='product_expiration_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='product_sync_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        stock_status = self.get_stock_status()
+        if stock_status != self.stock_status:
+            self.stock_status = stock_status
+            self.stock_status_changed_at = timezone.now()
+        super().save(*args, **kwargs)
+
+    def get_stock_status(self):
+        if self.quantity_min is not None and self.quantity < self.quantity_min:
+            return self.STOCK_LOW
+        if self.quantity_max is not None and self.quantity > self.quantity_max:
+            return self.STOCK_OVER
+        return self.STOCK_OK
     
     def get_price_with_discount(self):
         if not hasattr(self, '_price_with_discount'):
@@ -69,6 +144,21 @@ class Product(models.Model):
                 self._price_with_discount = max(self._price_with_discount, 0)
         return self._price_with_discount
     
+    def adjust_quantity(self, delta, reason, reference=None):
+        """
+        Apply `delta` in SQL so concurrent adjustments are not lost, record
+        the movement in the same transaction, then reload the quantity.
+        """
+        db = router.db_for_write(Product, instance=self)
+        with atomic(using=db):
+            products = Product.objects.using(db).filter(pk=self.pk)
+            products.update(quantity=F('quantity') + delta, updated_at=timezone.now())
+            products.refresh_stock_status()
+            movement = StockMovement.objects.using(db).create(user_id=self.user_id, product=self, delta=delta, reason=reason, reference=reference)
+            bump_version_on_commit('products', self.user_id, db)
+        self.refresh_from_db(using=db, fields=['quantity', 'stock_status', 'stock_status_changed_at', 'updated_at'])
+        return movement
+    
     def __str__(self):
         return self.name
 
@@ -87,6 +177,10 @@ class Category(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'name'], name='unique_category_per_user')
         ]
+        indexes = [
+            models.Index(fields=['user', 'id'], name='category_user_id_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='category_sync_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -111,6 +205,11 @@ class Manufacturer(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'name'], name='unique_manufacturer_per_user')
         ]
+        indexes = [
+            models.Index(fields=['user', 'id'], name='manufacturer_user_id_idx'),
+            models.Index(fields=['user', 'id'], name='manufacturer_active_idx', condition=Q(status=True)),
+            models.Index(fields=['user', 'updated_at', 'id'], name='manufacturer_sync_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -135,16 +234,94 @@ class Supplier(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'name'], name='unique_supplier_per_user')
         ]
+        indexes = [
+            models.Index(fields=['user', 'id'], name='supplier_user_id_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='supplier_sync_idx'),
+        ]
     
     def __str__(self):
         return self.name
 
+class OrderQuerySet(models.QuerySet):
+    CANCELLED = 'cancelled'
+    ALREADY_CANCELLED = 'already_cancelled'
+    NOT_FOUND = 'not_found'
+    RESTORE_BATCH_SIZE = 500
+
+    def bulk_cancel(self, ids):
+        outcomes = {order_id: self.NOT_FOUND for order_id in ids}
+
+        db = self.db
+        with atomic(using=db):
+            rows = list(self.select_for_update().filter(id__in=ids).order_by().values_list('id', 'status', 'user', 'created_at'))
+            orders = {order_id: active for order_id, active, _, _ in rows}
+            for order_id, active in orders.items():
+                outcomes[order_id] = self.CANCELLED if active else self.ALREADY_CANCELLED
+            cancelled = [order_id for order_id, active in orders.items() if active]
+            if not cancelled:
+                return outcomes
+
+            lines = list(
+                Transaction.objects.using(db).filter(order__in=cancelled)
+                .values('order', 'product', 'product__user')
+                .annotate(quantity=Sum('quantity'))
+                .order_by('product', 'order')
+            )
+            deltas = {}
+            for line in lines:
+                deltas[line['product']] = deltas.get(line['product'], 0) + line['quantity']
+
+            now = timezone.now()
+            product_ids = list(deltas)
+            for start in range(0, len(product_ids), self.RESTORE_BATCH_SIZE):
+                batch = product_ids[start:start + self.RESTORE_BATCH_SIZE]
+                restored = Case(
+                    *[When(id=product_id, then=Value(deltas[product_id])) for product_id in batch],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+                Product.objects.using(db).filter(id__in=batch).update(quantity=F('quantity') + restored, updated_at=now)
+                Product.objects.using(db).filter(id__in=batch).refresh_stock_status()
+
+            StockMovement.objects.using(db).bulk_create([
+                StockMovement(
+                    user_id=line['product__user'],
+                    product_id=line['product'],
+                    delta=line['quantity'],
+                    reason=StockMovement.CANCEL,
+                    reference=f"order:{line['order']}",
+                )
+                for line in lines
+            ])
+            Order.objects.using(db).filter(id__in=cancelled).update(status=False, updated_at=now)
+
+            for user_id in {line['product__user'] for line in lines}:
+                bump_version_on_commit('products', user_id, db)
+            for user_id in {user_id for _, active, user_id, _ in rows if active}:
+                bump_version_on_commit('orders', user_id, db)
+
+            sold_on = {order_id: timezone.localdate(created_at) for order_id, _, _, created_at in rows}
+            sales = {}
+            for line in lines:
+                key = (line['product__user'], line['product'], sold_on[line['order']])
+                sales[key] = sales.get(key, 0) - line['quantity']
+            SalesCounter.objects.using(db).apply_sales(sales, create=False)
+
+        return outcomes
+
 class Order(models.Model):
+    TOTAL_FIELDS = ['total', 'units', 'line_count']
+
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     status = models.BooleanField(default=True)
     transactions = models.ManyToManyField('Transaction')
+    total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    line_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = OrderQuerySet.as_manager()
     
     class Meta:
         constraints = [
@@ -158,8 +335,7 @@ class Order(models.Model):
         if self.pk is None:
             super().save(*args, **kwargs)
             for transaction in self.transactions.all():
-                transaction.product.quantity -= transaction.quantity
-                transaction.product.save()
+                transaction.product.adjust_quantity(-transaction.quantity, StockMovement.SALE, f'order:{self.pk}')
         else:
             super().save(*args, **kwargs)
     
@@ -167,11 +343,8 @@ class Order(models.Model):
         if not self.status:
             raise ValueError("Order has already been cancelled")
 
-        self.status = False
-        for transaction in self.transactions.all():
-            transaction.product.quantity += transaction.quantity
-            transaction.product.save()
-        self.save()
+        Order.objects.using(self._state.db).filter(user_id=self.user_id).bulk_cancel([self.pk])
+        self.refresh_from_db(fields=['status', 'updated_at'])
 
 class Transaction(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
@@ -185,6 +358,289 @@ class Transaction(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'product', 'created_at'], name='unique_transaction_per_user')
         ]
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='transaction_user_created_idx'),
+        ]
     
     def __str__(self):
-        return self.product.name
\ No newline at end of file
+        return self.product.name
+
+class OrderLineQuerySet(models.QuerySet):
+    def sync(self, order_ids, batch_size=1000):
+        """
+        Rebuild the lines and stored totals of the given orders from their
+        linked transactions, in one transaction. Returns the totals by order
+        id as unsaved orders.
+        """
+        order_ids = list(order_ids)
+        if not order_ids:
+            return {}
+
+        db = self.db
+        with atomic(using=db):
+            links = list(
+                Order.transactions.through.objects.using(db).filter(order_id__in=order_ids)
+                .values_list('order_id', 'transaction_id', 'transaction__user', 'transaction__product', 'transaction__quantity', 'transaction__price')
+                .order_by('order_id', 'transaction_id')
+            )
+            self.filter(order_id__in=order_ids).delete()
+            self.bulk_create(
+                [
+                    OrderLine(order_id=order_id, transaction_id=transaction_id, user_id=user_id, product_id=product_id, quantity=quantity, price=price)
+                    for order_id, transaction_id, user_id, product_id, quantity, price in links
+                ],
+                batch_size=batch_size,
+            )
+
+            totals = {order_id: Order(id=order_id, total=0, units=0, line_count=0) for order_id in order_ids}
+            for order_id, _, _, _, quantity, price in links:
+                order = totals[order_id]
+                order.total += price * quantity
+                order.units += quantity
+                order.line_count += 1
+            Order.objects.using(db).bulk_update(totals.values(), Order.TOTAL_FIELDS, batch_size=batch_size)
+        return totals
+
+class OrderLine(models.Model):
+    order = models.ForeignKey('Order', on_delete=models.CASCADE, related_name='lines')
+    transaction = models.ForeignKey('Transaction', on_delete=models.CASCADE, related_name='order_lines')
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    product = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='order_lines')
+    quantity = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    objects = OrderLineQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'transaction'], name='unique_order_line')
+        ]
+
+    def __str__(self):
+        return f'{self.order_id}: {self.product_id} x {self.quantity}'
+
+class StockMovement(models.Model):
+    SALE = 'sale'
+    CANCEL = 'cancel'
+    ADJUSTMENT = 'adjustment'
+    IMPORT = 'import'
+    REASON_CHOICES = [
+        (SALE, 'Sale'),
+        (CANCEL, 'Cancel'),
+        (ADJUSTMENT, 'Adjustment'),
+        (IMPORT, 'Import'),
+    ]
+
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    product = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='movements')
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    reference = models.CharField(max_length=100, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'id'], name='movement_product_id_idx'),
+            models.Index(fields=['product', 'created_at'], name='movement_product_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} {self.delta:+d} ({self.reason})'
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Stock movements are append-only")
+        super().save(*args, **kwargs)
+
+class StockSnapshot(models.Model):
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    product = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='snapshots')
+    quantity = models.IntegerField()
+    last_movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'taken_at'], name='snapshot_product_taken_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} = {self.quantity} @ {self.taken_at}'
+
+class Tombstone(models.Model):
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='tombstone_user_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model}:{self.object_id} deleted @ {self.deleted_at}'
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user')
+        ]
+
+    def __str__(self):
+        return f'{self.key} ({self.status_code})'
+
+class ImportJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    file = models.FileField(upload_to='imports/', storage=private_storage)
+    mapping = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_created = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'{self.file.name} ({self.status})'
+
+    def rows_per_second(self):
+        if self.started_at is None:
+            return None
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else None
+
+class SalesCounterQuerySet(models.QuerySet):
+    UPDATE_BATCH_SIZE = 500
+
+    def apply_sales(self, sales, create=True):
+        """
+        Add units sold to the day and week counters. `sales` maps
+        (user_id, product_id, date) to a unit delta. Missing counters are
+        created first unless `create` is False, as on cancellation where
+        they already exist or were never counted.
+        """
+        deltas = {}
+        for (user_id, product_id, day), units in sales.items():
+            for period, start in SalesCounter.periods_for(day):
+                key = (user_id, period, start, product_id)
+                deltas[key] = deltas.get(key, 0) + units
+        keys = [key for key, units in deltas.items() if units]
+        if not keys:
+            return
+
+        if create:
+            self.bulk_create(
+                [SalesCounter(user_id=user_id, period=period, period_start=start, product_id=product_id) for user_id, period, start, product_id in keys],
+                ignore_conflicts=True,
+            )
+        # Only the counters of the batch are matched, so concurrent orders
+        # lock just the rows they change, always in key order.
+        keys.sort()
+        for offset in range(0, len(keys), self.UPDATE_BATCH_SIZE):
+            batch = keys[offset:offset + self.UPDATE_BATCH_SIZE]
+            matches = [Q(user_id=user_id, period=period, period_start=start, product_id=product_id) for user_id, period, start, product_id in batch]
+            delta = Case(
+                *[When(match, then=Value(deltas[key])) for match, key in zip(matches, batch)],
+                output_field=IntegerField(),
+            )
+            condition = Q()
+            for match in matches:
+                condition |= match
+            self.filter(condition).update(units=F('units') + delta)
+
+class SalesCounter(models.Model):
+    DAY = 'day'
+    WEEK = 'week'
+    PERIOD_CHOICES = [
+        (DAY, 'Day'),
+        (WEEK, 'Week'),
+    ]
+
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    product = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='sales_counters')
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    units = models.IntegerField(default=0)
+
+    objects = SalesCounterQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'period', 'period_start', 'product'], name='unique_sales_counter')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'period', 'period_start', '-units', 'product'], name='sales_counter_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} {self.period} {self.period_start}: {self.units}'
+
+    @classmethod
+    def period_start_for(cls, period, day):
+        return day - timedelta(days=day.weekday()) if period == cls.WEEK else day
+
+    @classmethod
+    def periods_for(cls, day):
+        return [(period, cls.period_start_for(period, day)) for period, _ in cls.PERIOD_CHOICES]
+
+class TenantPlacement(models.Model):
+    user = models.OneToOneField('auth.User', on_delete=models.CASCADE, related_name='placement')
+    shard = models.CharField(max_length=100)
+    moving = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.shard}'
+
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    status = models.BooleanField(default=True)
+    transactions = models.ManyToManyField('ArchivedTransaction', related_query_name='order')
+    total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    line_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='archive_order_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.created_at} - {self.status} (archived)'
+
+class ArchivedTransaction(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    product = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='archived_transactions')
+    quantity = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.product_id} x {self.quantity} (archived)'
@@ -0,0 +1,132 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA = 'replica'
+ANALYTICS = 'analytics'
+
+read_mode = ContextVar('read_mode', default=None)
+pending_pin = ContextVar('pending_pin', default=None)
+
+
+def pin_key(user_id):
+    return f'db:pin:{user_id}'
+
+
+def primary_of(alias):
+    """
+    The primary a replica alias follows, or the alias itself.
+    """
+    for primary, replicas in settings.DATABASE_REPLICAS.items():
+        if alias in replicas:
+            return primary
+    for primary, analytics in settings.DATABASE_ANALYTICS.items():
+        if alias == analytics:
+            return primary
+    return alias
+
+
+def replica_for(alias):
+    """
+    The database to read from instead of the primary `alias` (None meaning
+    the default) in the current read mode. Inside a transaction on the
+    primary the primary is kept so reads see its uncommitted writes.
+    """
+    mode = read_mode.get()
+    if mode is None:
+        return alias
+    primary = alias or DEFAULT_DB_ALIAS
+    if connections[primary].in_atomic_block:
+        return alias
+    if mode == ANALYTICS and primary in settings.DATABASE_ANALYTICS:
+        return settings.DATABASE_ANALYTICS[primary]
+    replicas = settings.DATABASE_REPLICAS.get(primary)
+    return random.choice(replicas) if replicas else alias
+
+
+def select_reads(user_id, method):
+    """
+    Read from the replicas for safe requests, unless the user wrote less
+    than READ_PIN_SECONDS ago. Unsafe requests pin the user to the primary
+    once their response is sent. Tokens are one per user, so the pin is
+    kept per user.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return
+    if method in SAFE_METHODS:
+        if not cache.get(pin_key(user_id)):
+            read_mode.set(REPLICA)
+    else:
+        pending_pin.set(user_id)
+
+
+def pin_writes():
+    user_id = pending_pin.get()
+    if user_id is not None:
+        cache.set(pin_key(user_id), True, settings.READ_PIN_SECONDS)
+
+
+@contextmanager
+def use_analytics():
+    token = read_mode.set(ANALYTICS)
+    try:
+        yield
+    finally:
+        read_mode.reset(token)
+
+
+def analytics_reads(function):
+    """
+    Run a report on the analytics replica. Reports tolerate replication lag,
+    so this applies to writers too.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with use_analytics():
+            return function(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaMiddleware:
+    """
+    Start every request reading from the primary and pin the user to it
+    after a write request has been answered.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode, pin = read_mode.set(None), pending_pin.set(None)
+        try:
+            response = self.get_response(request)
+            pin_writes()
+            return response
+        finally:
+            read_mode.reset(mode)
+            pending_pin.reset(pin)
+
+    async def __acall__(self, request):
+        mode, pin = read_mode.set(None), pending_pin.set(None)
+        try:
+            response = await self.get_response(request)
+            pin_writes()
+            return response
+        finally:
+            read_mode.reset(mode)
+            pending_pin.reset(pin)
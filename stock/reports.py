@@ -0,0 +1,167 @@
+from datetime import time
+from datetime import datetime
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import F
+from django.db.models import Sum
+from django.db.models import Count
+from django.db.models import DecimalField
+from django.db.models import ExpressionWrapper
+from django.db.models.functions import TruncDay
+from django.db.models.functions import ExtractHour
+from django.db.models.functions import ExtractIsoWeekDay
+from django.utils import timezone
+
+from stock.archive import history
+from stock.models import Order
+from stock.models import OrderLine
+from stock.models import Product
+from stock.models import Transaction
+from stock.serializers import ProductSerializer
+from stock.serializers import TransactionSerializer
+from stock.replicas import analytics_reads
+
+VALUATION_DIMENSIONS = {
+    'category': ('category_id', 'category__name'),
+    'supplier': ('supplier_id', 'supplier__name'),
+    'manufacturer': ('manufacturer_id', 'manufacturer__name'),
+    'location': ('location', None),
+}
+
+value_at_cost = ExpressionWrapper(F('quantity') * F('price_purchased'), output_field=DecimalField(max_digits=20, decimal_places=2))
+value_at_sale = ExpressionWrapper(F('quantity') * F('price_sale'), output_field=DecimalField(max_digits=20, decimal_places=2))
+line_revenue = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=20, decimal_places=2))
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+HEATMAP_DEFAULT_DAYS = 28
+
+
+def inventory_valuation(queryset):
+    metrics = {
+        'product_count': Count('id'),
+        'units': Sum('quantity'),
+        'value_at_cost': Sum(value_at_cost),
+        'value_at_sale': Sum(value_at_sale),
+    }
+
+    breakdowns = {}
+    for dimension, (key, label) in VALUATION_DIMENSIONS.items():
+        fields = [key, label] if label else [key]
+        rows = queryset.order_by().values(*fields).annotate(**metrics).order_by('-value_at_cost', key)
+        breakdowns[dimension] = [
+            {
+                **({'id': row[key], 'name': row[label]} if label else {'name': row[key]}),
+                'product_count': row['product_count'],
+                'units': row['units'] or 0,
+                'value_at_cost': row['value_at_cost'] or Decimal('0'),
+                'value_at_sale': row['value_at_sale'] or Decimal('0'),
+            }
+            for row in rows
+        ]
+
+    groups = breakdowns['category']
+    return {
+        'total': {
+            'product_count': sum(row['product_count'] for row in groups),
+            'units': sum(row['units'] for row in groups),
+            'value_at_cost': sum((row['value_at_cost'] for row in groups), Decimal('0')),
+            'value_at_sale': sum((row['value_at_sale'] for row in groups), Decimal('0')),
+        },
+        **breakdowns,
+    }
+
+
+@analytics_reads
+def build_fast_report(user):
+    one_week_ago = timezone.now() - timezone.timedelta(days=7)
+    orders = Order.objects.filter(user=user, created_at__gte=one_week_ago)
+
+    totals = orders.aggregate(total_earned=Sum('total'), total_transactions=Sum('units'), number_of_orders=Count('id'))
+    total_earned = totals['total_earned'] or 0
+    total_transactions = totals['total_transactions'] or 0
+    number_of_orders = totals['number_of_orders']
+    average_earnings_per_order = total_earned / number_of_orders if number_of_orders > 0 else 0
+
+    lines = OrderLine.objects.filter(order__in=orders)
+    product_sales = lines.values('product').annotate(total_sold=Sum('quantity')).order_by('-total_sold').first()
+    most_sold_product = Product.objects.get(id=product_sales['product']) if product_sales else None
+
+    transactions_by_day = {}
+    daily_transactions = Transaction.objects.filter(order_lines__order__in=orders).annotate(day=TruncDay('created_at')).order_by('day')
+    for transaction in daily_transactions:
+        day_name = transaction.created_at.strftime('%A').lower()
+        if day_name not in transactions_by_day:
+            transactions_by_day[day_name] = []
+        transactions_by_day[day_name].append(TransactionSerializer(transaction).data)
+
+    order_lines = {}
+    for line in lines.values('order', 'product__name', 'quantity', 'price').order_by('order', 'id'):
+        order_lines.setdefault(line.pop('order'), []).append(line)
+
+    weekly_sales = []
+    for order_id, created_at in orders.values_list('id', 'created_at'):
+        weekly_sales.append({
+            'order_id': order_id,
+            'created_at': created_at,
+            'transactions': order_lines.get(order_id, []),
+        })
+
+    different_days = 7
+    daily_average = total_transactions / different_days if different_days > 0 else 0
+
+    report = {
+        'total_earned': total_earned,
+        'total_transactions': total_transactions,
+        'number_of_orders': number_of_orders,
+        'average_earnings_per_order': average_earnings_per_order,
+        'most_sold_product': ProductSerializer(most_sold_product).data if most_sold_product else None,
+        'daily_transactions_average': daily_average,
+        'sales_last_week': weekly_sales,
+        'transactions_by_day': transactions_by_day,
+    }
+
+    return report
+
+
+@analytics_reads
+def build_sales_heatmap(user, start, end, tzinfo):
+    """
+    Units and revenue of active orders placed between `start` and `end`
+    (inclusive dates in `tzinfo`), bucketed by ISO weekday and hour in the
+    database. The matrices are always 7 x 24, Monday first. Archived orders
+    are included when the range reaches past the retention horizon.
+    """
+    since = timezone.make_aware(datetime.combine(start, time.min), tzinfo)
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tzinfo)
+
+    def build(orders, transactions):
+        return (
+            transactions.objects.filter(order__user=user, order__status=True, order__created_at__gte=since, order__created_at__lt=until)
+            .annotate(
+                weekday=ExtractIsoWeekDay('order__created_at', tzinfo=tzinfo),
+                hour=ExtractHour('order__created_at', tzinfo=tzinfo),
+            )
+            .values_list('weekday', 'hour')
+            .annotate(units=Sum('quantity'), revenue=Sum(line_revenue))
+            .order_by()
+        )
+
+    rows = history(build, since)
+
+    units = [[0] * 24 for _ in WEEKDAYS]
+    revenue = [[Decimal('0')] * 24 for _ in WEEKDAYS]
+    for weekday, hour, quantity, amount in rows:
+        units[weekday - 1][hour] += quantity or 0
+        revenue[weekday - 1][hour] += amount or Decimal('0')
+
+    return {
+        'start': start,
+        'end': end,
+        'timezone': str(tzinfo),
+        'weekdays': WEEKDAYS,
+        'units': units,
+        'revenue': revenue,
+        'total_units': sum(map(sum, units)),
+        'total_revenue': sum((sum(row, Decimal('0')) for row in revenue), Decimal('0')),
+    }
@@ -1,26 +1,91 @@
 from rest_framework import serializers
 
 from django.contrib.auth.models import User
+from django.db import router
+from django.db import connections
+from django.db import IntegrityError
+from django.db.transaction import atomic
 from .models import Product, Promotion
 from .models import Supplier
 from .models import Category
 from .models import Manufacturer
 from .models import Order
+from .models import OrderLine
 from .models import Transaction
+from .models import ImportJob
+from .imports import COLUMNS
+from .imports import FORMATS
 
-class PromotionSerializer(serializers.ModelSerializer):
+class UniqueConstraintListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        """
+        Create every item in one transaction, collecting the unique constraint
+        errors by position and rolling the whole batch back if any item fails.
+        """
+        with atomic(using=router.db_for_write(self.child.Meta.model)):
+            instances = []
+            errors = []
+            for attrs in validated_data:
+                try:
+                    instances.append(self.child.create(attrs))
+                    errors.append({})
+                except serializers.ValidationError as exc:
+                    errors.append(exc.detail)
+            if any(errors):
+                raise serializers.ValidationError(errors)
+        return instances
+
+class UniqueConstraintMixin:
+    """
+    Let the database enforce the model's unique constraints instead of
+    querying for duplicates before every write. A violation is mapped back to
+    the field error declared in `unique_errors` for that constraint.
+    """
+    unique_errors = {}
+
+    def create(self, validated_data):
+        return self.save_unique(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self.save_unique(super().update, instance, validated_data, instance=instance)
+
+    def save_unique(self, save, *args, instance=None):
+        validated_data = args[-1]
+        using = router.db_for_write(self.Meta.model, instance=instance)
+        try:
+            if connections[using].in_atomic_block:
+                with atomic(using=using):
+                    return save(*args)
+            return save(*args)
+        except IntegrityError:
+            error = self.unique_error(validated_data, instance)
+            if error is None:
+                raise
+            raise serializers.ValidationError(error)
+
+    def unique_error(self, validated_data, instance=None):
+        model = self.Meta.model
+        for constraint in model._meta.constraints:
+            if constraint.name not in self.unique_errors:
+                continue
+            lookup = {field: validated_data[field] if field in validated_data else getattr(instance, field, None) for field in constraint.fields}
+            queryset = model._default_manager.filter(**lookup)
+            if instance is not None:
+                queryset = queryset.exclude(pk=instance.pk)
+            if queryset.exists():
+                return {field: [message] for field, message in self.unique_errors[constraint.name].items()}
+        return None
+
+class PromotionSerializer(UniqueConstraintMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.id')
+    unique_errors = {'unique_promotion_per_user': {"name": "Promotion with this name already exists for this user."}}
 
     class Meta:
         model = Promotion
         fields = '__all__'
+        list_serializer_class = UniqueConstraintListSerializer
 
     def validate(self, data):
-        user = self.context['request'].user
-        name = data.get('name')
-        if Promotion.objects.filter(user=user, name=name).exists():
-            raise serializers.ValidationError({"name": "Promotion with this name already exists for this user."})
-        
         start_date = data.get('start_date')
         end_date = data.get('end_date')
         if start_date and end_date and start_date > end_date:
@@ -37,82 +102,70 @@ class UserSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         return User.objects.create_user(**validated_data)
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(UniqueConstraintMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.id')
     price_sale = serializers.FloatField()
     price_purchased = serializers.FloatField()
     weight = serializers.FloatField()
+    unique_errors = {'unique_barcode_per_user': {"barcode": "Product with this barcode already exists for this user."}}
 
     class Meta:
         model = Product
         fields = '__all__'
+        list_serializer_class = UniqueConstraintListSerializer
     
     def validate(self, data):
-        user = self.context['request'].user
-        barcode = data.get('barcode')
-        
-        if Product.objects.filter(user=user, barcode=barcode).exists():
-            raise serializers.ValidationError({"barcode": "Product with this barcode already exists for this user."})
-        
         quantity = data.get('quantity')
         quantity_min = data.get('quantity_min')
         quantity_max = data.get('quantity_max')
 
-        if quantity_min is not None and quantity < quantity_min:
+        if quantity is not None and quantity_min is not None and quantity < quantity_min:
             raise serializers.ValidationError({'quantity': 'Quantity must be greater than or equal to quantity_min.'})
-        if quantity_max is not None and quantity > quantity_max:
+        if quantity is not None and quantity_max is not None and quantity > quantity_max:
             raise serializers.ValidationError({'quantity': 'Quantity must be less than or equal to quantity_max.'})
 
         return data
 
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(UniqueConstraintMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.id')
+    unique_errors = {'unique_supplier_per_user': {"name": "Supplier with this field already exists for this user."}}
 
     class Meta:
         model = Supplier
         fields = '__all__'
-    
-    def validate(self, data):
-        user = self.context['request'].user
-        name = data['name']
-        if Supplier.objects.filter(user=user, name=name).exists():
-            raise serializers.ValidationError({"name": "Supplier with this field already exists for this user."})
-        return data
+        list_serializer_class = UniqueConstraintListSerializer
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(UniqueConstraintMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.id')
+    unique_errors = {'unique_category_per_user': {"name": "Category with this field already exists for this user."}}
 
     class Meta:
         model = Category
         fields = '__all__'
-    
-    def validate(self, data):
-        user = self.context['request'].user
-        name = data['name']
-        if Category.objects.filter(user=user, name=name).exists():
-            raise serializers.ValidationError({"name": "Category with this field already exists for this user."})
-        return data
+        list_serializer_class = UniqueConstraintListSerializer
 
-class ManufacturerSerializer(serializers.ModelSerializer):
+class ManufacturerSerializer(UniqueConstraintMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.id')
+    unique_errors = {'unique_manufacturer_per_user': {"name": "Manufacturer with this field already exists for this user."}}
 
     class Meta:
         model = Manufacturer
         fields = '__all__'
-    
-    def validate(self, data):
-        user = self.context['request'].user
-        name = data['name']
-        if Manufacturer.objects.filter(user=user, name=name).exists():
-            raise serializers.ValidationError({"name": "Manufacturer with this field already exists for this user."})
-        return data
+        list_serializer_class = UniqueConstraintListSerializer
+
+class OrderLineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderLine
+        fields = ['id', 'transaction', 'product', 'quantity', 'price']
 
 class OrderSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.id')
+    lines = OrderLineSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
         fields = '__all__'
+        read_only_fields = Order.TOTAL_FIELDS
     
     def validate(self, data):
         transactions = data.get('transactions')
@@ -134,4 +187,29 @@ class TransactionSerializer(serializers.ModelSerializer):
         if not product:
             raise serializers.ValidationError({"product": "At least one transaction is required."})
         
-        return data
\ No newline at end of file
+        return data
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    user = serializers.ReadOnlyField(source='user.id')
+    file = serializers.FileField(write_only=True)
+    mapping = serializers.JSONField(binary=True, required=False)
+    rows_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = '__all__'
+        read_only_fields = ['status', 'rows_processed', 'rows_created', 'rows_failed', 'errors', 'started_at', 'finished_at']
+
+    def validate_file(self, file):
+        extension = file.name.rsplit('.', 1)[-1].lower()
+        if extension not in FORMATS:
+            raise serializers.ValidationError(f"Supported formats: {', '.join(FORMATS)}.")
+        return file
+
+    def validate_mapping(self, mapping):
+        if not isinstance(mapping, dict):
+            raise serializers.ValidationError("Must be an object mapping file columns to product fields.")
+        unknown = [field for field in mapping.values() if field not in COLUMNS]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown product fields: {', '.join(map(str, unknown))}.")
+        return {str(column).strip().lower().replace(' ', '_'): field for column, field in mapping.items()}
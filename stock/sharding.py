@@ -0,0 +1,259 @@
+import sys
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from asgiref.sync import markcoroutinefunction
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.transaction import atomic
+from django.db.transaction import set_rollback
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+
+from stock.replicas import primary_of
+from stock.replicas import replica_for
+from stock.replicas import select_reads
+
+APP_LABEL = 'stock'
+DIRECTORY_MODELS = {'tenantplacement'}
+
+current_shard = ContextVar('current_shard', default=None)
+write_fence = ContextVar('write_fence', default=None)
+
+
+def shard_aliases():
+    return settings.DATABASE_SHARDS
+
+
+def placement_key(user_id):
+    return f'tenant:shard:{user_id}'
+
+
+def choose_shard(user_id):
+    aliases = shard_aliases()
+    return aliases[zlib.crc32(str(user_id).encode()) % len(aliases)]
+
+
+def copy_user(user_id, alias):
+    """
+    Make sure the shard has a row for the user so foreign keys to auth.User
+    hold there. The copy only carries the id and username; authentication
+    always reads the default database.
+    """
+    if alias == DEFAULT_DB_ALIAS:
+        return
+    username = User.objects.using(DEFAULT_DB_ALIAS).values_list('username', flat=True).get(pk=user_id)
+    User.objects.using(alias).bulk_create([User(id=user_id, username=username, password='!')], ignore_conflicts=True)
+
+
+def get_placement(user_id):
+    """
+    The shard alias and moving flag of a tenant, assigning a shard on first
+    use. With a single shard no lookup is made. Placements are cached for
+    TENANT_PLACEMENT_CACHE_SECONDS, so other workers may act on a stale one
+    for that long; writers check the fence row on their shard instead.
+    """
+    from stock.models import TenantPlacement
+
+    aliases = shard_aliases()
+    if len(aliases) == 1:
+        return aliases[0], False
+
+    placement = cache.get(placement_key(user_id))
+    if placement is None:
+        row, created = TenantPlacement.objects.using(DEFAULT_DB_ALIAS).get_or_create(user_id=user_id, defaults={'shard': choose_shard(user_id)})
+        if created:
+            copy_user(user_id, row.shard)
+            set_placement(user_id, row.shard, fences=[row.shard])
+        placement = (row.shard, row.moving)
+        cache.set(placement_key(user_id), placement, settings.TENANT_PLACEMENT_CACHE_SECONDS)
+    return placement
+
+
+def shard_for_user(user_id):
+    return get_placement(user_id)[0]
+
+
+def set_placement(user_id, alias, moving=False, fences=()):
+    """
+    Record the placement in the directory and in the fence row the tenant
+    has on each of the `fences` shards. Updating a fence row waits for the
+    writes holding it, see open_write_fence().
+    """
+    from stock.models import TenantPlacement
+
+    for db in dict.fromkeys([*fences, DEFAULT_DB_ALIAS]):
+        TenantPlacement.objects.using(db).update_or_create(user_id=user_id, defaults={'shard': alias, 'moving': moving})
+    cache.delete(placement_key(user_id))
+
+
+def open_write_fence(user_id, alias):
+    """
+    Start the transaction of a write request on the tenant's shard and lock
+    the tenant's fence row there, so a move waits for the write to finish
+    and writes started later see the move. Returns whether the fence allows
+    writing to `alias`. TenantMiddleware ends the transaction.
+    """
+    from stock.models import TenantPlacement
+
+    fence = atomic(using=alias)
+    fence.__enter__()
+    write_fence.set((fence, alias))
+    row = TenantPlacement.objects.using(alias).select_for_update().filter(user_id=user_id).values_list('shard', 'moving').first()
+    return row == (alias, False)
+
+
+def close_write_fence(commit=True):
+    entry = write_fence.get()
+    if entry is None:
+        return
+    fence, alias = entry
+    write_fence.set(None)
+    if not commit:
+        set_rollback(True, using=alias)
+    fence.__exit__(*sys.exc_info())
+
+
+@contextmanager
+def use_shard(alias):
+    token = current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        current_shard.reset(token)
+
+
+@contextmanager
+def use_tenant(user_id):
+    with use_shard(shard_for_user(user_id)) as alias:
+        yield alias
+
+
+def each_shard(handle):
+    """
+    Run a management command's handle() once per shard with the shard set
+    as the current tenant database.
+    """
+    def wrapper(self, *args, **options):
+        for alias in shard_aliases():
+            with use_shard(alias):
+                handle(self, *args, **options)
+    return wrapper
+
+
+def is_tenant_model(model):
+    return model._meta.app_label == APP_LABEL and model._meta.model_name not in DIRECTORY_MODELS
+
+
+class TenantRouter:
+    """
+    Send the stock app's tenant tables to the shard of the current tenant.
+    An instance keeps reading the database it was loaded from and writes to
+    its primary. Reads go to a replica when the request allows it.
+    Without a current tenant, as in the admin or the shell, the default
+    database is used. Auth, tokens and placements are read from the default;
+    every database gets the full schema so deletes can cascade anywhere.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not is_tenant_model(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and is_tenant_model(type(instance)) and instance._state.db:
+            return instance._state.db
+        return replica_for(current_shard.get())
+
+    def db_for_write(self, model, **hints):
+        if not is_tenant_model(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and is_tenant_model(type(instance)) and instance._state.db:
+            return primary_of(instance._state.db)
+        return current_shard.get()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_tenant_model(type(obj1)) != is_tenant_model(type(obj2)):
+            return True
+        return None
+
+
+class TenantMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your data is being moved, retry shortly.'
+    default_code = 'tenant_moving'
+
+
+class TenantTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that also selects the tenant's shard for the rest
+    of the request. Writes are refused while the tenant is being moved,
+    whether the cached placement or the fence on the shard says so.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            user_id = result[0].pk
+            alias, moving = get_placement(user_id)
+            if request.method not in SAFE_METHODS:
+                if moving:
+                    raise TenantMoving()
+                if len(shard_aliases()) > 1 and not open_write_fence(user_id, alias):
+                    cache.delete(placement_key(user_id))
+                    raise TenantMoving()
+            current_shard.set(alias)
+            select_reads(user_id, request.method)
+        return result
+
+
+class TenantMiddleware:
+    """
+    Start every request without a tenant and drop the one selected during
+    authentication when the response is returned, so it cannot leak into the
+    next request served by the same thread. The write fence opened during
+    authentication is committed here, or rolled back on a server error.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, fence = current_shard.set(None), write_fence.set(None)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            close_write_fence(commit=False)
+            raise
+        else:
+            close_write_fence(commit=response.status_code < 500)
+            return response
+        finally:
+            current_shard.reset(token)
+            write_fence.reset(fence)
+
+    async def __acall__(self, request):
+        token, fence = current_shard.set(None), write_fence.set(None)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await sync_to_async(close_write_fence)(commit=False)
+            raise
+        else:
+            await sync_to_async(close_write_fence)(commit=response.status_code < 500)
+            return response
+        finally:
+            current_shard.reset(token)
+            write_fence.reset(fence)
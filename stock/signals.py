@@ -0,0 +1,189 @@
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from django.db.models import QuerySet
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from datetime import timedelta
+
+from stock.cache import bump_version_on_commit
+from stock.classification import SETTLE_SECONDS
+from stock.sharding import placement_key
+from stock.sharding import shard_aliases
+from stock.models import Order
+from stock.models import OrderLine
+from stock.models import Product
+from stock.models import Category
+from stock.models import Supplier
+from stock.models import Promotion
+from stock.models import Tombstone
+from stock.models import Transaction
+from stock.models import Manufacturer
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_delete, sender=Manufacturer)
+def invalidate_product_reports(sender, instance, using, **kwargs):
+    bump_version_on_commit('products', instance.user_id, using)
+
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def invalidate_promotions(sender, instance, using, **kwargs):
+    bump_version_on_commit('promotions', instance.user_id, using)
+
+
+def deleted_with_user(origin):
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is User
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=Promotion)
+@receiver(post_delete, sender=Manufacturer)
+def record_tombstone(sender, instance, origin=None, using=None, **kwargs):
+    if deleted_with_user(origin):
+        return
+    Tombstone.objects.using(using).create(user_id=instance.user_id, model=sender._meta.model_name, object_id=instance.pk)
+
+
+@receiver(m2m_changed, sender=Promotion.products.through)
+@receiver(m2m_changed, sender=Promotion.categories.through)
+def touch_promotion_links(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """
+    A promotion's payload lists its products and categories, so editing
+    them from either side must move the promotion in the sync feed.
+    Clearing from the product or category side loses the promotion ids,
+    so those promotions are touched before the clear.
+    """
+    if not reverse:
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        Promotion.objects.using(using).filter(pk=instance.pk).update(updated_at=timezone.now())
+    elif action == 'pre_clear':
+        instance.promotions.using(using).update(updated_at=timezone.now())
+    elif action in ('post_add', 'post_remove'):
+        Promotion.objects.using(using).filter(pk__in=pk_set).update(updated_at=timezone.now())
+    else:
+        return
+    bump_version_on_commit('promotions', instance.user_id, using)
+
+
+@receiver(pre_delete, sender=Product)
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Supplier)
+@receiver(pre_delete, sender=Manufacturer)
+def touch_unlinked_rows(sender, instance, using, origin=None, **kwargs):
+    """
+    Deleting a category, supplier or manufacturer nulls the products' key
+    to it, and deleting a product or category drops it from promotions,
+    without saving either. They are touched so the sync feed sends them
+    again.
+    """
+    if deleted_with_user(origin):
+        return
+    now = timezone.now()
+    if sender is not Product:
+        Product.objects.using(using).filter(**{sender._meta.model_name: instance}).update(updated_at=now)
+    if sender in (Product, Category) and instance.promotions.using(using).update(updated_at=now):
+        bump_version_on_commit('promotions', instance.user_id, using)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Transaction)
+def invalidate_edited_orders(sender, instance, created, using, **kwargs):
+    if not created:
+        bump_version_on_commit('orders', instance.user_id, using)
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Transaction)
+def invalidate_deleted_orders(sender, instance, using, **kwargs):
+    bump_version_on_commit('orders', instance.user_id, using)
+
+
+@receiver(m2m_changed, sender=Order.transactions.through)
+def invalidate_order_lines(sender, instance, action, reverse, using, **kwargs):
+    """
+    Lines set while an order is being created are picked up by the
+    incremental revenue merge; later changes to settled orders are not.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        bump_version_on_commit('orders', instance.user_id, using)
+    elif action != 'post_add' or instance.created_at < timezone.now() - timedelta(seconds=SETTLE_SECONDS):
+        bump_version_on_commit('orders', instance.user_id, using)
+
+
+@receiver(m2m_changed, sender=Order.transactions.through)
+def sync_order_lines(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """
+    Keep the order lines and stored totals in step with the linked
+    transactions. Clearing from the transaction side loses the order ids,
+    so they are read before the clear.
+    """
+    if action == 'pre_clear' and reverse:
+        instance._cleared_order_ids = list(instance.order_set.using(using).values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        order_ids = [instance.pk]
+    elif action == 'post_clear':
+        order_ids = instance.__dict__.pop('_cleared_order_ids', [])
+    else:
+        order_ids = pk_set
+    totals = OrderLine.objects.using(using).sync(order_ids)
+    if not reverse:
+        for field in Order.TOTAL_FIELDS:
+            setattr(instance, field, getattr(totals[instance.pk], field))
+
+
+@receiver(post_save, sender=Transaction)
+def sync_edited_transaction(sender, instance, created, using, **kwargs):
+    if not created:
+        order_ids = OrderLine.objects.using(using).filter(transaction=instance).values_list('order', flat=True)
+        OrderLine.objects.using(using).sync(set(order_ids))
+
+
+@receiver(pre_delete, sender=Transaction)
+def collect_deleted_transaction_orders(sender, instance, using, origin=None, **kwargs):
+    """
+    The links of a deleted transaction are gone by post_delete, so the
+    orders to re-sync are read before. Orders deleted with their user need
+    no totals.
+    """
+    if not deleted_with_user(origin):
+        instance._order_ids = list(Order.transactions.through.objects.using(using).filter(transaction_id=instance.pk).values_list('order_id', flat=True))
+
+
+@receiver(post_delete, sender=Transaction)
+def sync_deleted_transaction(sender, instance, using, **kwargs):
+    OrderLine.objects.using(using).sync(instance.__dict__.pop('_order_ids', []))
+
+
+@receiver(post_delete, sender=User)
+def delete_tenant_shards(sender, instance, using, **kwargs):
+    """
+    Deleting a user only cascades on the default database; drop the copies
+    kept in the other shards with everything that references them.
+    """
+    if using != DEFAULT_DB_ALIAS:
+        return
+    for alias in shard_aliases():
+        if alias != DEFAULT_DB_ALIAS:
+            User.objects.using(alias).filter(pk=instance.pk).delete()
+    cache.delete(placement_key(instance.pk))
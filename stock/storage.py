@@ -0,0 +1,27 @@
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+class PrivateStorage(FileSystemStorage):
+    """
+    File system storage under PRIVATE_MEDIA_ROOT, outside MEDIA_ROOT, for
+    uploads that must never be served by serve_media. The location follows
+    the setting so tests can point it elsewhere.
+    """
+
+    @property
+    def base_location(self):
+        return settings.PRIVATE_MEDIA_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    @property
+    def base_url(self):
+        return None
+
+
+private_storage = PrivateStorage()
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from stock.bootstrap import SECTIONS
+from stock.cursors import decode_cursor
+from stock.cursors import encode_cursor
+from stock.cursors import parse_id
+from stock.models import Tombstone
+
+TOMBSTONE_SECTIONS = {model._meta.model_name: section for section, (model, _, _) in SECTIONS.items()}
+
+
+def parse_sync_cursor(token):
+    """
+    Decode a sync cursor into the `[updated_at, id]` position of every
+    section plus the last tombstone id. Raises ValueError when invalid.
+    """
+    cursor = decode_cursor(token)
+    if not isinstance(cursor, dict) or not isinstance(cursor.get('deleted'), int):
+        raise ValueError('Invalid cursor.')
+    positions = {'deleted': parse_id(cursor['deleted'])}
+    for section in SECTIONS:
+        position = cursor.get(section)
+        if position is None:
+            continue
+        if not isinstance(position, list) or len(position) != 2 or not isinstance(position[1], int):
+            raise ValueError('Invalid cursor.')
+        updated_at = parse_datetime(position[0]) if isinstance(position[0], str) else None
+        if updated_at is None:
+            raise ValueError('Invalid cursor.')
+        positions[section] = (updated_at, parse_id(position[1]))
+    return positions
+
+
+def build_sync(request, positions, limit):
+    """
+    Return up to `limit` rows per section changed after `positions`, and
+    the ids deleted since then.
+
+    Without positions every row is returned, and only deletions that happen
+    from now on are reported. Rows are paged on `(updated_at, id)` so each
+    section is served from its `<model>_sync_idx` index. Rows and
+    tombstones are stamped before their transaction commits, so only those
+    older than CHANGE_FEED_SETTLE_SECONDS are returned; a later commit can
+    then no longer land behind the cursor.
+    """
+    user = request.user
+    settled = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+    tombstones = Tombstone.objects.filter(user=user, deleted_at__lte=settled)
+    if positions is None:
+        positions = {'deleted': tombstones.aggregate(last=Max('id'))['last'] or 0}
+
+    has_more = False
+    changes = {}
+    next_cursor = {}
+    for section, (model, serializer_class, _) in SECTIONS.items():
+        rows = model.objects.filter(user=user, updated_at__lte=settled)
+        if section in positions:
+            updated_at, last_id = positions[section]
+            rows = rows.filter(updated_at__gte=updated_at).filter(Q(updated_at__gt=updated_at) | Q(id__gt=last_id))
+        rows = list(rows.select_related('user').order_by('updated_at', 'id')[:limit + 1])
+        has_more = has_more or len(rows) > limit
+        rows = rows[:limit]
+        changes[section] = serializer_class(rows, many=True, context={'request': request}).data
+        if rows:
+            next_cursor[section] = [rows[-1].updated_at.isoformat(), rows[-1].id]
+        elif section in positions:
+            next_cursor[section] = [positions[section][0].isoformat(), positions[section][1]]
+
+    tombstones = list(
+        tombstones.filter(id__gt=positions['deleted'])
+        .order_by('id')
+        .values_list('id', 'model', 'object_id')[:limit + 1]
+    )
+    has_more = has_more or len(tombstones) > limit
+    tombstones = tombstones[:limit]
+    deleted = {section: [] for section in SECTIONS}
+    for _, model, object_id in tombstones:
+        deleted[TOMBSTONE_SECTIONS[model]].append(object_id)
+    next_cursor['deleted'] = tombstones[-1][0] if tombstones else positions['deleted']
+
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'next_cursor': encode_cursor(next_cursor),
+        'has_more': has_more,
+    }
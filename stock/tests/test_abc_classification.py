@@ -0,0 +1,127 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+
+from stock.models import Order
+from stock.models import Product
+from stock.models import Transaction
+
+
+class ABCClassificationTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and products whose revenue splits 70/20/8/2.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        self.products = [
+            Product.objects.create(user=self.user, name=f'Product {i}', barcode=str(i), price_purchased=1, price_sale=2, quantity=1000)
+            for i in range(5)
+        ]
+        self.order = self.sell({0: 70, 1: 20, 2: 8, 3: 2})
+
+    def sell(self, quantities, age=timedelta(days=1)):
+        order = Order.objects.create(user=self.user)
+        for index, quantity in quantities.items():
+            order.transactions.add(Transaction.objects.create(user=self.user, product=self.products[index], quantity=quantity, price=1))
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - age)
+        return order
+
+    def get(self, query=''):
+        return self.client.get('/api/products/abc/' + query, HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def tiers(self, response):
+        return {row['id']: row['tier'] for row in response.data['results']}
+
+    def test_tiers_by_cumulative_revenue_share(self):
+        """
+        Test case to verify that products are ranked by revenue and tiered by cumulative share.
+        """
+        response = self.get()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in response.data['results']], [product.id for product in self.products])
+        self.assertEqual(list(self.tiers(response).values()), ['A', 'A', 'B', 'C', 'C'])
+        self.assertEqual(response.data['total_revenue'], Decimal('100'))
+        self.assertEqual(response.data['products_with_revenue'], 4)
+        self.assertEqual(response.data['tiers']['A'], {'products': 2, 'revenue': Decimal('90'), 'share': 0.9})
+        self.assertEqual(response.data['results'][1]['cumulative_share'], 0.9)
+
+        response = self.get('?tier=B')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.products[2].id])
+
+    def test_new_orders_are_merged_incrementally(self):
+        """
+        Test case to verify that only orders after the cached watermark are aggregated on the next request.
+        """
+        self.get()
+        self.sell({4: 500})
+
+        with self.assertNumQueries(4):
+            response = self.get()
+
+        self.assertEqual(response.data['results'][0]['id'], self.products[4].id)
+        self.assertEqual(response.data['total_revenue'], Decimal('600'))
+
+        response = self.get()
+        self.assertEqual(response.data['total_revenue'], Decimal('600'))
+
+    def test_unsettled_and_old_orders_are_excluded(self):
+        """
+        Test case to verify that orders younger than the settle delay or older than the window are not counted.
+        """
+        self.sell({4: 500}, age=timedelta(days=40))
+        self.sell({4: 500}, age=timedelta(seconds=0))
+
+        self.assertEqual(self.get('?days=30').data['total_revenue'], Decimal('100'))
+
+    def test_cancelled_order_invalidates_the_cache(self):
+        """
+        Test case to verify that cancelling an order removes its revenue.
+        """
+        other = self.sell({3: 100})
+        self.assertEqual(self.get().data['total_revenue'], Decimal('200'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.cancel()
+
+        self.assertEqual(self.get().data['total_revenue'], Decimal('100'))
+
+    def test_orders_below_the_watermark_are_counted_by_id(self):
+        """
+        Test case to verify that an order stamped later than an order with a higher id is still counted once.
+        """
+        self.sell({4: 50}, age=timedelta(seconds=0))
+        self.sell({3: 100})
+
+        self.assertEqual(self.get().data['total_revenue'], Decimal('250'))
+        self.assertEqual(self.get().data['total_revenue'], Decimal('250'))
+
+    @override_settings(SHARED_CACHE=False, LOCAL_CACHE_SECONDS=0)
+    def test_per_process_cache_is_not_kept(self):
+        """
+        Test case to verify that with a per-process cache a cancellation whose version bump this process never sees is reflected at once.
+        """
+        other = self.sell({3: 100})
+        self.assertEqual(self.get().data['total_revenue'], Decimal('200'))
+
+        other.cancel()
+
+        self.assertEqual(self.get().data['total_revenue'], Decimal('100'))
+
+    def test_invalid_thresholds(self):
+        """
+        Test case to verify that thresholds out of order are rejected with 400.
+        """
+        response = self.get('?a=0.9&b=0.5')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('thresholds', response.data)
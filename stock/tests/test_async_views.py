@@ -0,0 +1,109 @@
+import os
+import tempfile
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import AsyncClient
+from django.test import TestCase
+from django.test import override_settings
+from django.utils.module_loading import import_string
+from rest_framework import status
+
+from stock.models import Category, Product
+from stock.throttling import LoadSheddingMiddleware
+from clean_stock_api.compression import CompressionMiddleware
+
+
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token, a category and two products.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+
+        self.category = Category.objects.create(user=self.user, name='Drinks')
+        self.cola = Product.objects.create(user=self.user, name='Cola', barcode='cola-1', price_purchased=1, price_sale=2, quantity=3)
+        self.water = Product.objects.create(user=self.user, name='Water', barcode='water-1', price_purchased=1, price_sale=2, quantity=3)
+
+    def get(self, path, **params):
+        return self.client.get(path, params, HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def test_product_list_matches_sync_endpoint(self):
+        """
+        Test case to verify that the async product list returns the same payload as the viewset.
+        """
+        response = self.get('/api/async/products/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), self.get('/api/products/').json())
+
+    def test_product_list_filters(self):
+        """
+        Test case to verify that the async product list applies the product filters.
+        """
+        response = self.get('/api/async/products/', name='wat')
+        self.assertEqual([product['id'] for product in response.json()], [self.water.id])
+
+    def test_product_detail_and_barcode(self):
+        """
+        Test case to verify product lookups by id and by barcode.
+        """
+        self.assertEqual(self.get(f'/api/async/products/{self.cola.id}/').json()['name'], 'Cola')
+        self.assertEqual(self.get('/api/async/products/barcode/water-1/').json()['id'], self.water.id)
+        self.assertEqual(self.get('/api/products/barcode/water-1/').json()['id'], self.water.id)
+        self.assertEqual(self.get('/api/async/products/barcode/missing/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_category_list_and_fast_report(self):
+        """
+        Test case to verify the async category list and fast report.
+        """
+        self.assertEqual(self.get('/api/async/categories/').json()[0]['name'], 'Drinks')
+        response = self.get('/api/async/orders/fast-report/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['number_of_orders'], 0)
+
+    def test_authentication_is_required(self):
+        """
+        Test case to verify that missing or invalid tokens return a 401 UNAUTHORIZED status code.
+        """
+        self.assertEqual(self.client.get('/api/async/products/').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get('/api/async/products/', HTTP_AUTHORIZATION='Token invalid')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json(), {'detail': 'Invalid token.'})
+
+    def test_middleware_chain_is_async_capable(self):
+        """
+        Test case to verify that every configured middleware can run in the ASGI chain without adapting it to sync.
+        """
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(getattr(import_string(path), 'async_capable', False), path)
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    async def test_custom_middleware_hooks_stay_in_the_event_loop(self):
+        """
+        Test case to verify that the load shedding and compression middleware do not run their hooks through sync_to_async under ASGI.
+        """
+        with mock.patch('django.utils.deprecation.sync_to_async', wraps=sync_to_async) as adapted:
+            response = await AsyncClient().get('/api/async/categories/', headers={'Authorization': 'Token ' + self.token, 'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        owners = [type(getattr(call.args[0], '__self__', None)) for call in adapted.call_args_list]
+        self.assertNotIn(LoadSheddingMiddleware, owners)
+        self.assertNotIn(CompressionMiddleware, owners)
+
+    async def test_static_files_are_served_in_the_async_chain(self):
+        """
+        Test case to verify that static files are still served when the middleware chain runs async.
+        """
+        with tempfile.TemporaryDirectory() as static_root:
+            with open(os.path.join(static_root, 'app.css'), 'w') as file:
+                file.write('body {}')
+            with override_settings(STATIC_ROOT=static_root):
+                response = await AsyncClient().get('/static/app.css')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'body {}')
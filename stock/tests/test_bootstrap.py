@@ -0,0 +1,132 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+
+from stock.models import Product
+from stock.models import Category
+from stock.models import Supplier
+from stock.models import Promotion
+
+
+class BootstrapTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and a few records in every section.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        self.category = Category.objects.create(user=self.user, name='Drinks')
+        Supplier.objects.create(user=self.user, name='Supplier')
+        for i in range(3):
+            Product.objects.create(user=self.user, name=f'Product {i}', barcode=str(i), weight=1, price_purchased=1, price_sale=2, category=self.category)
+
+    def get(self, path):
+        return self.client.get(path, HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def test_sections_match_list_endpoints(self):
+        """
+        Test case to verify that every section returns the same data as its own endpoint.
+        """
+        response = self.get('/api/bootstrap/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {'products', 'categories', 'suppliers', 'manufacturers', 'promotions', 'fast_report'})
+        for section in ['products', 'categories', 'suppliers', 'manufacturers', 'promotions']:
+            self.assertEqual(response.data[section]['data'], self.get(f'/api/{section}/').data)
+        self.assertEqual(response.data['fast_report']['data'], self.get('/api/orders/fast-report/').data)
+
+    def test_field_selection(self):
+        """
+        Test case to verify that a section can be limited to some fields and that unknown fields are rejected.
+        """
+        response = self.get('/api/bootstrap/?sections=products,categories&fields[products]=id,name')
+
+        self.assertEqual(set(response.data), {'products', 'categories'})
+        self.assertEqual(response.data['products']['data'][0], {'id': Product.objects.latest('id').id, 'name': 'Product 2'})
+        self.assertIn('icon', response.data['categories']['data'][0])
+
+        response = self.get('/api/bootstrap/?sections=products&fields[products]=id,secret')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields[products]', response.data)
+
+    def test_unknown_section_is_rejected(self):
+        """
+        Test case to verify that unknown sections return a 400 response.
+        """
+        response = self.get('/api/bootstrap/?sections=products,secrets')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unchanged_sections_are_skipped(self):
+        """
+        Test case to verify that sections whose version matches are not sent again, until they change.
+        """
+        first = self.get('/api/bootstrap/?sections=products,fast_report').data
+        query = f"sections=products,fast_report&versions[products]={first['products']['version']}&versions[fast_report]={first['fast_report']['version']}"
+
+        response = self.get(f'/api/bootstrap/?{query}')
+        self.assertEqual(response.data['products'], {'version': first['products']['version'], 'unchanged': True})
+        self.assertEqual(response.data['fast_report'], {'version': first['fast_report']['version'], 'unchanged': True})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(name='Product 0').delete()
+        response = self.get(f'/api/bootstrap/?{query}')
+        self.assertNotEqual(response.data['products']['version'], first['products']['version'])
+        self.assertEqual(len(response.data['products']['data']), 2)
+
+    def test_writes_missed_by_the_counter_change_the_version(self):
+        """
+        Test case to verify that a write whose counter bump this process never sees still changes the version.
+        """
+        first = self.get('/api/bootstrap/?sections=products').data['products']['version']
+
+        Product.objects.filter(name='Product 0').update(name='Renamed', updated_at=timezone.now())
+
+        response = self.get(f'/api/bootstrap/?sections=products&versions[products]={first}')
+        self.assertNotEqual(response.data['products']['version'], first)
+        self.assertIn('Renamed', [product['name'] for product in response.data['products']['data']])
+
+
+    def test_links_and_cascades_change_the_version(self):
+        """
+        Test case to verify that promotion link edits and keys nulled by a delete change the section versions.
+        """
+        promotion = Promotion.objects.create(user=self.user, name='Summer', discount_percentage=10, start_date=timezone.now(), end_date=timezone.now() + timedelta(days=7))
+        product = Product.objects.get(name='Product 0')
+
+        def versions():
+            data = self.get('/api/bootstrap/?sections=products,promotions').data
+            return data['products']['version'], data['promotions']['version']
+
+        before = versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            promotion.products.add(product)
+        after = versions()
+        self.assertEqual(after[0], before[0])
+        self.assertNotEqual(after[1], before[1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertNotEqual(versions()[0], after[0])
+        self.assertIsNone(self.get('/api/bootstrap/?sections=products').data['products']['data'][0]['category'])
+
+
+class BootstrapConcurrencyTest(TransactionTestCase):
+    def test_concurrent_sections_match_sequential(self):
+        """
+        Test case to verify that sections built in worker threads match the per-section endpoints.
+        """
+        user = User.objects.create_user(username='testuser', password='testpass')
+        token = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'}).data['token']
+        category = Category.objects.create(user=user, name='Drinks')
+        Product.objects.create(user=user, name='Product', barcode='1', weight=1, price_purchased=1, price_sale=2, category=category)
+
+        response = self.client.get('/api/bootstrap/', HTTP_AUTHORIZATION='Token ' + token)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['products']['data'], self.client.get('/api/products/', HTTP_AUTHORIZATION='Token ' + token).data)
+        self.assertEqual(response.data['categories']['data'], self.client.get('/api/categories/', HTTP_AUTHORIZATION='Token ' + token).data)
@@ -0,0 +1,86 @@
+import gzip
+import json
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory
+from django.test import TestCase
+from rest_framework import status
+
+from clean_stock_api.compression import CompressionMiddleware
+from clean_stock_api.compression import negotiate
+from stock.models import Product
+
+
+class CompressionTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and enough products for a large listing.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        for i in range(30):
+            Product.objects.create(
+                user=self.user,
+                name=f'Product {i}',
+                barcode=f'barcode-{i}',
+                weight=1,
+                price_purchased=1,
+                price_sale=2,
+            )
+
+    def test_negotiate_honours_quality_values(self):
+        """
+        Test case to verify that the accepted encoding with the highest weight wins and q=0 is refused.
+        """
+        self.assertEqual(negotiate('gzip, deflate', ['br', 'gzip']), 'gzip')
+        self.assertEqual(negotiate('br;q=0.5, gzip;q=0.8', ['br', 'gzip']), 'gzip')
+        self.assertEqual(negotiate('br, gzip', ['br', 'gzip']), 'br')
+        self.assertEqual(negotiate('*;q=0.1', ['gzip']), 'gzip')
+        self.assertIsNone(negotiate('gzip;q=0', ['gzip']))
+        self.assertIsNone(negotiate('', ['gzip']))
+
+    def test_large_json_response_is_gzipped(self):
+        """
+        Test case to verify that a large JSON listing is compressed and decompresses to the identity body.
+        """
+        identity = self.client.get('/api/products/', HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.get('/api/products/', HTTP_AUTHORIZATION='Token ' + self.token, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Content-Encoding', identity)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertLess(len(response.content), len(identity.content))
+        self.assertEqual(json.loads(gzip.decompress(response.content)), json.loads(identity.content))
+
+    def test_small_and_binary_responses_are_not_compressed(self):
+        """
+        Test case to verify that small bodies and binary content types are passed through untouched.
+        """
+        middleware = CompressionMiddleware(lambda request: None)
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+
+        small = middleware.process_response(request, HttpResponse(b'{}', content_type='application/json'))
+        binary = middleware.process_response(request, HttpResponse(b'\x00' * 4096, content_type='image/png'))
+
+        self.assertNotIn('Content-Encoding', small)
+        self.assertNotIn('Content-Encoding', binary)
+        self.assertEqual(binary.content, b'\x00' * 4096)
+
+    def test_streaming_response_is_compressed_incrementally(self):
+        """
+        Test case to verify that streaming responses are compressed chunk by chunk and their ETag is weakened.
+        """
+        middleware = CompressionMiddleware(lambda request: None)
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        chunks = [b'{"rows": [', b'1, ' * 2000, b'1]}']
+        response = StreamingHttpResponse(iter(chunks), content_type='application/json', headers={'ETag': '"abc"'})
+
+        response = middleware.process_response(request, response)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(chunks))
@@ -0,0 +1,96 @@
+from datetime import datetime
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+
+from stock.forecasting import compute_suggestions
+from stock.forecasting import smoothing_weights
+from stock.models import Order
+from stock.models import Product
+from stock.models import Transaction
+
+
+class ReorderSuggestionsTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and products with a month of daily sales.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        self.fast = Product.objects.create(user=self.user, name='Fast', barcode='1', price_purchased=1, price_sale=2, quantity=20)
+        self.idle = Product.objects.create(user=self.user, name='Idle', barcode='2', price_purchased=1, price_sale=2, quantity=5)
+        self.cancelled = Product.objects.create(user=self.user, name='Cancelled', barcode='3', price_purchased=1, price_sale=2, quantity=5)
+
+        today = timezone.localdate()
+        for days_ago in range(30):
+            self.sell(self.fast, 10, today - timedelta(days=days_ago))
+        order = Order.objects.create(user=self.user, status=False)
+        order.transactions.add(self.sell(self.cancelled, 50, today))
+
+    def sell(self, product, quantity, day):
+        transaction = Transaction.objects.create(user=self.user, product=product, quantity=quantity, price=2)
+        created_at = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=12)
+        Transaction.objects.filter(pk=transaction.pk).update(created_at=created_at)
+        return transaction
+
+    def get(self, query=''):
+        return self.client.get('/api/products/reorder-suggestions/' + query, HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def test_suggests_reorder_from_sales_history(self):
+        """
+        Test case to verify that steady sales produce a reorder point and quantity and idle or cancelled products are left out.
+        """
+        response = self.get('?days=30&lead_time=7&review_days=7')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['products_analyzed'], 3)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.fast.id])
+        suggestion = response.data['results'][0]
+        self.assertEqual(suggestion['moving_average'], 10)
+        self.assertEqual(suggestion['forecast'], 10)
+        self.assertEqual(suggestion['deviation'], 0)
+        self.assertEqual(suggestion['reorder_point'], 70)
+        self.assertEqual(suggestion['reorder_quantity'], 120)
+        self.assertEqual(suggestion['days_of_cover'], 2)
+
+    def test_invalid_parameter(self):
+        """
+        Test case to verify that an out of range parameter is rejected with 400.
+        """
+        response = self.get('?service_level=2')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('service_level', response.data)
+
+
+class ComputeSuggestionsTest(TestCase):
+    def test_smoothing_matches_recursive_definition(self):
+        """
+        Test case to verify that the smoothing weights reproduce the recursive exponential smoothing.
+        """
+        rng = np.random.default_rng(0)
+        sales = rng.poisson(5, size=(4, 60)).astype(np.float32)
+        alpha = 0.3
+
+        level = sales[:, 0].astype(np.float64)
+        for day in range(1, sales.shape[1]):
+            level = alpha * sales[:, day] + (1 - alpha) * level
+
+        np.testing.assert_allclose(sales @ smoothing_weights(sales.shape[1], alpha), level, rtol=1e-4)
+
+    def test_variable_demand_adds_safety_stock(self):
+        """
+        Test case to verify that variable demand raises the reorder point above the expected lead time demand.
+        """
+        sales = np.array([[5, 5, 5, 5], [0, 10, 0, 10]], dtype=np.float32)
+        result = compute_suggestions(sales, np.array([100, 100], dtype=np.float32), window=4, lead_time=4, review_days=0, service_level=0.95, alpha=0.5)
+
+        self.assertEqual(result['safety_stock'][0], 0)
+        self.assertGreater(result['safety_stock'][1], 0)
+        self.assertGreater(result['reorder_point'][1], result['forecast'][1] * 4)
+        self.assertFalse(result['needs_reorder'].any())
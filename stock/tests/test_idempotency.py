@@ -0,0 +1,105 @@
+from io import StringIO
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+
+from stock.models import Order
+from stock.models import Product
+from stock.models import Transaction
+from stock.models import IdempotencyKey
+
+
+class IdempotencyKeyTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token, a product and a transaction to order.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        self.product = Product.objects.create(user=self.user, name='Milk', barcode='milk', price_purchased=1, price_sale=2, quantity=100)
+        self.transaction = Transaction.objects.create(user=self.user, product=self.product, price=2, quantity=5)
+
+    def post(self, path, data, key=None):
+        headers = {'HTTP_AUTHORIZATION': 'Token ' + self.token}
+        if key:
+            headers['HTTP_IDEMPOTENCY_KEY'] = key
+        return self.client.post(path, data, content_type='application/json', **headers)
+
+    def test_retry_replays_original_response(self):
+        """
+        Test case to verify that a retried order with the same key is not created again and gets the same response.
+        """
+        first = self.post('/api/orders/', {'transactions': [self.transaction.id]}, key='order-1')
+        self.product.refresh_from_db()
+        quantity = self.product.quantity
+
+        retry = self.post('/api/orders/', {'transactions': [self.transaction.id]}, key='order-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', first)
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, quantity)
+
+    def test_key_reused_with_different_body(self):
+        """
+        Test case to verify that reusing a key for a different request returns 422.
+        """
+        self.post('/api/transactions/', {'product': self.product.id, 'price': 2, 'quantity': 1}, key='tx-1')
+        response = self.post('/api/transactions/', {'product': self.product.id, 'price': 2, 'quantity': 2}, key='tx-1')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_failed_request_does_not_keep_the_key(self):
+        """
+        Test case to verify that a rejected request leaves no key behind, so it can be retried.
+        """
+        response = self.post('/api/orders/', {'transactions': []}, key='order-2')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        """
+        Test case to verify that requests without the header keep the previous behaviour.
+        """
+        self.post('/api/transactions/', {'product': self.product.id, 'price': 2, 'quantity': 1})
+        self.post('/api/transactions/', {'product': self.product.id, 'price': 2, 'quantity': 1})
+
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_key_is_not_replayed(self):
+        """
+        Test case to verify that a key past the TTL but not purged yet processes the request again instead of replaying it.
+        """
+        first = self.post('/api/transactions/', {'product': self.product.id, 'price': 2, 'quantity': 1}, key='tx-2')
+        IdempotencyKey.objects.filter(key='tx-2').update(created_at=timezone.now() - timedelta(hours=25))
+
+        retry = self.post('/api/transactions/', {'product': self.product.id, 'price': 2, 'quantity': 3}, key='tx-2')
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', retry)
+        self.assertNotEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(IdempotencyKey.objects.get(key='tx-2').response['id'], retry.json()['id'])
+
+    def test_purge_removes_expired_keys(self):
+        """
+        Test case to verify that the purge command only removes keys older than the TTL.
+        """
+        self.post('/api/transactions/', {'product': self.product.id, 'price': 2, 'quantity': 1}, key='old')
+        self.post('/api/transactions/', {'product': self.product.id, 'price': 2, 'quantity': 1}, key='new')
+        IdempotencyKey.objects.filter(key='old').update(created_at=timezone.now() - timedelta(hours=25))
+
+        call_command('purge_idempotency_keys', stdout=StringIO())
+
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
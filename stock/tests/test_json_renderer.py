@@ -0,0 +1,85 @@
+import io
+import uuid
+import datetime
+from decimal import Decimal
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from stock.models import Product
+from stock.parsers import FastJSONParser
+from stock.renderers import FastJSONRenderer
+
+PAYLOAD = {
+    'decimal': Decimal('12.50'),
+    'utc': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+    'local': datetime.datetime(2024, 5, 1, 12, 30, tzinfo=ZoneInfo('America/Mexico_City')),
+    'naive': datetime.datetime(2024, 5, 1, 12, 30),
+    'date': datetime.date(2024, 5, 1),
+    'time': datetime.time(8, 15),
+    'duration': datetime.timedelta(hours=1, seconds=3),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'lazy': gettext_lazy('Not found.'),
+    'text': 'caf\u00e9 \u2028 \u2029',
+    'nested': [{1: None, 'b': [1.5, True]}],
+}
+
+
+class FastJSONRendererTest(TestCase):
+    def test_output_matches_json_renderer(self):
+        """
+        Test case to verify that Decimal, datetime, UUID and lazy string values render exactly like JSONRenderer.
+        """
+        self.assertEqual(FastJSONRenderer().render(PAYLOAD), JSONRenderer().render(PAYLOAD))
+
+    def test_falls_back_to_json_renderer(self):
+        """
+        Test case to verify that indented output, wide integers and a missing orjson fall back to the stdlib encoder.
+        """
+        renderer = FastJSONRenderer()
+        wide = {'value': 2 ** 70}
+
+        self.assertEqual(renderer.render(wide), JSONRenderer().render(wide))
+        self.assertEqual(renderer.render(PAYLOAD, 'application/json; indent=4'), JSONRenderer().render(PAYLOAD, 'application/json; indent=4'))
+        with mock.patch('stock.renderers.orjson', None):
+            self.assertEqual(renderer.render(PAYLOAD), JSONRenderer().render(PAYLOAD))
+        self.assertEqual(renderer.render(None), b'')
+
+    def test_product_list_matches_json_renderer(self):
+        """
+        Test case to verify that the product list endpoint uses the fast renderer without changing the body.
+        """
+        user = User.objects.create_user(username='testuser', password='testpass')
+        token = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'}).data['token']
+        Product.objects.create(user=user, name='Product', barcode='1', weight=1, price_purchased=1, price_sale=2, expiration_date=timezone.now().date())
+
+        response = self.client.get('/api/products/', HTTP_AUTHORIZATION='Token ' + token)
+
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+
+class FastJSONParserTest(TestCase):
+    def test_parse_matches_json_parser(self):
+        """
+        Test case to verify that bodies orjson accepts and bodies it rejects parse like JSONParser.
+        """
+        for body in [b'{"name": "caf\xc3\xa9", "quantity": 3, "price": 1.25}', b'{"value": 1180591620717411303424}']:
+            self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+    def test_parse_error_message_is_unchanged(self):
+        """
+        Test case to verify that invalid bodies raise the same ParseError as JSONParser.
+        """
+        with self.assertRaises(Exception) as fast:
+            FastJSONParser().parse(io.BytesIO(b'{"name": '))
+        with self.assertRaises(Exception) as stdlib:
+            JSONParser().parse(io.BytesIO(b'{"name": '))
+
+        self.assertEqual(str(fast.exception), str(stdlib.exception))
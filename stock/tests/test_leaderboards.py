@@ -0,0 +1,107 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+
+from stock.leaderboards import best_sellers
+from stock.models import Order
+from stock.models import Product
+from stock.models import Category
+from stock.models import Transaction
+from stock.models import SalesCounter
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and products in two categories.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        self.drinks = Category.objects.create(user=self.user, name='Drinks')
+        self.snacks = Category.objects.create(user=self.user, name='Snacks')
+        self.water = Product.objects.create(user=self.user, name='Water', barcode='1', price_purchased=1, price_sale=2, quantity=100, category=self.drinks)
+        self.juice = Product.objects.create(user=self.user, name='Juice', barcode='2', price_purchased=1, price_sale=2, quantity=100, category=self.drinks)
+        self.chips = Product.objects.create(user=self.user, name='Chips', barcode='3', price_purchased=1, price_sale=2, quantity=100, category=self.snacks)
+
+    def order(self, quantities):
+        transactions = [Transaction.objects.create(user=self.user, product=product, quantity=quantity, price=2).id for product, quantity in quantities]
+        response = self.client.post('/api/orders/', {'transactions': transactions}, content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def get(self, query=''):
+        return self.client.get('/api/products/best-sellers/' + query, HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def ranking(self, response):
+        return [(row['product']['name'], row['units']) for row in response.data['results']]
+
+    def test_orders_update_day_and_week_leaderboards(self):
+        """
+        Test case to verify that created orders are counted on the day and week leaderboards.
+        """
+        self.order([(self.water, 3), (self.chips, 5)])
+        self.order([(self.water, 4), (self.juice, 1)])
+
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ranking(response), [('Water', 7), ('Chips', 5), ('Juice', 1)])
+        self.assertEqual(response.data['results'][0]['rank'], 1)
+        self.assertEqual(response.data['results'][0]['product']['category'], self.drinks.id)
+        self.assertEqual(self.ranking(self.get('?period=week&limit=2')), [('Water', 7), ('Chips', 5)])
+        self.assertEqual(self.ranking(self.get(f'?category={self.drinks.id}')), [('Water', 7), ('Juice', 1)])
+
+    def test_cancelled_orders_are_subtracted(self):
+        """
+        Test case to verify that cancelling an order removes its units from the leaderboards.
+        """
+        self.order([(self.water, 3)])
+        order_id = self.order([(self.water, 4), (self.chips, 5)])
+
+        self.client.post(f'/api/orders/{order_id}/cancel/', HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.assertEqual(self.ranking(self.get()), [('Water', 3)])
+        self.assertEqual(self.ranking(self.get('?period=week')), [('Water', 3)])
+
+    def test_top_n_is_one_query(self):
+        """
+        Test case to verify that the top products and their summaries are read in a single query.
+        """
+        self.order([(self.water, 3), (self.chips, 5), (self.juice, 1)])
+
+        with self.assertNumQueries(1):
+            result = best_sellers(self.user, SalesCounter.DAY, timezone.localdate(), 10)
+
+        self.assertEqual([row['product']['name'] for row in result['results']], ['Chips', 'Water', 'Juice'])
+
+    def test_rebuild_from_history(self):
+        """
+        Test case to verify that the rebuild command recomputes the counters from active orders.
+        """
+        self.order([(self.water, 3)])
+        old_id = self.order([(self.chips, 5)])
+        cancelled_id = self.order([(self.juice, 9)])
+        self.client.post(f'/api/orders/{cancelled_id}/cancel/', HTTP_AUTHORIZATION='Token ' + self.token)
+        yesterday = timezone.now() - timedelta(days=1)
+        Order.objects.filter(pk=old_id).update(created_at=yesterday)
+        SalesCounter.objects.all().delete()
+
+        call_command('rebuild_leaderboards', stdout=StringIO())
+
+        self.assertEqual(self.ranking(self.get()), [('Water', 3)])
+        self.assertEqual(self.ranking(self.get(f'?date={timezone.localdate(yesterday).isoformat()}')), [('Chips', 5)])
+        self.assertFalse(SalesCounter.objects.filter(product=self.juice).exists())
+
+    def test_invalid_period(self):
+        """
+        Test case to verify that an unknown period or an out of range category id is rejected with 400.
+        """
+        response = self.get('?period=month')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get(f'?category={2 ** 70}').status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+from django.test import override_settings
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaServingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(MEDIA_ROOT, 'products', 'renditions'), exist_ok=True)
+        with open(os.path.join(MEDIA_ROOT, 'products', 'photo.png'), 'wb') as file:
+            file.write(b'0123456789' * 10)
+        with open(os.path.join(MEDIA_ROOT, 'products', 'renditions', '0123456789abcdef0123-thumbnail.webp'), 'wb') as file:
+            file.write(b'webp')
+        os.makedirs(os.path.join(MEDIA_ROOT, 'imports'), exist_ok=True)
+        with open(os.path.join(MEDIA_ROOT, 'imports', 'products.csv'), 'wb') as file:
+            file.write(b'name')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_full_response_headers(self):
+        """
+        Test case to verify that media files are served with validators and revalidating cache headers.
+        """
+        response = self.client.get('/media/products/photo.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789' * 10)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_content_hashed_names_are_immutable(self):
+        """
+        Test case to verify that content-hashed renditions get long-lived immutable cache headers.
+        """
+        response = self.client.get('/media/products/renditions/0123456789abcdef0123-thumbnail.webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_conditional_requests(self):
+        """
+        Test case to verify that matching ETag and Last-Modified validators return 304 NOT MODIFIED.
+        """
+        response = self.client.get('/media/products/photo.png')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get('/media/products/photo.png', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/media/products/photo.png', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_range_requests(self):
+        """
+        Test case to verify byte ranges, suffix ranges, If-Range and unsatisfiable ranges.
+        """
+        response = self.client.get('/media/products/photo.png', HTTP_RANGE='bytes=10-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'01234')
+        self.assertEqual(response['Content-Range'], 'bytes 10-14/100')
+        self.assertEqual(response['Content-Length'], '5')
+
+        response = self.client.get('/media/products/photo.png', HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.client.get('/media/products/photo.png', HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/media/products/photo.png', HTTP_RANGE='bytes=200-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_missing_and_traversal_paths(self):
+        """
+        Test case to verify that missing files and paths outside MEDIA_ROOT return 404 NOT FOUND.
+        """
+        self.assertEqual(self.client.get('/media/products/missing.png').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/products/').status_code, 404)
+
+    def test_import_files_are_not_served(self):
+        """
+        Test case to verify that files under the imports directory return 404 NOT FOUND.
+        """
+        self.assertEqual(self.client.get('/media/imports/products.csv').status_code, 404)
+        self.assertEqual(self.client.get('/media/products/../imports/products.csv').status_code, 404)
@@ -0,0 +1,121 @@
+from datetime import time
+from datetime import datetime
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+
+from stock.archive import history
+from stock.models import ArchivedOrder
+from stock.models import ArchivedTransaction
+from stock.models import Order
+from stock.models import Product
+from stock.models import Transaction
+
+
+class OrderArchiveTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and orders on both sides of the retention horizon.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        self.product = Product.objects.create(user=self.user, name='Water', barcode='1', price_purchased=1, price_sale=2, quantity=100)
+
+        self.old_day = timezone.localdate() - timedelta(days=800)
+        self.old = self.sell(self.old_day, [2, 3])
+        self.recent = self.sell(timezone.localdate() - timedelta(days=1), [4])
+
+    def sell(self, day, quantities):
+        order = Order.objects.create(user=self.user)
+        for quantity in quantities:
+            order.transactions.add(Transaction.objects.create(user=self.user, product=self.product, quantity=quantity, price=Decimal('2.50')))
+        created_at = timezone.make_aware(datetime.combine(day, time(10)))
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        return order
+
+    def archive(self, *args):
+        call_command('archive_orders', *args, stdout=StringIO())
+
+    def test_old_orders_move_to_the_archive(self):
+        """
+        Test case to verify that orders past the horizon move with their transactions and links, keeping ids and timestamps.
+        """
+        created_at = Order.objects.get(pk=self.old.pk).created_at
+        line_ids = set(self.old.transactions.values_list('id', flat=True))
+
+        self.archive('--batch-size', '1')
+
+        self.assertEqual(list(Order.objects.values_list('id', flat=True)), [self.recent.pk])
+        self.assertFalse(Transaction.objects.filter(id__in=line_ids).exists())
+        archived = ArchivedOrder.objects.get(pk=self.old.pk)
+        self.assertEqual(archived.created_at, created_at)
+        self.assertEqual(set(archived.transactions.values_list('id', flat=True)), line_ids)
+        self.assertEqual(ArchivedTransaction.objects.count(), 2)
+
+    def test_orders_sharing_lines_with_recent_orders_stay_hot(self):
+        """
+        Test case to verify that an old order linked to a transaction of a recent order is not archived.
+        """
+        self.recent.transactions.add(self.old.transactions.first())
+
+        self.archive()
+
+        self.assertTrue(Order.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(ArchivedOrder.objects.exists())
+
+    def test_transactions_shared_across_batches_move_with_every_order(self):
+        """
+        Test case to verify that a transaction shared by two old orders archived in separate batches stays linked to both.
+        """
+        shared = self.old.transactions.first()
+        other = self.sell(self.old_day - timedelta(days=1), [])
+        other.transactions.add(shared)
+
+        self.archive('--batch-size', '1')
+
+        self.assertFalse(Transaction.objects.filter(pk=shared.pk).exists())
+        for order in (self.old, other):
+            self.assertIn(shared.pk, ArchivedOrder.objects.get(pk=order.pk).transactions.values_list('id', flat=True))
+        self.assertEqual(ArchivedTransaction.objects.count(), 2)
+
+    def test_history_unions_the_archive_when_needed(self):
+        """
+        Test case to verify that order history includes archived orders only for ranges past the horizon.
+        """
+        self.archive()
+
+        response = self.client.get(f'/api/orders/history/?start={self.old_day.isoformat()}', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(row['id'], row['archived']) for row in response.data['results']], [(self.recent.pk, False), (self.old.pk, True)])
+        self.assertEqual(sorted(line['quantity'] for line in response.data['results'][1]['transactions']), [2, 3])
+
+        response = self.client.get('/api/orders/history/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.recent.pk])
+
+        since = timezone.now() - timedelta(days=7)
+        self.assertIsNone(history(lambda orders, transactions: orders.objects.all(), since).query.combinator)
+
+    def test_heatmap_includes_archived_orders(self):
+        """
+        Test case to verify that the sales heatmap counts archived orders in ranges past the horizon.
+        """
+        self.archive()
+
+        response = self.client.get(f'/api/orders/heatmap/?start={self.old_day.isoformat()}&tz=UTC', HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.assertEqual(response.data['total_units'], 9)
+
+    def test_days_below_retention_are_rejected(self):
+        """
+        Test case to verify that the command refuses to archive orders newer than the retention horizon.
+        """
+        with self.assertRaises(CommandError):
+            self.archive('--days', '1')
@@ -0,0 +1,79 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework import status
+
+from stock.models import Order, Product, StockMovement, Transaction
+
+
+class OrderBulkCancelTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token, two products and four orders selling them.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+
+        self.milk = Product.objects.create(user=self.user, name='Milk', barcode='milk', price_purchased=1, price_sale=2, quantity=100, quantity_min=80)
+        self.bread = Product.objects.create(user=self.user, name='Bread', barcode='bread', price_purchased=1, price_sale=2, quantity=100)
+        self.orders = [self.create_order(quantity) for quantity in (5, 10, 15, 20)]
+
+    def create_order(self, quantity):
+        transactions = [
+            Transaction.objects.create(user=self.user, product=self.milk, price=2, quantity=quantity).id,
+            Transaction.objects.create(user=self.user, product=self.bread, price=2, quantity=1).id,
+        ]
+        response = self.client.post('/api/orders/', {'transactions': transactions}, content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token)
+        return response.data['id']
+
+    def bulk_cancel(self, ids):
+        return self.client.post('/api/orders/bulk-cancel/', {'orders': ids}, content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def test_bulk_cancel_restores_stock(self):
+        """
+        Test case to verify that bulk cancellation restores stock, flips status and reports every outcome.
+        """
+        self.client.post(f'/api/orders/{self.orders[0]}/cancel/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.milk.refresh_from_db()
+        self.assertEqual(self.milk.stock_status, Product.STOCK_LOW)
+
+        response = self.bulk_cancel(self.orders + [999999])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cancelled'], 3)
+        outcomes = {result['id']: result['outcome'] for result in response.data['results']}
+        self.assertEqual(outcomes[self.orders[0]], 'already_cancelled')
+        self.assertEqual(outcomes[self.orders[1]], 'cancelled')
+        self.assertEqual(outcomes[999999], 'not_found')
+
+        self.milk.refresh_from_db()
+        self.bread.refresh_from_db()
+        self.assertEqual(self.milk.quantity, 100)
+        self.assertEqual(self.bread.quantity, 100)
+        self.assertEqual(self.milk.stock_status, Product.STOCK_OK)
+        self.assertFalse(Order.objects.filter(status=True).exists())
+        self.assertEqual(StockMovement.objects.filter(reason=StockMovement.CANCEL).count(), 8)
+
+    def test_bulk_cancel_query_count_does_not_grow_with_orders(self):
+        """
+        Test case to verify that the number of queries is independent of the number of orders.
+        """
+        with self.assertNumQueries(10):
+            self.bulk_cancel(self.orders)
+
+    def test_bulk_cancel_ignores_other_users_orders(self):
+        """
+        Test case to verify that orders of another user are reported as not found.
+        """
+        User.objects.create_user(username='other', password='otherpass')
+        response = self.client.post('/api/login/', {'username': 'other', 'password': 'otherpass'})
+        response = self.client.post('/api/orders/bulk-cancel/', {'orders': self.orders}, content_type='application/json', HTTP_AUTHORIZATION='Token ' + response.data['token'])
+        self.assertEqual(response.data['cancelled'], 0)
+        self.assertEqual(Order.objects.filter(status=True).count(), 4)
+
+    def test_bulk_cancel_requires_ids(self):
+        """
+        Test case to verify that a missing or malformed id list returns a 400 BAD REQUEST status code.
+        """
+        self.assertEqual(self.bulk_cancel([]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.bulk_cancel(['1']).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.bulk_cancel([2 ** 70]).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,136 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework import status
+
+from stock.models import Order
+from stock.models import OrderLine
+from stock.models import Product
+from stock.models import Transaction
+
+
+class OrderLineTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and two products.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        self.water = Product.objects.create(user=self.user, name='Water', barcode='1', price_purchased=1, price_sale=2, quantity=100)
+        self.chips = Product.objects.create(user=self.user, name='Chips', barcode='2', price_purchased=1, price_sale=3, quantity=100)
+
+    def line(self, product, quantity, price):
+        return Transaction.objects.create(user=self.user, product=product, quantity=quantity, price=Decimal(price))
+
+    def totals(self, order):
+        order.refresh_from_db()
+        return order.total, order.units, order.line_count
+
+    def test_created_orders_store_lines_and_totals(self):
+        """
+        Test case to verify that creating an order stores its lines and totals and returns them.
+        """
+        transactions = [self.line(self.water, 3, '2.00').id, self.line(self.chips, 2, '3.50').id]
+
+        response = self.client.post('/api/orders/', {'transactions': transactions}, content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Decimal(response.data['total']), Decimal('13.00'))
+        self.assertEqual(response.data['units'], 5)
+        self.assertEqual(response.data['line_count'], 2)
+        self.assertEqual([line['quantity'] for line in response.data['lines']], [3, 2])
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(list(order.lines.values_list('transaction', flat=True)), transactions)
+
+    def test_totals_follow_link_changes(self):
+        """
+        Test case to verify that adding, removing and clearing transactions from either side updates lines and totals.
+        """
+        water, chips = self.line(self.water, 3, '2.00'), self.line(self.chips, 2, '3.50')
+        order = Order.objects.create(user=self.user)
+        order.transactions.add(water, chips)
+        self.assertEqual((order.total, order.units, order.line_count), (Decimal('13.00'), 5, 2))
+
+        order.transactions.remove(chips)
+        self.assertEqual(self.totals(order), (Decimal('6.00'), 3, 1))
+
+        water.order_set.clear()
+        self.assertEqual(self.totals(order), (Decimal('0.00'), 0, 0))
+        self.assertFalse(OrderLine.objects.exists())
+
+        chips.order_set.add(order)
+        self.assertEqual(self.totals(order), (Decimal('7.00'), 2, 1))
+
+    def test_edited_transactions_update_totals(self):
+        """
+        Test case to verify that editing a linked transaction updates the stored lines and totals.
+        """
+        water = self.line(self.water, 3, '2.00')
+        order = Order.objects.create(user=self.user)
+        order.transactions.add(water)
+
+        water.quantity = 4
+        water.save()
+
+        self.assertEqual(self.totals(order), (Decimal('8.00'), 4, 1))
+        self.assertEqual(order.lines.get().quantity, 4)
+
+    def test_deleted_transactions_update_totals(self):
+        """
+        Test case to verify that deleting a linked transaction, directly or with its product, updates the stored lines and totals.
+        """
+        water, chips = self.line(self.water, 3, '2.00'), self.line(self.chips, 2, '3.50')
+        order = Order.objects.create(user=self.user)
+        order.transactions.add(water, chips)
+
+        water.delete()
+        self.assertEqual(self.totals(order), (Decimal('7.00'), 2, 1))
+
+        self.chips.delete()
+        self.assertEqual(self.totals(order), (Decimal('0.00'), 0, 0))
+        self.assertFalse(order.lines.exists())
+
+    def test_cancelled_orders_keep_their_totals(self):
+        """
+        Test case to verify that cancelling an order leaves its lines and totals as they were.
+        """
+        order = Order.objects.create(user=self.user)
+        order.transactions.add(self.line(self.water, 3, '2.00'))
+
+        order.cancel()
+
+        self.assertFalse(order.status)
+        self.assertEqual(self.totals(order), (Decimal('6.00'), 3, 1))
+
+    def test_backfill_existing_orders(self):
+        """
+        Test case to verify that the backfill command rebuilds lines and totals of existing orders.
+        """
+        order = Order.objects.create(user=self.user)
+        order.transactions.add(self.line(self.water, 3, '2.00'), self.line(self.chips, 1, '3.00'))
+        OrderLine.objects.all().delete()
+        Order.objects.update(total=0, units=0, line_count=0)
+
+        call_command('backfill_order_lines', '--batch-size', '1', stdout=StringIO())
+
+        self.assertEqual(self.totals(order), (Decimal('9.00'), 4, 2))
+        self.assertEqual(order.lines.count(), 2)
+
+    def test_fast_report_reads_stored_totals(self):
+        """
+        Test case to verify that the fast report sums the stored totals and lists the stored lines.
+        """
+        order = Order.objects.create(user=self.user)
+        order.transactions.add(self.line(self.water, 3, '2.00'), self.line(self.chips, 1, '3.00'))
+
+        response = self.client.get('/api/orders/fast-report/', HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.assertEqual(response.data['total_earned'], Decimal('9.00'))
+        self.assertEqual(response.data['total_transactions'], 4)
+        self.assertEqual(response.data['number_of_orders'], 1)
+        self.assertEqual(response.data['most_sold_product']['name'], 'Water')
+        self.assertEqual(response.data['sales_last_week'][0]['transactions'][0]['product__name'], 'Water')
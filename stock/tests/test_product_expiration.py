@@ -0,0 +1,77 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+
+from stock.models import Product
+
+
+class ProductExpirationTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and products expiring at different distances from today.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+
+        self.today = timezone.localdate()
+        self.expired = self.create_product('expired', -2, quantity=4)
+        self.soon = self.create_product('soon', 2, quantity=10)
+        self.week = self.create_product('week', 6, quantity=1)
+        self.later = self.create_product('later', 40, quantity=3)
+
+    def create_product(self, barcode, days, quantity):
+        return Product.objects.create(
+            user=self.user,
+            name=barcode,
+            barcode=barcode,
+            expiration_date=self.today + timedelta(days=days),
+            price_purchased=Decimal('2.50'),
+            price_sale=5,
+            quantity=quantity,
+        )
+
+    def test_expiration_range_filter(self):
+        """
+        Test case to verify that products can be filtered by an expiration date range.
+        """
+        params = {
+            'expiration_date_after': self.today.isoformat(),
+            'expiration_date_before': (self.today + timedelta(days=7)).isoformat(),
+        }
+        response = self.client.get('/api/products/', params, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({product['id'] for product in response.data}, {self.soon.id, self.week.id})
+
+    def test_expiring_endpoint_buckets(self):
+        """
+        Test case to verify that expiring products are bucketed by days to expiry with their value at risk.
+        """
+        response = self.client.get('/api/products/expiring/', {'within': '7d'}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        buckets = {bucket['bucket']: bucket for bucket in response.data['buckets']}
+        self.assertEqual(list(buckets), ['expired', '1-3', '4-7'])
+        self.assertEqual(buckets['1-3']['value_at_risk'], Decimal('25.00'))
+        self.assertEqual(buckets['1-3']['products'][0]['days_to_expiry'], 2)
+        self.assertEqual(response.data['total_value_at_risk'], Decimal('37.50'))
+
+    def test_expiring_endpoint_rejects_invalid_window(self):
+        """
+        Test case to verify that an invalid window returns a 400 BAD REQUEST status code.
+        """
+        response = self.client.get('/api/products/expiring/', {'within': 'soon'}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deactivate_expired_products_command(self):
+        """
+        Test case to verify that the command deactivates only expired products.
+        """
+        call_command('deactivate_expired_products', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(list(Product.objects.filter(status=False).values_list('id', flat=True)), [self.expired.id])
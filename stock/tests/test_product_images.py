@@ -0,0 +1,72 @@
+import io
+import shutil
+import tempfile
+
+from PIL import Image
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.test import override_settings
+from rest_framework import status
+
+from stock.images import generate_renditions
+from stock.models import Product
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ProductImageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+        Set up a user and a token.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+
+    def upload(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1200), 'red').save(buffer, 'PNG')
+        data = {
+            'name': 'Photo Product',
+            'barcode': 'photo',
+            'weight': 1,
+            'price_purchased': 1,
+            'price_sale': 2,
+            'image': SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png'),
+        }
+        return self.client.post('/api/products/', data, HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def test_upload_schedules_processing_after_commit(self):
+        """
+        Test case to verify that the upload responds before the renditions are generated.
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.upload()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(callbacks), 2)
+        self.assertIsNone(response.data['image_thumbnail'])
+
+    def test_renditions_are_resized_and_content_hashed(self):
+        """
+        Test case to verify that renditions are generated with content-hashed names and exposed by the serializer.
+        """
+        response = self.upload()
+        generate_renditions(response.data['id'])
+
+        product = Product.objects.get(id=response.data['id'])
+        self.assertRegex(product.image_thumbnail.name, r'^products/renditions/[0-9a-f]{20}-thumbnail\.(webp|jpg)$')
+        with Image.open(product.image_thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (200, 150))
+        with Image.open(product.image_medium.path) as medium:
+            self.assertEqual(medium.size, (800, 600))
+
+        response = self.client.get(f'/api/products/{product.id}/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertTrue(response.data['image_medium'].endswith(product.image_medium.name))
@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.test import override_settings
+from rest_framework import status
+
+from stock.imports import process_import
+from stock.imports import resolve_names
+from stock.imports import run_import
+from stock.models import Product
+from stock.models import Category
+from stock.models import Supplier
+from stock.models import ImportJob
+from stock.models import StockMovement
+
+PRIVATE_MEDIA_ROOT = tempfile.mkdtemp()
+
+CSV = (
+    'Name,Barcode,Price Purchased,Price Sale,Quantity,Quantity Min,Category,Supplier,Status\n'
+    'Milk,1001,10,15,15,10,Dairy,Acme,yes\n'
+    'Cheese,1002,20,30,50,,Dairy,,\n'
+    'Bread,1003,5,8,20,,Bakery,Acme,no\n'
+    'Broken,1004,abc,8,1,,,,\n'
+    'Milk again,1001,10,15,5,,,,\n'
+    'Existing,EXISTING,1,2,1,,,,\n'
+)
+
+
+@override_settings(PRIVATE_MEDIA_ROOT=PRIVATE_MEDIA_ROOT)
+class ProductImportTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PRIVATE_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+        Set up a user, a token, an existing category and an existing product.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        self.dairy = Category.objects.create(user=self.user, name='Dairy')
+        Product.objects.create(user=self.user, name='Existing', barcode='EXISTING', price_purchased=1, price_sale=2)
+
+    def upload(self, content, name='products.csv', **data):
+        data['file'] = SimpleUploadedFile(name, content.encode(), content_type='text/csv')
+        return self.client.post('/api/imports/', data, HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def test_upload_schedules_import_after_commit(self):
+        """
+        Test case to verify that the upload responds with a pending job before any row is imported.
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.upload(CSV)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], ImportJob.PENDING)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Product.objects.count(), 1)
+
+    @override_settings(IMPORT_CHUNK_SIZE=2)
+    def test_import_creates_products_in_chunks(self):
+        """
+        Test case to verify that valid rows are imported across chunks, names are resolved and bad rows are reported.
+        """
+        job_id = self.upload(CSV).data['id']
+        run_import(job_id)
+
+        self.assertEqual(set(Product.objects.values_list('barcode', flat=True)), {'EXISTING', '1001', '1002', '1003'})
+        milk = Product.objects.get(barcode='1001')
+        self.assertEqual(milk.category, self.dairy)
+        self.assertEqual(milk.supplier, Supplier.objects.get(name='Acme'))
+        self.assertEqual(milk.name, 'Milk')
+        self.assertEqual(milk.stock_status, Product.STOCK_OK)
+        self.assertFalse(Product.objects.get(barcode='1003').status)
+        self.assertEqual(Category.objects.filter(name='Bakery').count(), 1)
+        self.assertEqual(Product.objects.get(barcode='1003').supplier_id, milk.supplier_id)
+        self.assertEqual(StockMovement.objects.filter(reason=StockMovement.IMPORT, reference=f'import:{job_id}').count(), 3)
+
+        response = self.client.get(f'/api/imports/{job_id}/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.data['status'], ImportJob.DONE)
+        self.assertEqual(response.data['rows_processed'], 6)
+        self.assertEqual(response.data['rows_created'], 3)
+        self.assertEqual(response.data['rows_failed'], 3)
+        self.assertEqual([error['row'] for error in response.data['errors']], [5, 6, 7])
+        self.assertIn('price_purchased', response.data['errors'][0]['errors'])
+        self.assertIsNotNone(response.data['rows_per_second'])
+
+    def test_column_mapping(self):
+        """
+        Test case to verify that custom column names can be mapped to product fields.
+        """
+        job_id = self.upload('Producto,Codigo,Costo,Precio\nLeche,2001,1,2\n', mapping='{"Producto": "name", "Codigo": "barcode", "Costo": "price_purchased", "Precio": "price_sale"}').data['id']
+        run_import(job_id)
+
+        self.assertEqual(Product.objects.get(barcode='2001').name, 'Leche')
+
+    def test_conflicts_and_long_names_are_row_errors(self):
+        """
+        Test case to verify that a barcode taken after the existence check and an over-long category name fail their rows, not the job.
+        """
+        def resolve_names_after_api_create(user, model, names):
+            if model is Category:
+                Product.objects.get_or_create(user=user, barcode='3002', defaults={'name': 'From API', 'price_purchased': 1, 'price_sale': 2})
+            return resolve_names(user, model, names)
+
+        content = f'Name,Barcode,Price Purchased,Price Sale,Category\nA,3001,1,2,Dairy\nB,3002,1,2,\nC,3003,1,2,{"x" * 101}\n'
+        job_id = self.upload(content).data['id']
+        with mock.patch('stock.imports.resolve_names', resolve_names_after_api_create):
+            process_import(job_id)
+
+        job = ImportJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual((job.rows_created, job.rows_failed), (1, 2))
+        self.assertEqual({error['row']: list(error['errors']) for error in job.errors}, {3: ['barcode'], 4: ['category']})
+        self.assertEqual(Product.objects.get(barcode='3001').category, self.dairy)
+
+    def test_files_are_private_and_removed_after_the_import(self):
+        """
+        Test case to verify that uploads are stored outside MEDIA_ROOT and deleted once the import finishes or fails.
+        """
+        done = ImportJob.objects.get(pk=self.upload(CSV).data['id'])
+        response = self.client.post('/api/imports/', {'file': SimpleUploadedFile('broken.csv', b'Name\n\xff')}, HTTP_AUTHORIZATION='Token ' + self.token)
+        failed = ImportJob.objects.get(pk=response.data['id'])
+        paths = [done.file.path, failed.file.path]
+        self.assertTrue(all(path.startswith(os.path.abspath(PRIVATE_MEDIA_ROOT)) and os.path.exists(path) for path in paths))
+
+        run_import(done.pk)
+        with self.assertLogs('stock.imports'):
+            process_import(failed.pk)
+
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+        self.assertEqual(ImportJob.objects.get(pk=failed.pk).status, ImportJob.FAILED)
+        self.assertFalse(ImportJob.objects.filter(file__startswith='imports/').exists())
+
+    def test_unsupported_format_is_rejected(self):
+        """
+        Test case to verify that files in other formats are rejected.
+        """
+        response = self.upload('{}', name='products.json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
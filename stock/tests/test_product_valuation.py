@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.test import override_settings
+from rest_framework import status
+
+from stock.cache import get_version
+from stock.models import Category, Product, Supplier
+
+
+class ProductValuationTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and products spread over two categories and one supplier.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+
+        self.drinks = Category.objects.create(user=self.user, name='Drinks')
+        self.snacks = Category.objects.create(user=self.user, name='Snacks')
+        supplier = Supplier.objects.create(user=self.user, name='Acme')
+        Product.objects.create(user=self.user, name='Cola', barcode='cola', category=self.drinks, supplier=supplier, location='A1', price_purchased=1, price_sale=2, quantity=10)
+        Product.objects.create(user=self.user, name='Water', barcode='water', category=self.drinks, location='A1', price_purchased=Decimal('0.50'), price_sale=1, quantity=20)
+        self.chips = Product.objects.create(user=self.user, name='Chips', barcode='chips', category=self.snacks, supplier=supplier, location='B2', price_purchased=3, price_sale=5, quantity=2)
+
+    def get_valuation(self):
+        response = self.client.get('/api/products/valuation/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_valuation_breakdowns(self):
+        """
+        Test case to verify the totals and the per-dimension breakdowns of the stock value.
+        """
+        report = self.get_valuation()
+        self.assertEqual(report['total']['value_at_cost'], Decimal('26.00'))
+        self.assertEqual(report['total']['value_at_sale'], Decimal('50.00'))
+        self.assertEqual(report['total']['units'], 32)
+
+        categories = {row['name']: row for row in report['category']}
+        self.assertEqual(categories['Drinks']['value_at_cost'], Decimal('20.00'))
+        self.assertEqual(categories['Snacks']['value_at_sale'], Decimal('10.00'))
+
+        suppliers = {row['name']: row['product_count'] for row in report['supplier']}
+        self.assertEqual(suppliers, {'Acme': 2, None: 1})
+        self.assertEqual({row['name'] for row in report['location']}, {'A1', 'B2'})
+
+    def test_valuation_is_cached_and_invalidated(self):
+        """
+        Test case to verify that the report is served from the cache until a product changes.
+        """
+        self.get_valuation()
+        with self.assertNumQueries(1):
+            self.get_valuation()
+
+        self.chips.quantity = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chips.save()
+        self.assertEqual(self.get_valuation()['total']['value_at_cost'], Decimal('32.00'))
+
+    def test_version_is_bumped_after_commit(self):
+        """
+        Test case to verify that a product change bumps the report version only once its transaction commits.
+        """
+        version = get_version('products', self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chips.quantity = 4
+            self.chips.save()
+            self.assertEqual(get_version('products', self.user.id), version)
+
+        self.assertNotEqual(get_version('products', self.user.id), version)
+
+    def test_per_process_cache_expires_quickly(self):
+        """
+        Test case to verify that with a per-process cache the report is only kept for LOCAL_CACHE_SECONDS, since other workers never see the bump.
+        """
+        self.chips.quantity = 4
+        with override_settings(SHARED_CACHE=True):
+            self.get_valuation()
+            self.chips.save()
+            self.assertEqual(self.get_valuation()['total']['value_at_cost'], Decimal('26.00'))
+
+        cache.clear()
+        with override_settings(SHARED_CACHE=False, LOCAL_CACHE_SECONDS=0):
+            self.get_valuation()
+            self.chips.quantity = 6
+            self.chips.save()
+            self.assertEqual(self.get_valuation()['total']['value_at_cost'], Decimal('38.00'))
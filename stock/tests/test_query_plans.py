@@ -0,0 +1,86 @@
+import re
+import unittest
+from datetime import date
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from stock import views
+from stock.models import Order
+from stock.models import Product
+from stock.models import Tombstone
+from stock.models import Manufacturer
+from stock.models import Transaction
+
+FULL_SCAN = re.compile(r'\bSCAN\b')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite.')
+class QueryPlanTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user whose querysets are explained.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+
+    def assertIndexed(self, queryset, index=None):
+        plan = queryset.explain()
+        self.assertIsNone(FULL_SCAN.search(plan), plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        if index:
+            self.assertIn(f'USING INDEX {index}', plan)
+
+    def view_queryset(self, viewset):
+        view = viewset()
+        view.request = SimpleNamespace(user=self.user)
+        return view.get_queryset()
+
+    def test_list_endpoints(self):
+        """
+        Test case to verify that every list endpoint is served from an index on (user, ordering) without sorting.
+        """
+        for viewset in [
+            views.ProductViewSet,
+            views.CategoryViewSet,
+            views.SupplierViewSet,
+            views.ManufacturerViewSet,
+            views.PromotionViewSet,
+            views.OrderViewSet,
+            views.TransactionViewSet,
+        ]:
+            with self.subTest(viewset=viewset.__name__):
+                self.assertIndexed(self.view_queryset(viewset))
+
+    def test_active_filters_use_partial_indexes(self):
+        """
+        Test case to verify that status=True filters use the partial active indexes.
+        """
+        self.assertIndexed(self.view_queryset(views.ProductViewSet).filter(status=True), 'product_active_idx')
+        self.assertIndexed(Manufacturer.objects.filter(user=self.user, status=True).order_by('id'), 'manufacturer_active_idx')
+
+    def test_expiration_queries(self):
+        """
+        Test case to verify that expiration ranges are searched on (user, expiration_date).
+        """
+        today = date.today()
+        products = Product.objects.filter(user=self.user, status=True, expiration_date__isnull=False, expiration_date__lte=today + timedelta(days=30))
+        self.assertIndexed(products.order_by('expiration_date', 'id'), 'product_expiration_idx')
+        self.assertIndexed(Product.objects.filter(user=self.user, expiration_date__gte=today, expiration_date__lte=today), 'product_expiration_idx')
+
+    def test_report_and_feed_queries(self):
+        """
+        Test case to verify that the weekly report, low stock feed and sync queries are index range searches.
+        """
+        week_ago = timezone.now() - timedelta(days=7)
+        self.assertIndexed(Order.objects.filter(user=self.user, created_at__gte=week_ago))
+        self.assertIndexed(Transaction.objects.filter(user=self.user, created_at__gte=week_ago).order_by('-created_at'), 'transaction_user_created_idx')
+        self.assertIndexed(
+            Product.objects.filter(user=self.user).exclude(stock_status=Product.STOCK_OK).order_by('stock_status_changed_at', 'id'),
+            'product_reorder_idx',
+        )
+        self.assertIndexed(Product.objects.filter(user=self.user, updated_at__gte=week_ago).order_by('updated_at', 'id'), 'product_sync_idx')
+        self.assertIndexed(Tombstone.objects.filter(user=self.user, id__gt=0).order_by('id'), 'tombstone_user_id_idx')
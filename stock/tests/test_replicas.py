@@ -0,0 +1,130 @@
+from contextvars import copy_context
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.test import SimpleTestCase
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from stock.models import Category
+from stock.models import Product
+from stock.replicas import REPLICA
+from stock.replicas import pin_writes
+from stock.replicas import read_mode
+from stock.replicas import replica_for
+from stock.replicas import select_reads
+from stock.replicas import use_analytics
+from stock.sharding import TenantRouter
+
+REPLICAS = {'default': ['replica']}
+ANALYTICS = {'default': 'analytics'}
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS, DATABASE_ANALYTICS=ANALYTICS)
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        """
+        Set up the router under test and an empty cache.
+        """
+        cache.clear()
+        self.router = TenantRouter()
+
+    def test_reads_follow_the_read_mode(self):
+        """
+        Test case to verify that tenant reads go to the primary by default, to a replica in replica mode and to the analytics replica for reports.
+        """
+        def route():
+            routes = [self.router.db_for_read(Product)]
+            read_mode.set(REPLICA)
+            routes.append(self.router.db_for_read(Product))
+            routes.append(self.router.db_for_write(Product))
+            with use_analytics():
+                routes.append(self.router.db_for_read(Product))
+            return routes
+
+        self.assertEqual(copy_context().run(route), [None, 'replica', None, 'analytics'])
+
+    def test_instances_read_from_a_replica_are_written_to_the_primary(self):
+        """
+        Test case to verify that saving an instance loaded from a replica writes to its primary.
+        """
+        product = Product(name='Water')
+        product._state.db = 'replica'
+
+        self.assertEqual(self.router.db_for_read(Category, instance=product), 'replica')
+        self.assertEqual(self.router.db_for_write(Category, instance=product), 'default')
+
+    def test_writes_pin_the_user_to_the_primary(self):
+        """
+        Test case to verify that safe requests read from replicas until the user writes, and from the primary for the pin window after.
+        """
+        def request(method):
+            select_reads(1, method)
+            pin_writes()
+            return read_mode.get()
+
+        self.assertEqual(copy_context().run(request, 'GET'), REPLICA)
+        self.assertIsNone(copy_context().run(request, 'POST'))
+        self.assertIsNone(copy_context().run(request, 'GET'))
+
+    @override_settings(DATABASE_REPLICAS={})
+    def test_single_database_is_untouched(self):
+        """
+        Test case to verify that without replicas no read mode is selected.
+        """
+        def request():
+            select_reads(1, 'GET')
+            return read_mode.get()
+
+        self.assertIsNone(copy_context().run(request))
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaTransactionTest(TestCase):
+    def test_transactions_keep_reads_on_the_primary(self):
+        """
+        Test case to verify that reads inside a transaction on the primary are not sent to a replica.
+        """
+        def route():
+            read_mode.set(REPLICA)
+            return replica_for(None)
+
+        self.assertIsNone(copy_context().run(route))
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'Run with DEFAULT_DB_REPLICAS=replica and a shared CACHE_BACKEND to test against a replica alias.')
+class ReplicaRequestTest(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        """
+        Set up a user, a token and an empty cache.
+        """
+        cache.clear()
+        self.replica = settings.DATABASE_REPLICAS['default'][0]
+        User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+
+    def test_reads_go_to_the_replica_after_the_pin_expires(self):
+        """
+        Test case to verify that a read right after a write uses the primary and later reads use the replica.
+        """
+        self.client.post('/api/categories/', {'name': 'Drinks'}, HTTP_AUTHORIZATION='Token ' + self.token)
+
+        with CaptureQueriesContext(connections[self.replica]) as replica_queries:
+            response = self.client.get('/api/categories/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(replica_queries), 0)
+
+        cache.clear()
+        with CaptureQueriesContext(connections[self.replica]) as replica_queries:
+            response = self.client.get('/api/categories/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual([category['name'] for category in response.data], ['Drinks'])
+        self.assertGreater(len(replica_queries), 0)
@@ -0,0 +1,66 @@
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework import status
+
+from stock.models import Order
+from stock.models import Product
+from stock.models import Transaction
+
+
+class SalesHeatmapTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and orders placed at known times.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        self.product = Product.objects.create(user=self.user, name='Water', barcode='1', price_purchased=1, price_sale=2, quantity=100)
+
+        self.sell(datetime(2026, 10, 5, 10, 10, tzinfo=dt_timezone.utc), 2)
+        self.sell(datetime(2026, 10, 12, 10, 30, tzinfo=dt_timezone.utc), 3)
+        self.sell(datetime(2026, 10, 11, 23, 30, tzinfo=dt_timezone.utc), 4)
+        self.sell(datetime(2026, 10, 12, 11, 0, tzinfo=dt_timezone.utc), 50, active=False)
+        self.sell(datetime(2026, 9, 1, 10, 0, tzinfo=dt_timezone.utc), 50)
+
+    def sell(self, created_at, quantity, active=True):
+        order = Order.objects.create(user=self.user, status=active)
+        order.transactions.add(Transaction.objects.create(user=self.user, product=self.product, quantity=quantity, price=Decimal('2.50')))
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+
+    def get(self, query):
+        return self.client.get('/api/orders/heatmap/' + query, HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def test_same_weekday_and_hour_are_summed_across_weeks(self):
+        """
+        Test case to verify that sales are bucketed by weekday and hour into a fixed 7x24 matrix.
+        """
+        response = self.get('?start=2026-10-01&end=2026-10-12&tz=UTC')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['units']), 7)
+        self.assertTrue(all(len(row) == 24 for row in response.data['units']))
+        self.assertEqual(response.data['units'][0][10], 5)
+        self.assertEqual(response.data['revenue'][0][10], Decimal('12.50'))
+        self.assertEqual(response.data['units'][6][23], 4)
+        self.assertEqual(response.data['total_units'], 9)
+
+    def test_buckets_follow_the_requested_time_zone(self):
+        """
+        Test case to verify that weekday and hour are extracted in the requested time zone.
+        """
+        response = self.get('?start=2026-10-01&end=2026-10-12&tz=America/New_York')
+
+        self.assertEqual(response.data['units'][6][19], 4)
+        self.assertEqual(response.data['units'][0][6], 5)
+
+    def test_invalid_parameters(self):
+        """
+        Test case to verify that unknown time zones and reversed ranges are rejected with 400.
+        """
+        self.assertEqual(self.get('?tz=Mars/Olympus').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get('?start=2026-10-12&end=2026-10-01').status_code, status.HTTP_400_BAD_REQUEST)
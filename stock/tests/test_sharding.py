@@ -0,0 +1,207 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test import SimpleTestCase
+from django.test import TestCase
+from django.test import override_settings
+from rest_framework import status
+
+from stock.models import Category
+from stock.models import Order
+from stock.models import Product
+from stock.models import TenantPlacement
+from stock.models import Transaction
+from stock.sharding import TenantMiddleware
+from stock.sharding import TenantRouter
+from stock.sharding import choose_shard
+from stock.sharding import copy_user
+from stock.sharding import current_shard
+from stock.sharding import each_shard
+from stock.sharding import get_placement
+from stock.sharding import set_placement
+from stock.sharding import use_shard
+
+SHARDS = ['default', 'shard_1', 'shard_2']
+
+
+class TenantRouterTest(SimpleTestCase):
+    def setUp(self):
+        """
+        Set up the router under test.
+        """
+        self.router = TenantRouter()
+
+    def test_tenant_models_follow_the_current_shard(self):
+        """
+        Test case to verify that tenant models are routed to the current shard and others are left alone.
+        """
+        self.assertIsNone(self.router.db_for_read(Product))
+        with use_shard('shard_1'):
+            self.assertEqual(self.router.db_for_read(Product), 'shard_1')
+            self.assertEqual(self.router.db_for_write(Order), 'shard_1')
+            self.assertIsNone(self.router.db_for_write(User))
+            self.assertIsNone(self.router.db_for_write(TenantPlacement))
+        self.assertIsNone(current_shard.get())
+
+    def test_instances_stay_on_their_database(self):
+        """
+        Test case to verify that an instance is written back to the database it was loaded from.
+        """
+        product = Product(name='Water')
+        product._state.db = 'shard_2'
+
+        with use_shard('shard_1'):
+            self.assertEqual(self.router.db_for_write(Transaction, instance=product), 'shard_2')
+
+    @override_settings(DATABASE_SHARDS=SHARDS)
+    def test_shards_are_chosen_deterministically(self):
+        """
+        Test case to verify that new tenants are spread over the configured shards by id.
+        """
+        chosen = {choose_shard(user_id) for user_id in range(100)}
+
+        self.assertEqual(chosen, set(SHARDS))
+        self.assertEqual(choose_shard(42), choose_shard(42))
+
+    def test_each_shard_runs_once_per_alias(self):
+        """
+        Test case to verify that wrapped command handlers run with every shard selected in turn.
+        """
+        seen = []
+        handle = each_shard(lambda command: seen.append(current_shard.get()))
+
+        with override_settings(DATABASE_SHARDS=SHARDS):
+            handle(None)
+
+        self.assertEqual(seen, SHARDS)
+
+    def test_middleware_resets_the_shard(self):
+        """
+        Test case to verify that the shard selected during a request does not outlive it.
+        """
+        def view(request):
+            current_shard.set('shard_1')
+            return HttpResponse(current_shard.get())
+
+        self.assertEqual(TenantMiddleware(view)(RequestFactory().get('/')).content, b'shard_1')
+        self.assertIsNone(current_shard.get())
+
+
+class TenantPlacementTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user and a token.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+
+    @override_settings(DATABASE_SHARDS=['default'])
+    def test_single_shard_needs_no_lookup(self):
+        """
+        Test case to verify that a single shard setup never reads the placement directory.
+        """
+        with self.assertNumQueries(0):
+            self.assertEqual(get_placement(self.user.pk), ('default', False))
+
+    @override_settings(DATABASE_SHARDS=['default', 'shard_1'])
+    def test_writes_are_refused_while_moving(self):
+        """
+        Test case to verify that unsafe requests get a 503 while the tenant is being moved and reads still work.
+        """
+        set_placement(self.user.pk, 'default', moving=True)
+
+        response = self.client.post('/api/categories/', {'name': 'Drinks'}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        response = self.client.get('/api/categories/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(DATABASE_SHARDS=['default', 'shard_1'])
+    def test_writes_check_the_fence_despite_a_stale_cache(self):
+        """
+        Test case to verify that a write is refused when the fence row says the tenant is moving even if the cached placement does not.
+        """
+        set_placement(self.user.pk, 'default', fences=['default'])
+        self.assertEqual(get_placement(self.user.pk), ('default', False))
+        TenantPlacement.objects.filter(user=self.user).update(moving=True)
+
+        response = self.client.post('/api/categories/', {'name': 'Drinks'}, HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(Category.objects.exists())
+        self.assertEqual(get_placement(self.user.pk), ('default', True))
+
+
+@skipUnless(len(settings.DATABASE_SHARDS) > 1, 'Run with DATABASE_SHARDS=default,shard_1 to test across databases.')
+@override_settings(TENANT_PLACEMENT_CACHE_SECONDS=0)
+class TenantShardTest(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        """
+        Set up a user placed on the second shard and a token.
+        """
+        cache.clear()
+        self.shard = settings.DATABASE_SHARDS[1]
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        copy_user(self.user.pk, self.shard)
+        set_placement(self.user.pk, self.shard, fences=[self.shard])
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+
+    def create_category(self, name='Drinks'):
+        response = self.client.post('/api/categories/', {'name': name}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def test_tenant_rows_are_written_to_its_shard(self):
+        """
+        Test case to verify that API writes land on the tenant's shard and reads come back from it.
+        """
+        category_id = self.create_category()
+
+        self.assertTrue(Category.objects.using(self.shard).filter(pk=category_id).exists())
+        self.assertFalse(Category.objects.using('default').filter(pk=category_id).exists())
+        response = self.client.get(f'/api/categories/{category_id}/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.data['name'], 'Drinks')
+
+    def test_move_tenant_copies_rows_and_relations(self):
+        """
+        Test case to verify that moving a tenant copies its rows and m2m links, keeps timestamps and clears the source.
+        """
+        category_id = self.create_category()
+        with use_shard(self.shard):
+            product_id = Product.objects.create(user=self.user, name='Water', barcode='1', price_purchased=1, price_sale=2, quantity=10, category_id=category_id).pk
+            order = Order.objects.create(user=self.user)
+            order.transactions.add(Transaction.objects.create(user=self.user, product_id=product_id, quantity=2, price=2))
+        created_at = Order.objects.using(self.shard).get(pk=order.pk).created_at
+
+        call_command('move_tenant', self.user.pk, 'default', stdout=StringIO())
+
+        self.assertEqual(get_placement(self.user.pk), ('default', False))
+        moved = Order.objects.using('default').get(pk=order.pk)
+        self.assertEqual(moved.created_at, created_at)
+        self.assertEqual(list(moved.transactions.values_list('product', flat=True)), [product_id])
+        self.assertFalse(Product.objects.using(self.shard).filter(user=self.user).exists())
+        response = self.client.get(f'/api/categories/{category_id}/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(TenantPlacement.objects.using(self.shard).values_list('shard', 'moving').get(user=self.user), ('default', True))
+        self.create_category('Snacks')
+
+    def test_deleting_the_user_clears_its_shard(self):
+        """
+        Test case to verify that deleting a user also deletes its copy and rows on the other shards.
+        """
+        self.create_category()
+
+        self.user.delete()
+
+        self.assertFalse(User.objects.using(self.shard).filter(pk=self.user.pk).exists())
+        self.assertFalse(Category.objects.using(self.shard).exists())
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+
+from stock.cursors import encode_cursor
+from stock.models import Product, Transaction
+
+
+class StockAlertsTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and two products with reorder thresholds.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+
+        self.product = Product.objects.create(user=self.user, name='Milk', barcode='milk', price_purchased=1, price_sale=2, quantity=10, quantity_min=5, quantity_max=20)
+        self.other = Product.objects.create(user=self.user, name='Bread', barcode='bread', price_purchased=1, price_sale=2, quantity=10, quantity_min=5, quantity_max=20)
+
+    def sell(self, product, quantity):
+        transaction = Transaction.objects.create(user=self.user, product=product, price=2, quantity=quantity)
+        response = self.client.post('/api/orders/', {'transactions': [transaction.id]}, content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token)
+        return response.data['id']
+
+    def test_stock_status_follows_orders_and_cancellations(self):
+        """
+        Test case to verify that the reorder status is maintained when orders are created and cancelled.
+        """
+        self.assertEqual(self.product.stock_status, Product.STOCK_OK)
+
+        order_id = self.sell(self.product, 6)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_status, Product.STOCK_LOW)
+        self.assertIsNotNone(self.product.stock_status_changed_at)
+
+        self.client.post(f'/api/orders/{order_id}/cancel/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_status, Product.STOCK_OK)
+
+    def test_refresh_stock_status_after_bulk_update(self):
+        """
+        Test case to verify that bulk updates can refresh the reorder status in SQL.
+        """
+        Product.objects.filter(id=self.other.id).update(quantity=25)
+        self.assertEqual(Product.objects.all().refresh_stock_status(), 1)
+        self.assertEqual(Product.objects.get(id=self.other.id).stock_status, Product.STOCK_OVER)
+
+    def test_low_stock_endpoint(self):
+        """
+        Test case to verify that the low stock endpoint only lists products below their minimum.
+        """
+        self.sell(self.product, 6)
+        response = self.client.get('/api/products/low-stock/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([product['id'] for product in response.data], [self.product.id])
+
+    @override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+    def test_low_stock_feed_cursor(self):
+        """
+        Test case to verify that the feed returns newly crossed products in batches after the cursor.
+        """
+        self.sell(self.product, 6)
+        self.sell(self.other, 8)
+
+        response = self.client.get('/api/products/low-stock/feed/', {'limit': 1}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.product.id])
+        self.assertTrue(response.data['has_more'])
+
+        cursor = response.data['next_cursor']
+        response = self.client.get('/api/products/low-stock/feed/', {'cursor': cursor}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.other.id])
+        self.assertFalse(response.data['has_more'])
+
+        cursor = response.data['next_cursor']
+        response = self.client.get('/api/products/low-stock/feed/', {'cursor': cursor}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(response.data['next_cursor'], cursor)
+
+    def test_low_stock_feed_rejects_invalid_cursor(self):
+        """
+        Test case to verify that a malformed cursor returns a 400 BAD REQUEST status code.
+        """
+        response = self.client.get('/api/products/low-stock/feed/', {'cursor': 'not-a-cursor'}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_low_stock_feed_rejects_invalid_cursor_ids(self):
+        """
+        Test case to verify that a cursor with a non-integer or out of range id returns a 400 BAD REQUEST status code.
+        """
+        changed_at = timezone.now().isoformat()
+        for last_id in ['abc', 2 ** 70, None]:
+            response = self.client.get('/api/products/low-stock/feed/', {'cursor': encode_cursor([changed_at, last_id])}, HTTP_AUTHORIZATION='Token ' + self.token)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_low_stock_feed_waits_for_changes_to_settle(self):
+        """
+        Test case to verify that a status change is only handed out once it is older than the settle window, so a late commit is not skipped.
+        """
+        self.sell(self.product, 6)
+        response = self.client.get('/api/products/low-stock/feed/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.data['results'], [])
+
+        Product.objects.filter(id=self.product.id).update(stock_status_changed_at=timezone.now() - timedelta(minutes=1))
+        response = self.client.get('/api/products/low-stock/feed/', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.product.id])
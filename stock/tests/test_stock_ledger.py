@@ -0,0 +1,162 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+
+from stock.ledger import annotate_stock
+from stock.ledger import take_snapshots
+from stock.models import Order, Product, StockMovement, StockSnapshot, Transaction
+from stock.views import ProductViewSet
+
+
+class StockLedgerTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and a product created through the API so its initial stock is recorded.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+
+        data = {
+            'name': 'Ledger Product',
+            'barcode': 'ledger-1',
+            'weight': 1.0,
+            'price_purchased': 5.0,
+            'price_sale': 10.0,
+            'quantity': 20,
+        }
+        response = self.client.post('/api/products/', data, content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token)
+        self.product = Product.objects.get(id=response.data['id'])
+
+    def create_order(self, quantity):
+        transaction = Transaction.objects.create(user=self.user, product=self.product, price=10.0, quantity=quantity)
+        data = {'transactions': [transaction.id]}
+        response = self.client.post('/api/orders/', data, content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token)
+        return response.data['id']
+
+    def test_movements_follow_orders_and_cancellations(self):
+        """
+        Test case to verify that product creation, sales and cancellations are all recorded in the ledger.
+        """
+        order_id = self.create_order(3)
+        self.client.post(f'/api/orders/{order_id}/cancel/', HTTP_AUTHORIZATION='Token ' + self.token)
+
+        movements = list(StockMovement.objects.filter(product=self.product).order_by('id').values_list('delta', 'reason', 'reference'))
+        self.assertEqual(movements, [
+            (20, StockMovement.ADJUSTMENT, None),
+            (-3, StockMovement.SALE, f'order:{order_id}'),
+            (3, StockMovement.CANCEL, f'order:{order_id}'),
+        ])
+        self.product.refresh_from_db()
+        self.assertEqual(annotate_stock(Product.objects.filter(id=self.product.id)).get().ledger_quantity, self.product.quantity)
+
+    def test_adjustments_from_stale_instances_are_not_lost(self):
+        """
+        Test case to verify that adjusting two copies of a product loaded before either change keeps both changes.
+        """
+        first, second = Product.objects.get(id=self.product.id), Product.objects.get(id=self.product.id)
+
+        first.adjust_quantity(-3, StockMovement.SALE, 'order:1')
+        second.adjust_quantity(-4, StockMovement.SALE, 'order:2')
+
+        self.assertEqual(second.quantity, 13)
+        self.assertEqual(Product.objects.get(id=self.product.id).quantity, 13)
+        self.assertEqual(annotate_stock(Product.objects.filter(id=self.product.id)).get().ledger_quantity, 13)
+
+    def test_updates_use_the_locked_quantity(self):
+        """
+        Test case to verify that an API update records its delta from the locked row when a sale commits after the product was read.
+        """
+        get_object = ProductViewSet.get_object
+
+        def get_object_then_sell(view):
+            product = get_object(view)
+            Product.objects.get(id=product.id).adjust_quantity(-5, StockMovement.SALE, 'order:1')
+            return product
+
+        with mock.patch.object(ProductViewSet, 'get_object', get_object_then_sell):
+            self.client.patch(f'/api/products/{self.product.id}/', {'quantity': 30}, content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token)
+            self.client.patch(f'/api/products/{self.product.id}/', {'name': 'Renamed'}, content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.assertEqual(StockMovement.objects.filter(reason=StockMovement.ADJUSTMENT).latest('id').delta, 15)
+        self.assertEqual(Product.objects.get(id=self.product.id).quantity, 25)
+        self.assertEqual(annotate_stock(Product.objects.filter(id=self.product.id)).get().ledger_quantity, 25)
+
+    def test_movements_are_append_only(self):
+        """
+        Test case to verify that an existing movement cannot be rewritten.
+        """
+        movement = StockMovement.objects.get(product=self.product)
+        movement.delta = 100
+        with self.assertRaises(ValueError):
+            movement.save()
+
+    def test_stock_as_of_uses_snapshot_and_later_movements(self):
+        """
+        Test case to verify that point-in-time stock combines the latest snapshot with the movements after it.
+        """
+        StockMovement.objects.update(created_at=timezone.now() - timezone.timedelta(days=10))
+        take_snapshots(Product.objects.all())
+        StockSnapshot.objects.update(taken_at=timezone.now() - timezone.timedelta(days=5))
+        self.create_order(4)
+        self.create_order(6)
+
+        past = (timezone.now() - timezone.timedelta(days=2)).isoformat()
+        response = self.client.get('/api/products/stock-as-of/', {'at': past, 'ids': str(self.product.id)}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['products'], [{'id': self.product.id, 'quantity': 20}])
+
+        response = self.client.get('/api/products/stock-as-of/', {'at': timezone.now().isoformat()}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.data['products'], [{'id': self.product.id, 'quantity': 10}])
+
+    def test_snapshots_stop_at_settled_movements(self):
+        """
+        Test case to verify that snapshots only cover movements older than the settle delay, so a later commit with a lower id is not skipped.
+        """
+        StockMovement.objects.update(created_at=timezone.now() - timezone.timedelta(days=1))
+        settled = StockMovement.objects.get(product=self.product)
+        self.create_order(4)
+
+        self.assertEqual(take_snapshots(Product.objects.all()), 1)
+        snapshot = StockSnapshot.objects.get(product=self.product)
+        self.assertEqual((snapshot.quantity, snapshot.last_movement_id), (20, settled.id))
+        self.assertEqual(annotate_stock(Product.objects.all()).get(id=self.product.id).ledger_quantity, 16)
+
+    def test_stock_as_of_requires_valid_date(self):
+        """
+        Test case to verify that an invalid `at` parameter returns a 400 BAD REQUEST status code.
+        """
+        response = self.client.get('/api/products/stock-as-of/', {'at': 'yesterday'}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stock_as_of_rejects_invalid_ids(self):
+        """
+        Test case to verify that ids that are not integers or exceed the 64-bit range return a 400 BAD REQUEST status code.
+        """
+        at = timezone.now().isoformat()
+        for ids in ['abc', str(2 ** 70), f'{self.product.id},-{2 ** 64}']:
+            response = self.client.get('/api/products/stock-as-of/', {'at': at, 'ids': ids}, HTTP_AUTHORIZATION='Token ' + self.token)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/api/products/stock-as-of/', {'at': at, 'ids': str(self.product.id)}, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.data['products'], [{'id': self.product.id, 'quantity': 20}])
+
+    def test_reconcile_stock_command(self):
+        """
+        Test case to verify that reconciliation reports drift and records adjustments when asked to fix it.
+        """
+        Product.objects.filter(id=self.product.id).update(quantity=25)
+
+        with self.assertRaises(CommandError):
+            call_command('reconcile_stock', stdout=StringIO())
+
+        call_command('reconcile_stock', '--fix', stdout=StringIO())
+        adjustment = StockMovement.objects.filter(product=self.product).latest('id')
+        self.assertEqual(adjustment.delta, 5)
+        call_command('reconcile_stock', stdout=StringIO())
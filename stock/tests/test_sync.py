@@ -0,0 +1,143 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+
+from stock.cursors import encode_cursor
+from stock.models import Product
+from stock.models import Category
+from stock.models import Promotion
+from stock.models import Supplier
+from stock.models import Tombstone
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class SyncTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token, a category and a few products.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        self.category = Category.objects.create(user=self.user, name='Drinks')
+        self.products = [
+            Product.objects.create(user=self.user, name=f'Product {i}', barcode=str(i), weight=1, price_purchased=1, price_sale=2)
+            for i in range(3)
+        ]
+
+    def sync(self, since=None, limit=None):
+        params = {}
+        if since:
+            params['since'] = since
+        if limit:
+            params['limit'] = limit
+        return self.client.get('/api/sync/', params, HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def test_initial_sync_returns_everything(self):
+        """
+        Test case to verify that a sync without a cursor returns every row and no deletions.
+        """
+        Product.objects.create(user=self.user, name='Gone', barcode='gone', weight=1, price_purchased=1, price_sale=2).delete()
+
+        response = self.sync()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in response.data['changes']['products']], [product.id for product in self.products])
+        self.assertEqual(response.data['changes']['categories'][0]['name'], 'Drinks')
+        self.assertEqual(response.data['deleted']['products'], [])
+        self.assertFalse(response.data['has_more'])
+
+    def test_only_changes_after_cursor_are_returned(self):
+        """
+        Test case to verify that a resync returns only updated rows and tombstones of deleted rows.
+        """
+        cursor = self.sync().data['next_cursor']
+
+        self.products[1].quantity = 5
+        self.products[1].save()
+        deleted_id = self.products[2].id
+        self.products[2].delete()
+
+        response = self.sync(cursor)
+
+        self.assertEqual([row['id'] for row in response.data['changes']['products']], [self.products[1].id])
+        self.assertEqual(response.data['changes']['categories'], [])
+        self.assertEqual(response.data['deleted']['products'], [deleted_id])
+        self.assertEqual(Tombstone.objects.get().model, 'product')
+
+        response = self.sync(response.data['next_cursor'])
+        self.assertEqual(response.data['changes']['products'], [])
+        self.assertEqual(response.data['deleted']['products'], [])
+
+    def test_pages_with_limit(self):
+        """
+        Test case to verify that large changes are paged on (updated_at, id) without gaps or repeats.
+        """
+        seen = []
+        cursor = None
+        while True:
+            response = self.sync(cursor, limit=2)
+            seen.extend(row['id'] for row in response.data['changes']['products'])
+            cursor = response.data['next_cursor']
+            if not response.data['has_more']:
+                break
+
+        self.assertEqual(seen, [product.id for product in self.products])
+
+    def test_invalid_cursor(self):
+        """
+        Test case to verify that a malformed cursor returns a 400 response.
+        """
+        self.assertEqual(self.sync('not-a-cursor').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_ids_out_of_range_are_rejected(self):
+        """
+        Test case to verify that a cursor with an id past the 64-bit range returns a 400 response.
+        """
+        now = timezone.now().isoformat()
+        self.assertEqual(self.sync(encode_cursor({'deleted': 2 ** 70})).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.sync(encode_cursor({'deleted': 0, 'products': [now, 2 ** 70]})).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(CHANGE_FEED_SETTLE_SECONDS=60)
+    def test_changes_wait_for_the_settle_window(self):
+        """
+        Test case to verify that rows are only returned once older than the settle window, so a late commit is not skipped.
+        """
+        self.assertEqual(self.sync().data['changes']['products'], [])
+
+        Product.objects.filter(id=self.products[0].id).update(updated_at=timezone.now() - timedelta(minutes=2))
+        response = self.sync()
+        self.assertEqual([row['id'] for row in response.data['changes']['products']], [self.products[0].id])
+
+    def test_promotion_links_and_nulled_keys_are_resent(self):
+        """
+        Test case to verify that editing promotion links from either side and deleting a referenced row move the affected rows past the cursor.
+        """
+        promotion = Promotion.objects.create(user=self.user, name='Summer', discount_percentage=10, start_date=timezone.now(), end_date=timezone.now() + timedelta(days=7))
+        supplier = Supplier.objects.create(user=self.user, name='Acme')
+        Product.objects.filter(id=self.products[0].id).update(supplier=supplier)
+        changes = [
+            lambda: promotion.products.add(self.products[0]),
+            lambda: self.category.promotions.add(promotion),
+            lambda: self.products[0].promotions.clear(),
+            lambda: self.category.delete(),
+        ]
+        for change in changes:
+            cursor = self.sync().data['next_cursor']
+            change()
+            self.assertEqual([row['id'] for row in self.sync(cursor).data['changes']['promotions']], [promotion.id])
+
+        cursor = self.sync().data['next_cursor']
+        supplier.delete()
+        self.assertEqual([row['id'] for row in self.sync(cursor).data['changes']['products']], [self.products[0].id])
+
+    def test_deleting_the_account_records_no_tombstones(self):
+        """
+        Test case to verify that rows removed with their owner do not leave tombstones behind.
+        """
+        self.user.delete()
+        self.assertFalse(Tombstone.objects.exists())
@@ -0,0 +1,111 @@
+import time
+from types import SimpleNamespace
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+from django.test import override_settings
+from rest_framework import status
+
+from stock.throttling import AdaptiveConcurrencyLimit
+from stock.throttling import TokenBucketThrottle
+
+REST_FRAMEWORK = {
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'read': '3/min', 'write': '120/min', 'bulk': '10/min', 'reports': '2/min'},
+}
+
+
+@override_settings(REST_FRAMEWORK=REST_FRAMEWORK)
+class ThrottlingTest(TestCase):
+    def setUp(self):
+        """
+        Set up a staff user and a token, and empty the throttle buckets.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass', is_staff=True)
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+
+    def get(self, path, **extra):
+        return self.client.get(path, HTTP_AUTHORIZATION='Token ' + self.token, **extra)
+
+    def test_report_budget_is_separate_from_reads(self):
+        """
+        Test case to verify that reports have their own budget and exceeding it returns 429 with Retry-After.
+        """
+        self.assertEqual(self.get('/api/orders/fast-report/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get('/api/orders/fast-report/').status_code, status.HTTP_200_OK)
+
+        response = self.get('/api/orders/fast-report/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.get('/api/products/').status_code, status.HTTP_200_OK)
+
+    def test_rejections_are_counted(self):
+        """
+        Test case to verify that rejected requests are exposed per scope on the stats endpoint.
+        """
+        for _ in range(4):
+            self.get('/api/products/')
+
+        response = self.get('/api/throttling/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rejected']['read'], 1)
+        self.assertEqual(response.data['rejected']['reports'], 0)
+        self.assertIn('limit', response.data['concurrency'])
+
+    def test_concurrent_requests_cannot_exceed_the_bucket(self):
+        """
+        Test case to verify that a burst of concurrent requests on one token is not allowed past the bucket capacity.
+        """
+        request = SimpleNamespace(auth=SimpleNamespace(pk='token'), method='GET')
+        view = SimpleNamespace(throttle_scope='bulk')
+
+        get = LocMemCache.get
+
+        def slow_get(*args, **kwargs):
+            value = get(*args, **kwargs)
+            time.sleep(0.002)
+            return value
+
+        with mock.patch.object(LocMemCache, 'get', slow_get), ThreadPoolExecutor(max_workers=8) as executor:
+            allowed = list(executor.map(lambda _: TokenBucketThrottle().allow_request(request, view), range(40)))
+
+        self.assertEqual(allowed.count(True), 10)
+
+    def test_stale_queued_requests_are_shed(self):
+        """
+        Test case to verify that requests that waited too long in the proxy queue get a 503 with Retry-After.
+        """
+        response = self.get('/api/products/', HTTP_X_REQUEST_START=f't={time.time() - 5:.3f}')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.get('/api/throttling/').data['rejected']['shed'], 1)
+
+
+class AdaptiveConcurrencyLimitTest(TestCase):
+    def test_limit_backs_off_and_recovers(self):
+        """
+        Test case to verify that slow responses shrink the in-flight limit and fast ones grow it back.
+        """
+        limiter = AdaptiveConcurrencyLimit(minimum=1, maximum=2, target_latency=0.5)
+
+        self.assertTrue(limiter.acquire())
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire())
+
+        limiter.release(1.0)
+        limiter.release(1.0)
+        self.assertEqual(limiter.snapshot(), {'limit': 1, 'in_flight': 0})
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire())
+
+        limiter.release(0.1)
+        self.assertEqual(limiter.snapshot(), {'limit': 2, 'in_flight': 0})
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test import TransactionTestCase
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from stock.models import Category
+from stock.models import Product
+from stock.serializers import CategorySerializer
+
+
+class UniqueConstraintValidationTest(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a token and an existing category.
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        response = self.client.post('/api/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.token = response.data['token']
+        self.category = Category.objects.create(user=self.user, name='Drinks')
+
+    def test_duplicate_returns_field_error(self):
+        """
+        Test case to verify that a duplicate name is reported on the field by the unique constraint.
+        """
+        response = self.client.post('/api/categories/', {'name': 'Drinks'}, HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'name': ['Category with this field already exists for this user.']})
+        self.assertEqual(Category.objects.count(), 1)
+
+    def test_update_keeping_the_same_name(self):
+        """
+        Test case to verify that an update that keeps the same name is accepted.
+        """
+        response = self.client.put(f'/api/categories/{self.category.id}/', {'name': 'Drinks', 'color': 'blue'}, content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['color'], 'blue')
+
+    def test_update_to_an_existing_name(self):
+        """
+        Test case to verify that renaming onto another category's name returns the field error.
+        """
+        other = Category.objects.create(user=self.user, name='Snacks')
+
+        response = self.client.patch(f'/api/categories/{other.id}/', {'name': 'Drinks'}, content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'name': ['Category with this field already exists for this user.']})
+
+    def test_bulk_create_reports_errors_by_position(self):
+        """
+        Test case to verify that a bulk write reports each duplicate at its position and saves nothing.
+        """
+        serializer = CategorySerializer(data=[{'name': 'Fruit'}, {'name': 'Drinks'}, {'name': 'Fruit'}], many=True, context={'request': SimpleNamespace(user=self.user)})
+        self.assertTrue(serializer.is_valid())
+
+        with self.assertRaises(ValidationError) as context:
+            serializer.save(user=self.user)
+
+        self.assertEqual(context.exception.detail, [{}, {'name': ['Category with this field already exists for this user.']}, {'name': ['Category with this field already exists for this user.']}])
+        self.assertEqual(Category.objects.count(), 1)
+
+    def test_same_barcode_for_another_user(self):
+        """
+        Test case to verify that the barcode is only unique per user.
+        """
+        other = User.objects.create_user(username='other', password='testpass')
+        Product.objects.create(user=other, name='Water', barcode='1', price_purchased=1, price_sale=2)
+        data = {'name': 'Water', 'barcode': '1', 'price_purchased': 1, 'price_sale': 2, 'weight': 1}
+
+        response = self.client.post('/api/products/', data, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post('/api/products/', data, HTTP_AUTHORIZATION='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'barcode': ['Product with this barcode already exists for this user.']})
+
+
+class UniqueConstraintQueryTest(TransactionTestCase):
+    def test_create_runs_only_the_insert(self):
+        """
+        Test case to verify that creating outside a transaction runs the insert without a duplicate pre-check.
+        """
+        user = User.objects.create_user(username='testuser', password='testpass')
+        serializer = CategorySerializer(data={'name': 'Drinks'}, context={'request': SimpleNamespace(user=user)})
+
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+            serializer.save(user=user)
+
+        duplicate = CategorySerializer(data={'name': 'Drinks'}, context={'request': SimpleNamespace(user=user)})
+        self.assertTrue(duplicate.is_valid())
+        with self.assertRaises(ValidationError):
+            duplicate.save(user=user)
+        self.assertEqual(Category.objects.count(), 1)
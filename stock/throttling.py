@@ -0,0 +1,214 @@
+import time
+import hashlib
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+SCOPES = ('read', 'write', 'bulk', 'reports')
+SHED = 'shed'
+
+
+def count_rejection(scope):
+    key = f'throttle:rejected:{scope}'
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def rejection_counts():
+    counts = cache.get_many([f'throttle:rejected:{scope}' for scope in (*SCOPES, SHED)])
+    return {scope: counts.get(f'throttle:rejected:{scope}', 0) for scope in (*SCOPES, SHED)}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per API token and scope, kept in the default cache.
+
+    The scope is the view's `throttle_scope` (set per action through
+    `@action(throttle_scope=...)`), otherwise `read` for safe methods and
+    `write` for the rest. A `600/min` rate refills ten tokens a second up to
+    a burst of 600. Anonymous requests, which only reach login and sign up,
+    are not throttled.
+
+    Each bucket is read and written under a lock taken with `cache.add`,
+    so concurrent requests cannot spend the same token. With a
+    per-process cache (LocMemCache) every worker has its own buckets and
+    the budget applies per worker.
+    """
+    LOCK_TIMEOUT = 1
+    LOCK_WAIT = 0.05
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def parse_rate(self, rate):
+        num, period = rate.split('/')
+        duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+        return int(num), int(num) / duration
+
+    def allow_request(self, request, view):
+        if request.auth is None:
+            return True
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+
+        capacity, refill = self.parse_rate(rate)
+        token = hashlib.sha256(str(request.auth.pk).encode()).hexdigest()[:16]
+        key = f'throttle:bucket:{scope}:{token}'
+        if not self.lock(key):
+            # Requests on this bucket keep it locked: the burst is over capacity.
+            self.retry_after = 1 / refill
+            count_rejection(scope)
+            return False
+        try:
+            now = time.time()
+            tokens, updated = cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.retry_after = (1 - tokens) / refill
+            cache.set(key, (tokens, now), timeout=int(capacity / refill) + 1)
+        finally:
+            cache.delete(f'{key}:lock')
+        if not allowed:
+            count_rejection(scope)
+        return allowed
+
+    def lock(self, key):
+        deadline = time.monotonic() + self.LOCK_WAIT
+        while not cache.add(f'{key}:lock', 1, timeout=self.LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+def queue_delay(request):
+    """
+    Seconds the request waited before reaching Django, from the
+    `X-Request-Start` header set by the proxy (`t=<seconds>` as sent by
+    nginx, or milliseconds/microseconds since the epoch).
+    """
+    value = request.META.get('HTTP_X_REQUEST_START', '').removeprefix('t=')
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    while started > 1e11:
+        started /= 1000
+    return time.time() - started
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    In-flight request limit adjusted with AIMD: every response slower than
+    the target latency shrinks the limit by 10%, every faster one grows it
+    by `1 / limit`, i.e. by about one per limit's worth of requests.
+    """
+
+    def __init__(self, minimum, maximum, target_latency):
+        self.lock = threading.Lock()
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.limit = float(maximum)
+        self.in_flight = 0
+
+    def acquire(self):
+        with self.lock:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency):
+        with self.lock:
+            self.in_flight -= 1
+            if latency > self.target_latency:
+                self.limit = max(self.minimum, self.limit * 0.9)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def snapshot(self):
+        with self.lock:
+            return {'limit': int(self.limit), 'in_flight': self.in_flight}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AdaptiveConcurrencyLimit(
+                settings.LOAD_SHEDDING_MIN_CONCURRENCY,
+                settings.LOAD_SHEDDING_MAX_CONCURRENCY,
+                settings.LOAD_SHEDDING_TARGET_LATENCY,
+            )
+    return _limiter
+
+
+class LoadSheddingMiddleware(MiddlewareMixin):
+    """
+    Reject requests with 503 and `Retry-After` before any work is done when
+    they queued longer than LOAD_SHEDDING_MAX_QUEUE_DELAY, or when this
+    process already serves as many requests as its adaptive limit allows.
+    """
+
+    def process_request(self, request):
+        if not self.admit(request):
+            return self.shed()
+
+    async def __acall__(self, request):
+        """
+        Admit the request in the event loop instead of running the hooks
+        in the sync thread; the limiter only holds its lock briefly. Only
+        counting a rejection, which writes to the cache, runs in a thread.
+        """
+        if not self.admit(request):
+            return await sync_to_async(self.shed)()
+        return self.process_response(request, await self.get_response(request))
+
+    def admit(self, request):
+        delay = queue_delay(request)
+        if delay is not None and delay > settings.LOAD_SHEDDING_MAX_QUEUE_DELAY:
+            return False
+        if not get_limiter().acquire():
+            return False
+        request._load_shedding_started = time.monotonic()
+        return True
+
+    def process_response(self, request, response):
+        started = getattr(request, '_load_shedding_started', None)
+        if started is not None:
+            get_limiter().release(time.monotonic() - started)
+        return response
+
+    def shed(self):
+        count_rejection(SHED)
+        return JsonResponse({'detail': 'Server is overloaded, retry shortly.'}, status=503, headers={'Retry-After': '1'})
@@ -3,6 +3,9 @@ from django.urls import include
 from django.urls import path
 
 from stock.views import LoginView
+from stock.views import BootstrapView
+from stock.views import SyncView
+from stock.views import ThrottlingStatsView
 from stock.views import UserViewSet
 from stock.views import OrderViewSet
 from stock.views import ProductViewSet
@@ -11,6 +14,9 @@ from stock.views import SupplierViewSet
 from stock.views import PromotionViewSet
 from stock.views import TransactionViewSet
 from stock.views import ManufacturerViewSet
+from stock.views import ImportJobViewSet
+
+from stock import async_views
 
 from rest_framework.routers import DefaultRouter
 
@@ -23,8 +29,17 @@ router.register('categories', CategoryViewSet)
 router.register('promotions', PromotionViewSet)
 router.register('transactions', TransactionViewSet)
 router.register('manufacturers', ManufacturerViewSet)
+router.register('imports', ImportJobViewSet)
 
 urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
+    path('bootstrap/', BootstrapView.as_view(), name='bootstrap'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('throttling/', ThrottlingStatsView.as_view(), name='throttling-stats'),
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('async/products/barcode/<str:barcode>/', async_views.product_barcode, name='async-product-barcode'),
+    path('async/categories/', async_views.category_list, name='async-category-list'),
+    path('async/orders/fast-report/', async_views.fast_report, name='async-fast-report'),
     path('', include(router.urls))
 ]
\ No newline at end of file
@@ -1,23 +1,28 @@
+from rest_framework import mixins
 from rest_framework import viewsets
 from django.contrib.auth.models import User
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.authentication import TokenAuthentication
 
 from django.contrib.auth import authenticate
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
+from rest_framework.generics import get_object_or_404
 
 from stock.models import Order
+from stock.models import OrderQuerySet
 from stock.models import Product
 from stock.models import Category
 from stock.models import Supplier
 from stock.models import Promotion
 from stock.models import Transaction
 from stock.models import Manufacturer
+from stock.models import StockMovement
+from stock.models import ImportJob
 
 from stock.filters import OrderFilter
 from stock.filters import ProductFilter
@@ -35,11 +40,60 @@ from stock.serializers import CategorySerializer
 from stock.serializers import PromotionSerializer
 from stock.serializers import TransactionSerializer
 from stock.serializers import ManufacturerSerializer
+from stock.serializers import ImportJobSerializer
 
-from django.db.models import F 
-from django.db.models import Sum 
+from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
-from django.db.models.functions import TruncDay
+from datetime import datetime
+from datetime import time
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+from zoneinfo import ZoneInfoNotFoundError
+from django.utils.dateparse import parse_date
+from django.utils.dateparse import parse_datetime
+
+from functools import partial
+from django.db import router
+from django.db.transaction import atomic
+from django.db.transaction import on_commit
+
+from stock.images import schedule_renditions
+from stock.imports import schedule_import
+from stock.ledger import annotate_stock
+from stock.expiration import parse_within
+from stock.expiration import expiring_report
+from stock.reports import build_fast_report
+from stock.reports import build_sales_heatmap
+from stock.reports import HEATMAP_DEFAULT_DAYS
+from stock.archive import order_history
+from stock.archive import HISTORY_DEFAULT_DAYS
+from stock.forecasting import parse_parameters
+from stock.forecasting import reorder_suggestions
+from stock.classification import TIERS
+from stock.classification import abc_report
+from stock.classification import parse_window
+from stock.classification import parse_thresholds
+from stock.leaderboards import PERIODS
+from stock.leaderboards import best_sellers
+from stock.leaderboards import record_order
+from stock.bootstrap import SECTIONS
+from stock.bootstrap import FAST_REPORT
+from stock.bootstrap import build_bootstrap
+from stock.sync import build_sync
+from stock.idempotency import IdempotentCreateMixin
+from stock.sharding import TenantTokenAuthentication
+from stock.throttling import get_limiter
+from stock.throttling import rejection_counts
+from stock.sync import parse_sync_cursor
+from stock.reports import inventory_valuation
+from stock.cache import get_or_compute
+from stock.cursors import MIN_ID
+from stock.cursors import MAX_ID
+from stock.cursors import parse_id
+from stock.cursors import parse_limit
+from stock.cursors import decode_cursor
+from stock.cursors import encode_cursor
 
 
 class LoginView(APIView):
@@ -57,6 +111,55 @@ class LoginView(APIView):
         else:
             return Response({"error": "Wrong Credentials"}, status=status.HTTP_400_BAD_REQUEST)
 
+class BootstrapView(APIView):
+    authentication_classes = [TenantTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'reports'
+
+    def get(self, request):
+        available = [*SECTIONS, FAST_REPORT]
+        sections = request.query_params.get('sections')
+        sections = [section.strip() for section in sections.split(',') if section.strip()] if sections else available
+        unknown = [section for section in sections if section not in available]
+        if unknown:
+            return Response({"sections": f"Unknown sections: {', '.join(unknown)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = {}
+        versions = {}
+        for section in sections:
+            if request.query_params.get(f'fields[{section}]'):
+                fields[section] = {field.strip() for field in request.query_params[f'fields[{section}]'].split(',') if field.strip()}
+            if request.query_params.get(f'versions[{section}]'):
+                versions[section] = request.query_params[f'versions[{section}]']
+
+        return Response(build_bootstrap(request, sections, fields, versions))
+
+class SyncView(APIView):
+    authentication_classes = [TenantTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        positions = None
+        since = request.query_params.get('since')
+        if since:
+            try:
+                positions = parse_sync_cursor(since)
+            except ValueError:
+                return Response({"since": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(build_sync(request, positions, parse_limit(request.query_params.get('limit'))))
+
+class ThrottlingStatsView(APIView):
+    authentication_classes = [TenantTokenAuthentication]
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+
+    def get(self, request):
+        return Response({
+            'rejected': rejection_counts(),
+            'concurrency': get_limiter().snapshot(),
+        })
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -77,7 +180,7 @@ class PromotionViewSet(viewsets.ModelViewSet):
     serializer_class = PromotionSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = PromotionFilter
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TenantTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -93,8 +196,9 @@ class ProductViewSet(viewsets.ModelViewSet):
     serializer_class = ProductSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = ProductFilter
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TenantTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_scope = None
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
@@ -102,14 +206,174 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Product.objects.none()
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with atomic(using=router.db_for_write(Product)):
+            product = serializer.save(user=self.request.user)
+            if product.quantity:
+                StockMovement.objects.using(product._state.db).create(user=self.request.user, product=product, delta=product.quantity, reason=StockMovement.ADJUSTMENT)
+        if 'image' in serializer.validated_data:
+            on_commit(partial(schedule_renditions, product.pk), using=product._state.db)
+
+    def perform_update(self, serializer):
+        """
+        Lock the row before saving so an order or cancel committed since it
+        was read cannot slip between the recorded delta and the saved quantity.
+        """
+        db = router.db_for_write(Product, instance=serializer.instance)
+        with atomic(using=db):
+            previous_quantity = Product.objects.using(db).select_for_update().values_list('quantity', flat=True).get(pk=serializer.instance.pk)
+            serializer.instance.quantity = previous_quantity
+            product = serializer.save()
+            if product.quantity != previous_quantity:
+                StockMovement.objects.using(db).create(user=self.request.user, product=product, delta=product.quantity - previous_quantity, reason=StockMovement.ADJUSTMENT)
+        if 'image' in serializer.validated_data:
+            on_commit(partial(schedule_renditions, product.pk), using=product._state.db)
+
+    @action(detail=False, methods=['get'], url_path=r'barcode/(?P<barcode>[^/]+)')
+    def barcode(self, request, barcode=None):
+        product = get_object_or_404(self.get_queryset(), barcode=barcode)
+        return Response(self.get_serializer(product).data)
+
+    @action(detail=False, methods=['get'], url_path='stock-as-of', throttle_scope='reports')
+    def stock_as_of(self, request):
+        value = request.query_params.get('at', '')
+        try:
+            at = parse_datetime(value)
+            if at is None and parse_date(value) is not None:
+                at = datetime.combine(parse_date(value), time.max)
+        except ValueError:
+            at = None
+        if at is None:
+            return Response({"at": "A valid ISO 8601 date or datetime is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+
+        products = self.get_queryset()
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                products = products.filter(id__in=[parse_id(id) for id in ids.split(',')])
+            except ValueError:
+                return Response({"ids": "Product ids must be a comma separated list of integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = annotate_stock(products, at=at).values('id', 'ledger_quantity')
+        return Response({
+            'at': at,
+            'products': [{'id': row['id'], 'quantity': row['ledger_quantity']} for row in rows],
+        })
+
+    @action(detail=False, methods=['get'], url_path='expiring', throttle_scope='reports')
+    def expiring(self, request):
+        try:
+            within_days = parse_within(request.query_params.get('within'))
+        except ValueError as error:
+            return Response({"within": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(expiring_report(self.get_queryset(), within_days))
+
+    @action(detail=False, methods=['get'], url_path='valuation', throttle_scope='reports')
+    def valuation(self, request):
+        report = get_or_compute('products', request.user.id, lambda: inventory_valuation(self.get_queryset()), suffix='valuation')
+        return Response(report)
+
+    @action(detail=False, methods=['get'], url_path='reorder-suggestions', throttle_scope='reports')
+    def reorder_suggestions(self, request):
+        try:
+            parameters = parse_parameters(request.query_params)
+        except ValueError as error:
+            name, message = error.args
+            return Response({name: message}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = parse_limit(request.query_params.get('limit'))
+        return Response(reorder_suggestions(self.get_queryset(), request.user, limit=limit, **parameters))
+
+    @action(detail=False, methods=['get'], url_path='abc', throttle_scope='reports')
+    def abc(self, request):
+        try:
+            days = parse_window(request.query_params.get('days'))
+        except ValueError as error:
+            return Response({"days": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            thresholds = parse_thresholds(request.query_params.get('a'), request.query_params.get('b'))
+        except ValueError as error:
+            return Response({"thresholds": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        tier = request.query_params.get('tier')
+        if tier and tier not in TIERS:
+            return Response({"tier": "Tier must be 'A', 'B' or 'C'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = parse_limit(request.query_params.get('limit'))
+        return Response(abc_report(self.get_queryset(), request.user, days, thresholds, limit, tier=tier))
+
+    @action(detail=False, methods=['get'], url_path='best-sellers')
+    def best_sellers(self, request):
+        period = request.query_params.get('period', PERIODS[0])
+        if period not in PERIODS:
+            return Response({"period": "Period must be 'day' or 'week'."}, status=status.HTTP_400_BAD_REQUEST)
+        value = request.query_params.get('date')
+        try:
+            day = parse_date(value) if value else timezone.localdate()
+        except ValueError:
+            day = None
+        if day is None:
+            return Response({"date": "A valid ISO 8601 date is required."}, status=status.HTTP_400_BAD_REQUEST)
+        category = request.query_params.get('category')
+        if category is not None and not (category.isdigit() and int(category) <= MAX_ID):
+            return Response({"category": "Category must be an id."}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = parse_limit(request.query_params.get('limit'), default=10, maximum=100)
+        return Response(best_sellers(request.user, period, day, limit, category=int(category) if category else None))
+
+    @action(detail=False, methods=['get'], url_path='low-stock')
+    def low_stock(self, request):
+        stock_status = request.query_params.get('status', Product.STOCK_LOW)
+        if stock_status not in (Product.STOCK_LOW, Product.STOCK_OVER):
+            return Response({"status": "Status must be 'low' or 'over'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        products = self.get_queryset().exclude(stock_status=Product.STOCK_OK).filter(stock_status=stock_status).order_by('stock_status_changed_at', 'id')
+        return Response(self.get_serializer(products, many=True).data)
+
+    @action(detail=False, methods=['get'], url_path='low-stock/feed')
+    def low_stock_feed(self, request):
+        limit = parse_limit(request.query_params.get('limit'))
+        products = self.get_queryset().exclude(stock_status=Product.STOCK_OK)
+
+        # Statuses are stamped before their transaction commits, so a change
+        # is only handed out once it is older than the settle window and
+        # can no longer commit behind a cursor already given out.
+        settled = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+        products = products.filter(stock_status_changed_at__lte=settled)
+
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                changed_at, last_id = decode_cursor(cursor)
+                changed_at = parse_datetime(changed_at)
+                if changed_at is None:
+                    raise ValueError
+                last_id = parse_id(last_id)
+            except (ValueError, TypeError):
+                return Response({"cursor": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+            products = products.filter(Q(stock_status_changed_at__gt=changed_at) | Q(stock_status_changed_at=changed_at, id__gt=last_id))
+
+        rows = list(products.order_by('stock_status_changed_at', 'id').values(
+            'id', 'name', 'barcode', 'quantity', 'quantity_min', 'quantity_max', 'stock_status', 'stock_status_changed_at',
+        )[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            cursor = encode_cursor([rows[-1]['stock_status_changed_at'].isoformat(), rows[-1]['id']])
+
+        return Response({
+            'results': rows,
+            'next_cursor': cursor,
+            'has_more': has_more,
+        })
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = CategoryFilter
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TenantTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -125,7 +389,7 @@ class SupplierViewSet(viewsets.ModelViewSet):
     serializer_class = SupplierSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = SupplierFilter
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TenantTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -141,7 +405,7 @@ class ManufacturerViewSet(viewsets.ModelViewSet):
     serializer_class = ManufacturerSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = ManufacturerFilter
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TenantTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -152,25 +416,27 @@ class ManufacturerViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = OrderFilter
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TenantTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_scope = None
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
-            return Order.objects.filter(user=self.request.user).order_by('-created_at')
+            return Order.objects.filter(user=self.request.user).prefetch_related('transactions', 'lines').order_by('-created_at')
         return Order.objects.none()
     
     def perform_create(self, serializer):
         order = serializer.save(user=self.request.user)
 
-        for transaction in order.transactions.all():
-            transaction.product.quantity -= transaction.quantity
-            transaction.product.save()
+        transactions = list(order.transactions.all())
+        for transaction in transactions:
+            transaction.product.adjust_quantity(-transaction.quantity, StockMovement.SALE, f'order:{order.id}')
+        record_order(order, transactions)
     
     @action(detail=True, methods=['post'], url_path='cancel')
     def cancel(self, request, pk=None):
@@ -178,58 +444,77 @@ class OrderViewSet(viewsets.ModelViewSet):
         order.cancel()
         return Response({"status": "Order cancelled."})
 
-    @action(detail=False, methods=['get'], url_path='fast-report')
+    @action(detail=False, methods=['post'], url_path='bulk-cancel', throttle_scope='bulk')
+    def bulk_cancel(self, request):
+        ids = request.data.get('orders')
+        if not isinstance(ids, list) or not ids or not all(isinstance(id, int) and not isinstance(id, bool) and MIN_ID <= id <= MAX_ID for id in ids):
+            return Response({"orders": "A non-empty list of order ids is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > 1000:
+            return Response({"orders": "At most 1000 orders can be cancelled per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        outcomes = self.get_queryset().bulk_cancel(ids)
+        return Response({
+            'cancelled': sum(1 for outcome in outcomes.values() if outcome == OrderQuerySet.CANCELLED),
+            'results': [{'id': order_id, 'outcome': outcome} for order_id, outcome in outcomes.items()],
+        })
+
+    @action(detail=False, methods=['get'], url_path='fast-report', throttle_scope='reports')
     def fast_report(self, request):
-        one_week_ago = timezone.now() - timezone.timedelta(days=7)
-        orders = Order.objects.filter(user=request.user, created_at__gte=one_week_ago)
-
-        total_earned = orders.annotate(total_order=Sum(F('transactions__price') * F('transactions__quantity'))).aggregate(Sum('total_order'))['total_order__sum'] or 0
-        total_transactions = orders.aggregate(total=Sum('transactions__quantity'))['total'] or 0
-        number_of_orders = orders.count()
-        average_earnings_per_order = total_earned / number_of_orders if number_of_orders > 0 else 0
-
-        product_sales = Transaction.objects.filter(order__in=orders).values('product').annotate(total_sold=Sum('quantity')).order_by('-total_sold').first()
-        most_sold_product = Product.objects.get(id=product_sales['product']) if product_sales else None
-
-        transactions_by_day = {}
-        daily_transactions = Transaction.objects.filter(order__in=orders).annotate(day=TruncDay('created_at')).order_by('day')
-        for transaction in daily_transactions:
-            day_name = transaction.created_at.strftime('%A').lower()
-            if day_name not in transactions_by_day:
-                transactions_by_day[day_name] = []
-            transactions_by_day[day_name].append(TransactionSerializer(transaction).data)
-
-        weekly_sales = []
-        for order in orders:
-            transactions = order.transactions.all().values('product__name', 'quantity', 'price')
-            weekly_sales.append({
-                'order_id': order.id,
-                'created_at': order.created_at,
-                'transactions': list(transactions),
-            })
-
-        different_days = 7
-        daily_average = total_transactions / different_days if different_days > 0 else 0
-
-        report = {
-            'total_earned': total_earned,
-            'total_transactions': total_transactions,
-            'number_of_orders': number_of_orders,
-            'average_earnings_per_order': average_earnings_per_order,
-            'most_sold_product': ProductSerializer(most_sold_product).data if most_sold_product else None,
-            'daily_transactions_average': daily_average,
-            'sales_last_week': weekly_sales,
-            'transactions_by_day': transactions_by_day,
-        }
-
-        return Response(report)
-
-class TransactionViewSet(viewsets.ModelViewSet):
+        return Response(build_fast_report(request.user))
+
+    @action(detail=False, methods=['get'], url_path='heatmap', throttle_scope='reports')
+    def heatmap(self, request):
+        name = request.query_params.get('tz')
+        try:
+            tzinfo = ZoneInfo(name) if name else timezone.get_current_timezone()
+        except (ZoneInfoNotFoundError, ValueError):
+            return Response({"tz": "Unknown time zone."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            start, end = self.date_range(request, tzinfo, HEATMAP_DEFAULT_DAYS)
+        except ValueError as e:
+            field, message = e.args
+            return Response({field: message}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(build_sales_heatmap(request.user, start, end, tzinfo))
+
+    @action(detail=False, methods=['get'], url_path='history', throttle_scope='reports')
+    def history(self, request):
+        try:
+            start, end = self.date_range(request, timezone.get_current_timezone(), HISTORY_DEFAULT_DAYS)
+        except ValueError as e:
+            field, message = e.args
+            return Response({field: message}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = parse_limit(request.query_params.get('limit'))
+        return Response({
+            'start': start,
+            'end': end,
+            'results': order_history(request.user, start, end, limit),
+        })
+
+    def date_range(self, request, tzinfo, default_days):
+        dates = {}
+        for field in ('start', 'end'):
+            value = request.query_params.get(field)
+            try:
+                dates[field] = parse_date(value) if value else None
+            except ValueError:
+                dates[field] = None
+            if value and dates[field] is None:
+                raise ValueError(field, "A valid ISO 8601 date is required.")
+        end = dates['end'] or timezone.localdate(timezone=tzinfo)
+        start = dates['start'] or end - timedelta(days=default_days - 1)
+        if start > end:
+            raise ValueError("start", "Start date must not be after end date.")
+        return start, end
+
+class TransactionViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = TransactionFilter
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TenantTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -238,4 +523,28 @@ class TransactionViewSet(viewsets.ModelViewSet):
         return Transaction.objects.none()
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+
+class ImportJobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+    authentication_classes = [TenantTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @property
+    def throttle_scope(self):
+        return 'bulk' if self.action == 'create' else None
+
+    def get_queryset(self):
+        if self.request.user.is_authenticated:
+            return ImportJob.objects.filter(user=self.request.user).order_by('-id')
+        return ImportJob.objects.none()
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    def perform_create(self, serializer):
+        job = serializer.save(user=self.request.user)
+        on_commit(partial(schedule_import, job.pk), using=job._state.db)